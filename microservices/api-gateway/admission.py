@@ -0,0 +1,107 @@
+"""
+Control de admisión del API Gateway: token buckets por clase de ruta y por cliente
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# rate/burst: presupuesto de la clase; client_rate/client_burst: de cada cliente dentro de la clase;
+# max_wait: espera máxima en cola (0 = sin cola, lo que no cabe se rechaza de inmediato)
+AdmissionClass = namedtuple('AdmissionClass', ['rate', 'burst', 'client_rate', 'client_burst', 'max_wait'])
+
+
+class TokenBucket:
+    """Token bucket que admite reservas: las fichas pueden quedar en negativo mientras hay peticiones en cola"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.tokens + (now - self.updated_at) * self.rate, self.burst)
+        self.updated_at = now
+
+    def wait_time(self):
+        """Segundos hasta que haya una ficha disponible para una petición nueva"""
+        return max((1 - self.tokens) / self.rate, 0)
+
+
+class AdmissionController:
+    """
+    Admite, encola o rechaza cada petición según el presupuesto de su clase y el de su cliente.
+
+    Si falta una ficha y la espera hasta la siguiente cabe en `max_wait` de la
+    clase, la ficha se reserva y la petición espera ese tiempo (la cola queda
+    acotada a unas rate * max_wait peticiones). Si no, se rechaza con el tiempo
+    sugerido para reintentar.
+    """
+
+    def __init__(self, classes, route_classes, default_class, max_clients=10000):
+        self.classes = classes
+        self.route_classes = route_classes
+        self.default_class = default_class
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = {name: TokenBucket(config.rate, config.burst) for name, config in classes.items()}
+        self._client_buckets = OrderedDict()
+        self._counters = {name: {'admitted': 0, 'queued': 0, 'shed': 0, 'wait_seconds': 0.0} for name in classes}
+
+    def admit(self, endpoint, client, max_wait=None):
+        """
+        Devuelve (delay, retry_after): espera antes de reenviar la petición, o
+        retry_after > 0 si se rechaza. `max_wait` acota aún más la espera de la clase.
+        """
+        class_name = self.route_classes.get(endpoint, self.default_class)
+        config = self.classes[class_name]
+        counters = self._counters[class_name]
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets[class_name]
+            client_bucket = self._client_bucket(class_name, client, config)
+            bucket.refill(now)
+            client_bucket.refill(now)
+            wait = max(bucket.wait_time(), client_bucket.wait_time())
+            if wait > (config.max_wait if max_wait is None else min(config.max_wait, max_wait)):
+                counters['shed'] += 1
+                return 0, wait
+            bucket.tokens -= 1
+            client_bucket.tokens -= 1
+            counters['admitted'] += 1
+            if wait > 0:
+                counters['queued'] += 1
+                counters['wait_seconds'] += wait
+            return wait, 0
+
+    def _client_bucket(self, class_name, client, config):
+        key = class_name, client
+        bucket = self._client_buckets.get(key)
+        if bucket is None:
+            bucket = self._client_buckets[key] = TokenBucket(config.client_rate, config.client_burst)
+            if len(self._client_buckets) > self.max_clients:
+                self._client_buckets.popitem(last=False)
+        else:
+            self._client_buckets.move_to_end(key)
+        return bucket
+
+    def stats(self):
+        stats = {}
+        for name, config in self.classes.items():
+            counters = self._counters[name]
+            queued = counters['queued']
+            stats[name] = {
+                **config._asdict(),
+                'admitted': counters['admitted'],
+                'queued': queued,
+                'shed': counters['shed'],
+                'avg_wait_ms': round(counters['wait_seconds'] * 1000 / queued, 1) if queued else 0,
+            }
+        return stats
+
+
+def client_key(claims, remote_addr):
+    """Cliente al que se carga el presupuesto: el usuario del token de acceso o, sin token, la IP"""
+    if claims:
+        return f"user:{claims['sub']}"
+    return f"ip:{remote_addr}"
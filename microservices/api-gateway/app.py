@@ -1,15 +1,32 @@
 """
 API Gateway para enrutar peticiones a los microservicios
 """
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Flask, Response, request, jsonify, make_response, session, stream_with_context, abort, g
 from flask_cors import CORS
 import requests
 import os
+import math
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from upstream import UpstreamClient
+from resilience import CircuitBreaker, CircuitOpenError
+from cache import ResponseCache, make_key
+from hedging import HedgePolicy
+from compression import choose_encoding, is_compressible, compress, compress_cached, compress_stream, load_static_assets
+from composite import compose_order_view
+from batch import run_batch
+from admission import AdmissionClass, AdmissionController, client_key
+from tokens import AccessTokenVerifier, InvalidToken, bearer_token, identity_headers
+from events import EventSource, StatusEventHub, stream_events
+from deadline import DEADLINE_HEADER, MIN_REMAINING_SECONDS, deadline_headers, remaining_budget
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 FRONTEND_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'frontend'))
 
-app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
+# El frontend se sirve desde copias en memoria precomprimidas al arrancar (ver frontend_response)
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.environ.get('SECRET_KEY', 'gateway-secret-key')
 CORS(app, supports_credentials=True)
 
@@ -19,169 +36,545 @@ INVENTORY_SERVICE_URL = os.environ.get('INVENTORY_SERVICE_URL', 'http://inventor
 ORDERS_SERVICE_URL = os.environ.get('ORDERS_SERVICE_URL', 'http://orders-service:8004')
 SHIPPING_SERVICE_URL = os.environ.get('SHIPPING_SERVICE_URL', 'http://shipping-service:8005')
 
-TIMEOUT = 10
-
-def forward_request(service_url, path, method='GET', data=None, headers=None):
-    """Reenvía una petición a un microservicio"""
-    url = f"{service_url}{path}"
+TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 10))
+POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 10))
+COALESCE_GETS = os.environ.get('GATEWAY_COALESCE_GETS', 'True') == 'True'
+MAX_CONCURRENCY = int(os.environ.get('UPSTREAM_MAX_CONCURRENCY', 50))
+
+BREAKER_FAILURE_RATE = float(os.environ.get('BREAKER_FAILURE_RATE', 0.5))
+BREAKER_MIN_REQUESTS = int(os.environ.get('BREAKER_MIN_REQUESTS', 10))
+BREAKER_WINDOW = float(os.environ.get('BREAKER_WINDOW', 30))
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 15))
+
+BALANCER_MAX_FAILURES = int(os.environ.get('BALANCER_MAX_FAILURES', 3))
+BALANCER_EJECTION_SECONDS = float(os.environ.get('BALANCER_EJECTION_SECONDS', 30))
+
+def build_upstream(name, service_url):
+    """
+    Crea el cliente de un microservicio.
+
+    `service_url` admite varias réplicas separadas por comas. AUTH_SERVICE_POOL_SIZE,
+    AUTH_SERVICE_TIMEOUT, etc. sobrescriben los valores globales.
+    """
+    prefix = f"{name.upper()}_SERVICE"
+    breaker = CircuitBreaker(
+        failure_rate=BREAKER_FAILURE_RATE,
+        min_requests=BREAKER_MIN_REQUESTS,
+        window=BREAKER_WINDOW,
+        open_seconds=BREAKER_OPEN_SECONDS,
+    )
+    return UpstreamClient(
+        name,
+        [url.strip() for url in service_url.split(',') if url.strip()],
+        pool_size=int(os.environ.get(f'{prefix}_POOL_SIZE', POOL_SIZE)),
+        timeout=float(os.environ.get(f'{prefix}_TIMEOUT', TIMEOUT)),
+        coalesce=COALESCE_GETS,
+        breaker=breaker,
+        max_concurrent=int(os.environ.get(f'{prefix}_MAX_CONCURRENCY', MAX_CONCURRENCY)),
+        max_failures=BALANCER_MAX_FAILURES,
+        ejection_seconds=BALANCER_EJECTION_SECONDS,
+    )
+
+AUTH_SERVICE = build_upstream('auth', AUTH_SERVICE_URL)
+PRODUCTS_SERVICE = build_upstream('products', PRODUCTS_SERVICE_URL)
+INVENTORY_SERVICE = build_upstream('inventory', INVENTORY_SERVICE_URL)
+ORDERS_SERVICE = build_upstream('orders', ORDERS_SERVICE_URL)
+SHIPPING_SERVICE = build_upstream('shipping', SHIPPING_SERVICE_URL)
+
+# Tokens de acceso de auth-service: se verifican en el gateway con la misma llave
+ACCESS_TOKEN_SECRET = os.environ.get('ACCESS_TOKEN_SECRET', 'access-token-secret')
+TOKEN_VERIFIER = AccessTokenVerifier(
+    ACCESS_TOKEN_SECRET, AUTH_SERVICE,
+    revocation_interval=float(os.environ.get('TOKEN_REVOCATION_INTERVAL', 15)),
+)
+# Rutas que no exigen un token de acceso válido aunque llegue uno (p. ej. uno expirado al renovar)
+PUBLIC_ENDPOINTS = {'login', 'refresh_token'}
+
+UPSTREAMS = [AUTH_SERVICE, PRODUCTS_SERVICE, INVENTORY_SERVICE, ORDERS_SERVICE, SHIPPING_SERVICE]
+
+Route = namedtuple('Route', ['endpoint', 'rule', 'method', 'service', 'path', 'doc'])
+
+# Reenvía el cuerpo de los microservicios tal cual, por bloques, sin decodificar el JSON
+PASSTHROUGH = os.environ.get('GATEWAY_PASSTHROUGH', 'True') == 'True'
+STREAM_CHUNK_SIZE = int(os.environ.get('GATEWAY_STREAM_CHUNK_SIZE', 64 * 1024))
+# Listas que pueden ser grandes: no se agrupan, para reenviarlas por bloques sin leerlas completas en memoria
+STREAMED_ROUTES = {'order_list', 'shipping_guide_list', 'measurement_list'}
+PASSTHROUGH_HEADERS = ['Content-Type', 'Content-Encoding', 'Content-Length', 'ETag', 'Last-Modified',
+                       'Retry-After', 'Idempotent-Replayed']
+# Cabeceras del cliente que se reenvían al microservicio (además de la identidad verificada)
+FORWARDED_REQUEST_HEADERS = ['Idempotency-Key']
+
+CACHE_ENABLED = os.environ.get('GATEWAY_CACHE_ENABLED', 'True') == 'True'
+RESPONSE_CACHE = ResponseCache(
+    max_entries=int(os.environ.get('GATEWAY_CACHE_MAX_ENTRIES', 1000)),
+    max_bytes=int(os.environ.get('GATEWAY_CACHE_MAX_BYTES', 50 * 1024 * 1024)),
+)
+
+# TTL (segundos) de las rutas de lectura que cambian poco
+CACHE_TTLS = {
+    'product_list': 60,
+    'product_detail': 60,
+    'supplier_list': 300,
+    'variable_list': 300,
+    'warehouse_list': 30,
+    'carrier_list': 300,
+}
+
+# Rutas de escritura y las rutas en caché que dejan desactualizadas
+CACHE_INVALIDATIONS = {
+    'product_create': ['product_list', 'product_detail'],
+    'inventory_restock': ['warehouse_list'],
+    'place_order': ['warehouse_list'],
+    'create_order': ['warehouse_list'],
+    'order_bulk': ['warehouse_list'],
+}
+
+# Hedging de GET: percentil de latencia de cada ruta a partir del cual se lanza un segundo intento
+HEDGING_ENABLED = os.environ.get('GATEWAY_HEDGING', 'True') == 'True'
+HEDGE_BUDGET = float(os.environ.get('GATEWAY_HEDGE_BUDGET', 0.1))
+HEDGE_PERCENTILES = {
+    'product_detail': 95,
+    'warehouse_list': 95,
+}
+HEDGE_POLICIES = {
+    endpoint: HedgePolicy(percentile=percentile, budget_ratio=HEDGE_BUDGET)
+    for endpoint, percentile in HEDGE_PERCENTILES.items()
+} if HEDGING_ENABLED else {}
+
+# Compresión gzip/brotli negociada con Accept-Encoding para respuestas de texto y JSON
+COMPRESSION_ENABLED = os.environ.get('GATEWAY_COMPRESSION', 'True') == 'True'
+COMPRESSION_MIN_SIZE = int(os.environ.get('GATEWAY_COMPRESSION_MIN_SIZE', 1024))
+
+# Frontend: archivos leídos y comprimidos una sola vez al arrancar
+FRONTEND_ASSETS = load_static_assets(FRONTEND_DIR)
+FRONTEND_MAX_AGE = int(os.environ.get('GATEWAY_FRONTEND_MAX_AGE', 7 * 24 * 3600))
+# Archivos con huella de contenido en el nombre (app.3f2a9c1d.js): cambian de nombre al cambiar
+FINGERPRINTED_ASSET = re.compile(r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$')
+
+# Vistas compuestas: cada parte se pide en paralelo con su propio timeout
+VIEW_PART_TIMEOUT = float(os.environ.get('GATEWAY_VIEW_PART_TIMEOUT', 3))
+VIEW_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get('GATEWAY_VIEW_WORKERS', 32)))
+
+# Lotes: número máximo de sub-peticiones por llamada y cuántas se ejecutan en paralelo
+BATCH_MAX_REQUESTS = int(os.environ.get('GATEWAY_BATCH_MAX_REQUESTS', 50))
+BATCH_CONCURRENCY = int(os.environ.get('GATEWAY_BATCH_CONCURRENCY', 8))
+
+# Presupuesto de tiempo (segundos) de las rutas que crean pedidos, contado desde que el gateway recibe la petición
+ORDER_DEADLINE = float(os.environ.get('GATEWAY_ORDER_DEADLINE', 5))
+# Un lote puede traer hasta ORDERS_BULK_MAX_LINES (1000) líneas de orders-service
+ORDER_BULK_DEADLINE = float(os.environ.get('GATEWAY_ORDER_BULK_DEADLINE', 30))
+ROUTE_DEADLINES = {
+    'place_order': ORDER_DEADLINE,
+    'create_order': ORDER_DEADLINE,
+    'order_bulk': ORDER_BULK_DEADLINE,
+}
+
+# Control de admisión: presupuesto por clase de ruta y por cliente; lo que lo excede recibe 429
+ADMISSION_ENABLED = os.environ.get('GATEWAY_ADMISSION', 'True') == 'True'
+
+def admission_class(name, rate, burst, client_rate, client_burst, max_wait):
+    """Clase de admisión; ADMISSION_WRITE_RATE, ADMISSION_WRITE_MAX_WAIT, etc. sobrescriben los valores"""
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionClass(
+        rate=float(os.environ.get(f'{prefix}_RATE', rate)),
+        burst=float(os.environ.get(f'{prefix}_BURST', burst)),
+        client_rate=float(os.environ.get(f'{prefix}_CLIENT_RATE', client_rate)),
+        client_burst=float(os.environ.get(f'{prefix}_CLIENT_BURST', client_burst)),
+        max_wait=float(os.environ.get(f'{prefix}_MAX_WAIT', max_wait)),
+    )
+
+# Las lecturas baratas no esperan en cola: si se acaba su presupuesto se rechazan de inmediato
+ADMISSION_CLASSES = {
+    'read': admission_class('read', rate=500, burst=1000, client_rate=50, client_burst=100, max_wait=0),
+    'expensive': admission_class('expensive', rate=50, burst=100, client_rate=5, client_burst=10, max_wait=1),
+    'write': admission_class('write', rate=20, burst=40, client_rate=2, client_burst=5, max_wait=2),
+    # Cada petición es un lote de hasta 1000 pedidos: pocas por segundo, pero cada una mueve mucho más que un 'write'
+    'bulk': admission_class('bulk', rate=2, burst=4, client_rate=0.2, client_burst=2, max_wait=5),
+}
+
+# Escrituras y lecturas costosas; el resto de rutas /api/ son de clase 'read'
+ADMISSION_ROUTE_CLASSES = {
+    'login': 'write',
+    'product_create': 'write',
+    'inventory_restock': 'write',
+    'place_order': 'write',
+    'create_order': 'write',
+    'order_bulk': 'bulk',
+    'generate_guide': 'write',
+    'order_list': 'expensive',
+    'measurement_list': 'expensive',
+    'shipping_guide_list': 'expensive',
+    'guide_statistics': 'expensive',
+    'order_view': 'expensive',
+    'batch': 'expensive',
+}
+
+ADMISSION = AdmissionController(ADMISSION_CLASSES, ADMISSION_ROUTE_CLASSES, default_class='read')
+# En Flask la espera en cola ocupa un hilo worker: solo se espera muy poco y el resto recibe 429.
+# El motor asíncrono (asgi.py) espera sin ocupar hilos y usa el max_wait completo de cada clase
+WSGI_ADMISSION_MAX_WAIT = float(os.environ.get('GATEWAY_WSGI_ADMISSION_MAX_WAIT', 0.05))
+
+# Stream SSE de cambios de estado: un lector por proceso consulta a orders y shipping y reparte a los clientes
+EVENT_HUB = StatusEventHub(
+    [
+        EventSource('orders', ORDERS_SERVICE, '/api/orders/events/', 'order.status'),
+        EventSource('shipping', SHIPPING_SERVICE, '/api/guides/events/', 'shipping_guide.status'),
+    ],
+    poll_interval=float(os.environ.get('GATEWAY_EVENTS_POLL_INTERVAL', 1)),
+    buffer_size=int(os.environ.get('GATEWAY_EVENTS_BUFFER', 1000)),
+    max_clients=int(os.environ.get('GATEWAY_EVENTS_MAX_CLIENTS', 1000)),
+)
+EVENTS_HEARTBEAT = float(os.environ.get('GATEWAY_EVENTS_HEARTBEAT', 15))
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def upstream_error(e):
+    headers = {}
+    if isinstance(e, CircuitOpenError):
+        headers['Retry-After'] = str(max(round(e.retry_after), 1))
+    return jsonify({'error': f'Error al comunicarse con el servicio: {str(e)}'}), 503, headers
+
+def passthrough_response(response):
+    """Respuesta Flask con los bytes y cabeceras del microservicio, enviada por bloques si no se ha leído aún"""
+    headers = {name: response.headers[name] for name in PASSTHROUGH_HEADERS if name in response.headers}
+    encoded = getattr(response, 'encoded_content', None)
+    if encoded is not None and 'Content-Encoding' in headers:
+        # Respuesta agrupada que llegó comprimida: se reenvían los bytes originales con su codificación
+        return Response(encoded, status=response.status_code, headers=headers)
+    if response._content_consumed:
+        # requests ya descomprimió el cuerpo: no aplica la codificación original
+        headers.pop('Content-Encoding', None)
+        headers.pop('Content-Length', None)
+        return Response(response.content, status=response.status_code, headers=headers)
+
+    def stream_body():
+        try:
+            yield from response.raw.stream(STREAM_CHUNK_SIZE, decode_content=False)
+        finally:
+            response.close()
+
+    return Response(stream_with_context(stream_body()), status=response.status_code, headers=headers)
+
+def forward_request(service, path, method='GET', data=None, headers=None, hedge=None, timeout=None, coalesce=True):
+    """Reenvía una petición a un microservicio usando su pool de conexiones; `timeout` reemplaza el del cliente"""
+    options = {'headers': headers, 'stream': PASSTHROUGH}
+    if timeout is not None:
+        options['timeout'] = timeout
     try:
         if method == 'GET':
-            response = requests.get(url, params=request.args, headers=headers, timeout=TIMEOUT)
+            response = service.request('GET', path, params=request.args, hedge=hedge, coalesce=coalesce, **options)
         elif method == 'POST':
-            response = requests.post(url, json=data or request.json, headers=headers, timeout=TIMEOUT)
+            response = service.request('POST', path, json=data or request.get_json(silent=True), **options)
         elif method == 'PUT':
-            response = requests.put(url, json=data or request.json, headers=headers, timeout=TIMEOUT)
+            response = service.request('PUT', path, json=data or request.get_json(silent=True), **options)
         elif method == 'DELETE':
-            response = requests.delete(url, headers=headers, timeout=TIMEOUT)
+            response = service.request('DELETE', path, **options)
         else:
             return jsonify({'error': 'Método no soportado'}), 405
         
+        if PASSTHROUGH:
+            return passthrough_response(response)
         return response.json(), response.status_code
     except requests.exceptions.RequestException as e:
-        return jsonify({'error': f'Error al comunicarse con el servicio: {str(e)}'}), 503
-
-@app.route('/api/auth/login/', methods=['POST'])
-def login():
-    """Login de usuarios"""
-    return forward_request(AUTH_SERVICE_URL, '/api/auth/login/', 'POST')
-
-@app.route('/api/auth/logout/', methods=['POST'])
-def logout():
-    """Logout de usuarios"""
-    return forward_request(AUTH_SERVICE_URL, '/api/auth/logout/', 'POST')
-
-@app.route('/api/auth/profile/', methods=['GET'])
-def profile():
-    """Perfil del usuario autenticado"""
-    return forward_request(AUTH_SERVICE_URL, '/api/auth/profile/', 'GET')
+        return upstream_error(e)
+
+def negotiate_encoding(content_type, size=None):
+    """Codificación con la que se comprime una respuesta según Accept-Encoding, o None si no se comprime"""
+    if not COMPRESSION_ENABLED or not is_compressible(content_type):
+        return None
+    if size is not None and size < COMPRESSION_MIN_SIZE:
+        return None
+    return choose_encoding(request.headers.get('Accept-Encoding'))
+
+def cached_request(route, path):
+    """Responde una ruta de lectura desde la caché, consultando el microservicio solo si no hay entrada vigente"""
+    key = make_key(path, request.args.items(multi=True))
+    entry = RESPONSE_CACHE.get(key)
+    cache_status = 'HIT'
+    if entry is None:
+        cache_status = 'MISS'
+        generation = RESPONSE_CACHE.generation
+        try:
+            response = route.service.request('GET', path, params=request.args,
+                                             hedge=HEDGE_POLICIES.get(route.endpoint))
+        except requests.exceptions.RequestException as e:
+            return upstream_error(e)
+        if response.status_code != 200:
+            return passthrough_response(response) if PASSTHROUGH else (response.json(), response.status_code)
+        content_type = response.headers.get('Content-Type', 'application/json')
+        entry = RESPONSE_CACHE.set(key, route.endpoint, response.content, content_type,
+                                  CACHE_TTLS[route.endpoint], generation)
+
+    # Cada codificación es una representación distinta con su propio ETag fuerte
+    encoding = negotiate_encoding(entry.content_type, len(entry.body))
+    etag = f'{entry.etag}-{encoding}' if encoding else entry.etag
+    if request.if_none_match.contains(etag):
+        cached = Response(status=304)
+    elif encoding:
+        cached = Response(compress_cached(RESPONSE_CACHE, key, entry, encoding), status=200, content_type=entry.content_type)
+        cached.headers['Content-Encoding'] = encoding
+    else:
+        cached = Response(entry.body, status=200, content_type=entry.content_type)
+    cached.set_etag(etag)
+    if COMPRESSION_ENABLED:
+        cached.vary.add('Accept-Encoding')
+    cached.headers['X-Cache'] = cache_status
+    return cached
+
+def frontend_response(filename):
+    """
+    Archivo del frontend desde su copia precomprimida, con ETag fuerte.
+
+    Solo los archivos con huella en el nombre se guardan FRONTEND_MAX_AGE segundos
+    sin revalidar; index.html y los demás van con no-cache, así que el navegador
+    revalida con el ETag (304 si no cambiaron) y recibe la versión nueva tras un despliegue.
+    """
+    asset = FRONTEND_ASSETS.get(filename)
+    if asset is None:
+        return None
+    encoding = negotiate_encoding(asset.content_type)
+    if encoding not in asset.variants:
+        encoding = None
+    etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif encoding:
+        response = Response(asset.variants[encoding], content_type=asset.content_type)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = Response(asset.body, content_type=asset.content_type)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if FINGERPRINTED_ASSET.search(filename):
+        response.cache_control.max_age = FRONTEND_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Tabla de rutas del gateway: la usan tanto Flask como el motor asíncrono (asgi.py)
+ROUTES = [
+    Route('login', '/api/auth/login/', 'POST', AUTH_SERVICE, '/api/auth/login/', 'Login de usuarios'),
+    Route('logout', '/api/auth/logout/', 'POST', AUTH_SERVICE, '/api/auth/logout/', 'Logout de usuarios'),
+    Route('profile', '/api/auth/profile/', 'GET', AUTH_SERVICE, '/api/auth/profile/', 'Perfil del usuario autenticado'),
+    Route('refresh_token', '/api/auth/refresh/', 'POST', AUTH_SERVICE, '/api/auth/refresh/', 'Renovar el token de acceso'),
+    Route('product_list', '/api/products/', 'GET', PRODUCTS_SERVICE, '/api/products/', 'Listar productos'),
+    Route('product_detail', '/api/products/<int:product_id>/', 'GET', PRODUCTS_SERVICE, '/api/products/{product_id}/', 'Detalles de un producto'),
+    Route('product_create', '/api/products/create/', 'POST', PRODUCTS_SERVICE, '/api/products/create/', 'Crear un producto'),
+    Route('product_by_name', '/api/products/name/<path:product_name>/', 'GET', PRODUCTS_SERVICE, '/api/products/name/{product_name}/', 'Producto por nombre'),
+    Route('supplier_list', '/api/suppliers/', 'GET', PRODUCTS_SERVICE, '/api/suppliers/', 'Listar proveedores'),
+    Route('variable_list', '/api/variables/', 'GET', PRODUCTS_SERVICE, '/api/variables/', 'Listar variables'),
+    Route('warehouse_list', '/api/warehouses/', 'GET', INVENTORY_SERVICE, '/api/warehouses/', 'Listar bodegas'),
+    Route('warehouse_detail', '/api/warehouses/<int:warehouse_id>/', 'GET', INVENTORY_SERVICE, '/api/warehouses/{warehouse_id}/', 'Detalles de una bodega'),
+    Route('inventory_by_product', '/api/inventory/<path:product_name>/', 'GET', INVENTORY_SERVICE, '/api/inventory/{product_name}/', 'Inventario de un producto'),
+    Route('inventory_restock', '/api/inventory/<path:product_name>/restock/', 'POST', INVENTORY_SERVICE, '/api/inventory/{product_name}/restock/', 'Reabastecer inventario'),
+    Route('measurement_list', '/api/measurements/', 'GET', INVENTORY_SERVICE, '/api/measurements/', 'Listar mediciones'),
+    Route('order_list', '/api/orders/', 'GET', ORDERS_SERVICE, '/api/orders/', 'Listar pedidos'),
+    Route('order_detail', '/api/orders/<int:order_id>/', 'GET', ORDERS_SERVICE, '/api/orders/{order_id}/', 'Detalles de un pedido'),
+    Route('order_bulk', '/api/orders/bulk/', 'POST', ORDERS_SERVICE, '/api/orders/bulk/', 'Crear un pedido por línea de varios carritos'),
+    Route('place_order', '/api/orders/<path:product_name>/', 'POST', ORDERS_SERVICE, '/api/orders/{product_name}/', 'Crear un pedido'),
+    Route('create_order', '/api/orders/create/', 'POST', ORDERS_SERVICE, '/api/orders/create/', 'Crear una orden automática'),
+    Route('order_request_detail', '/api/orders/requests/<int:request_id>/', 'GET', ORDERS_SERVICE, '/api/orders/requests/{request_id}/', 'Estado de una solicitud de pedido asíncrona'),
+    Route('carrier_list', '/api/carriers/', 'GET', SHIPPING_SERVICE, '/api/carriers/', 'Listar transportadoras'),
+    Route('carrier_detail', '/api/carriers/<int:carrier_id>/', 'GET', SHIPPING_SERVICE, '/api/carriers/{carrier_id}/', 'Detalles de una transportadora'),
+    Route('shipping_guide_list', '/api/shipping/guides/', 'GET', SHIPPING_SERVICE, '/api/guides/', 'Listar guías de envío'),
+    Route('shipping_guide_detail', '/api/shipping/guides/<int:guide_id>/', 'GET', SHIPPING_SERVICE, '/api/guides/{guide_id}/', 'Detalles de una guía de envío'),
+    Route('shipping_guide_by_order', '/api/shipping/guides/order/<int:order_id>/', 'GET', SHIPPING_SERVICE, '/api/guides/order/{order_id}/', 'Guías de envío de un pedido'),
+    Route('generate_guide', '/api/shipping/guides/generate/', 'POST', SHIPPING_SERVICE, '/api/guides/generate/', 'Generar una guía de envío'),
+    Route('guide_statistics', '/api/shipping/guides/statistics/', 'GET', SHIPPING_SERVICE, '/api/guides/statistics/', 'Estadísticas de generación de guías'),
+]
+
+def request_identity_headers():
+    """Identidad verificada por authenticate() para reenviarla al microservicio, o None"""
+    if 'identity' not in g:
+        return None
+    return identity_headers(request.headers['Authorization'], g.identity)
+
+def request_forward_headers():
+    """Identidad verificada y cabeceras de FORWARDED_REQUEST_HEADERS que trae la petición, o None"""
+    headers = dict(request_identity_headers() or {})
+    headers.update({name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers})
+    return headers or None
+
+def make_proxy_view(route):
+    """Crea la vista Flask que reenvía una ruta de la tabla a su microservicio"""
+    def view(**kwargs):
+        path = route.path.format(**kwargs)
+        if CACHE_ENABLED and route.endpoint in CACHE_TTLS:
+            return cached_request(route, path)
+        headers = request_forward_headers()
+        timeout = None
+        if route.endpoint in ROUTE_DEADLINES:
+            timeout = remaining_budget(ROUTE_DEADLINES[route.endpoint], g.received_at, time.monotonic(),
+                                       request.headers.get(DEADLINE_HEADER))
+            if timeout < MIN_REMAINING_SECONDS:
+                return jsonify({'error': 'Se agotó el tiempo límite de la petición'}), 504
+            headers = {**(headers or {}), **deadline_headers(timeout)}
+        response = make_response(forward_request(route.service, path, route.method, headers=headers,
+                                                 hedge=HEDGE_POLICIES.get(route.endpoint), timeout=timeout,
+                                                 coalesce=route.endpoint not in STREAMED_ROUTES))
+        if route.endpoint in CACHE_INVALIDATIONS and response.status_code < 400:
+            RESPONSE_CACHE.invalidate(CACHE_INVALIDATIONS[route.endpoint])
+        return response
+    view.__name__ = route.endpoint
+    view.__doc__ = route.doc
+    return view
+
+for route in ROUTES:
+    app.add_url_rule(route.rule, route.endpoint, make_proxy_view(route), methods=[route.method])
+
+@app.before_request
+def mark_received():
+    """Instante de llegada: el presupuesto de tiempo de la petición incluye la espera en el control de admisión"""
+    g.received_at = time.monotonic()
+
+@app.before_request
+def authenticate():
+    """Verifica localmente el token de acceso (Authorization: Bearer) sin llamar a auth-service"""
+    token = bearer_token(request.headers.get('Authorization'))
+    if token is None or request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    try:
+        g.identity = TOKEN_VERIFIER.verify(token)
+    except InvalidToken as e:
+        return jsonify({'error': str(e)}), 401, {'WWW-Authenticate': 'Bearer'}
+
+@app.before_request
+def admit_request():
+    """Control de admisión: retiene en cola o rechaza con 429 las peticiones que superan el presupuesto"""
+    if not ADMISSION_ENABLED or request.endpoint is None or not request.path.startswith('/api/'):
+        return None
+    delay, retry_after = ADMISSION.admit(request.endpoint, client_key(g.get('identity'), request.remote_addr),
+                                         max_wait=WSGI_ADMISSION_MAX_WAIT)
+    if retry_after:
+        return (jsonify({'error': 'Demasiadas peticiones, intente de nuevo más tarde'}), 429,
+                {'Retry-After': str(math.ceil(retry_after))})
+    if delay:
+        time.sleep(delay)
 
 @app.route('/api/auth/verify/', methods=['GET'])
 def verify_token():
-    """Verificar token de autenticación"""
-    return forward_request(AUTH_SERVICE_URL, '/api/auth/verify/', 'GET')
-
-@app.route('/api/products/', methods=['GET'])
-def product_list():
-    """Listar productos"""
-    return forward_request(PRODUCTS_SERVICE_URL, '/api/products/', 'GET')
-
-@app.route('/api/products/<int:product_id>/', methods=['GET'])
-def product_detail(product_id):
-    """Detalles de un producto"""
-    return forward_request(PRODUCTS_SERVICE_URL, f'/api/products/{product_id}/', 'GET')
-
-@app.route('/api/products/create/', methods=['POST'])
-def product_create():
-    """Crear un producto"""
-    return forward_request(PRODUCTS_SERVICE_URL, '/api/products/create/', 'POST')
-
-@app.route('/api/products/name/<path:product_name>/', methods=['GET'])
-def product_by_name(product_name):
-    """Producto por nombre"""
-    return forward_request(PRODUCTS_SERVICE_URL, f'/api/products/name/{product_name}/', 'GET')
-
-@app.route('/api/suppliers/', methods=['GET'])
-def supplier_list():
-    """Listar proveedores"""
-    return forward_request(PRODUCTS_SERVICE_URL, '/api/suppliers/', 'GET')
-
-@app.route('/api/variables/', methods=['GET'])
-def variable_list():
-    """Listar variables"""
-    return forward_request(PRODUCTS_SERVICE_URL, '/api/variables/', 'GET')
-
-@app.route('/api/warehouses/', methods=['GET'])
-def warehouse_list():
-    """Listar bodegas"""
-    return forward_request(INVENTORY_SERVICE_URL, '/api/warehouses/', 'GET')
-
-@app.route('/api/warehouses/<int:warehouse_id>/', methods=['GET'])
-def warehouse_detail(warehouse_id):
-    """Detalles de una bodega"""
-    return forward_request(INVENTORY_SERVICE_URL, f'/api/warehouses/{warehouse_id}/', 'GET')
-
-@app.route('/api/inventory/<path:product_name>/', methods=['GET'])
-def inventory_by_product(product_name):
-    """Inventario de un producto"""
-    return forward_request(INVENTORY_SERVICE_URL, f'/api/inventory/{product_name}/', 'GET')
-
-@app.route('/api/inventory/<path:product_name>/restock/', methods=['POST'])
-def inventory_restock(product_name):
-    """Reabastecer inventario"""
-    return forward_request(INVENTORY_SERVICE_URL, f'/api/inventory/{product_name}/restock/', 'POST')
-
-@app.route('/api/measurements/', methods=['GET'])
-def measurement_list():
-    """Listar mediciones"""
-    return forward_request(INVENTORY_SERVICE_URL, '/api/measurements/', 'GET')
-
-@app.route('/api/orders/', methods=['GET'])
-def order_list():
-    """Listar pedidos"""
-    return forward_request(ORDERS_SERVICE_URL, '/api/orders/', 'GET')
-
-@app.route('/api/orders/<int:order_id>/', methods=['GET'])
-def order_detail(order_id):
-    """Detalles de un pedido"""
-    return forward_request(ORDERS_SERVICE_URL, f'/api/orders/{order_id}/', 'GET')
-
-@app.route('/api/orders/<path:product_name>/', methods=['POST'])
-def place_order(product_name):
-    """Crear un pedido"""
-    return forward_request(ORDERS_SERVICE_URL, f'/api/orders/{product_name}/', 'POST')
-
-@app.route('/api/orders/create/', methods=['POST'])
-def create_order():
-    """Crear una orden automática"""
-    return forward_request(ORDERS_SERVICE_URL, '/api/orders/create/', 'POST')
-
-@app.route('/api/carriers/', methods=['GET'])
-def carrier_list():
-    """Listar transportadoras"""
-    return forward_request(SHIPPING_SERVICE_URL, '/api/carriers/', 'GET')
-
-@app.route('/api/carriers/<int:carrier_id>/', methods=['GET'])
-def carrier_detail(carrier_id):
-    """Detalles de una transportadora"""
-    return forward_request(SHIPPING_SERVICE_URL, f'/api/carriers/{carrier_id}/', 'GET')
-
-@app.route('/api/shipping/guides/', methods=['GET'])
-def shipping_guide_list():
-    """Listar guías de envío"""
-    return forward_request(SHIPPING_SERVICE_URL, '/api/guides/', 'GET')
-
-@app.route('/api/shipping/guides/<int:guide_id>/', methods=['GET'])
-def shipping_guide_detail(guide_id):
-    """Detalles de una guía de envío"""
-    return forward_request(SHIPPING_SERVICE_URL, f'/api/guides/{guide_id}/', 'GET')
-
-@app.route('/api/shipping/guides/order/<int:order_id>/', methods=['GET'])
-def shipping_guide_by_order(order_id):
-    """Guías de envío de un pedido"""
-    return forward_request(SHIPPING_SERVICE_URL, f'/api/guides/order/{order_id}/', 'GET')
-
-@app.route('/api/shipping/guides/generate/', methods=['POST'])
-def generate_guide():
-    """Generar una guía de envío"""
-    return forward_request(SHIPPING_SERVICE_URL, '/api/guides/generate/', 'POST')
-
-@app.route('/api/shipping/guides/statistics/', methods=['GET'])
-def guide_statistics():
-    """Estadísticas de generación de guías"""
-    return forward_request(SHIPPING_SERVICE_URL, '/api/guides/statistics/', 'GET')
+    """Verificar token de autenticación: con token de acceso se responde sin llamar a auth-service"""
+    if 'identity' in g:
+        return jsonify({
+            'valid': True,
+            'user': {'id': int(g.identity['sub']), 'username': g.identity.get('username'), 'role': g.identity.get('role')},
+        }), 200
+    return forward_request(AUTH_SERVICE, '/api/auth/verify/', 'GET')
+
+@app.after_request
+def compress_response(response):
+    """Comprime con gzip/brotli las respuestas de texto o JSON que superan el tamaño mínimo"""
+    if (not COMPRESSION_ENABLED or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or 'Accept-Encoding' in response.vary
+            or not is_compressible(response.content_type)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        # Respuesta reenviada por bloques: se comprime a medida que llega
+        encoding = negotiate_encoding(response.content_type, response.content_length)
+        if encoding is None:
+            return response
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        encoding = negotiate_encoding(response.content_type, len(body))
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.route('/api/views/orders/<int:order_id>/', methods=['GET'])
+def order_view(order_id):
+    """Vista compuesta de un pedido: pedido, guías de envío, producto y bodega"""
+    try:
+        part_timeout = float(request.args.get('timeout', VIEW_PART_TIMEOUT))
+    except ValueError:
+        part_timeout = None
+    if part_timeout is None or not part_timeout > 0:
+        return jsonify({'error': 'timeout debe ser un número de segundos mayor que 0'}), 400
+    # Un cliente puede acortar el plazo de cada parte pero no retener los hilos más que GATEWAY_VIEW_PART_TIMEOUT
+    document, status = compose_order_view(
+        order_id, VIEW_EXECUTOR, ORDERS_SERVICE, SHIPPING_SERVICE, PRODUCTS_SERVICE, INVENTORY_SERVICE,
+        part_timeout=min(part_timeout, VIEW_PART_TIMEOUT),
+    )
+    return jsonify(document), status
+
+@app.route('/api/events/', methods=['GET'])
+def event_stream():
+    """Stream SSE de cambios de estado de pedidos y guías; se reanuda con Last-Event-ID (o ?last_event_id=)"""
+    if EVENT_HUB.clients >= EVENT_HUB.max_clients:
+        return jsonify({'error': 'Demasiados clientes conectados al stream de eventos'}), 503, {'Retry-After': '5'}
+    cursor = EVENT_HUB.parse_cursor(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    return Response(stream_events(EVENT_HUB, cursor, EVENTS_HEARTBEAT), mimetype='text/event-stream',
+                    headers=SSE_HEADERS)
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Ejecuta un arreglo de sub-peticiones {method, path, body} y devuelve sus resultados en el mismo orden"""
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify({'error': 'Payload: [{"method": "GET", "path": "/api/...", "body"?: {...}}, ...]'}), 400
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({'error': f'Máximo {BATCH_MAX_REQUESTS} sub-peticiones por lote'}), 400
+
+    concurrency = min(request.args.get('concurrency', BATCH_CONCURRENCY, type=int), BATCH_CONCURRENCY)
+    headers = {name: request.headers[name] for name in ('Cookie', 'Authorization') if name in request.headers}
+    return jsonify(run_batch(app, items, concurrency, headers, request.remote_addr)), 200
 
 @app.route('/health/', methods=['GET'])
 def health():
     """Health check del API Gateway"""
     return jsonify({'status': 'ok', 'service': 'api-gateway'}), 200
 
+@app.route('/ready/', methods=['GET'])
+def ready():
+    """Readiness del API Gateway: listo para recibir tráfico, con el estado de cada microservicio"""
+    return jsonify({
+        'status': 'ready',
+        'upstreams': {
+            service.name: {
+                'breaker': service.breaker.state,
+                'healthy_instances': sum(1 for instance in service.balancer.stats() if instance['healthy']),
+            }
+            for service in UPSTREAMS
+        },
+    }), 200
+
+@app.route('/gateway/stats/', methods=['GET'])
+def gateway_stats():
+    """Contadores de uso de los pools de conexiones, del hedging y de la caché de respuestas"""
+    return jsonify({
+        'engine': 'wsgi',
+        'upstreams': {service.name: service.stats() for service in UPSTREAMS},
+        'hedging': {endpoint: policy.stats() for endpoint, policy in HEDGE_POLICIES.items()},
+        'cache': RESPONSE_CACHE.stats(),
+        'auth': TOKEN_VERIFIER.stats(),
+        'admission': ADMISSION.stats(),
+        'events': EVENT_HUB.stats(),
+    }), 200
+
 @app.route('/')
 def index():
     """Servir el frontend"""
-    try:
-        return send_from_directory(FRONTEND_DIR, 'index.html')
-    except:
+    response = frontend_response('index.html')
+    if response is None:
         return jsonify({'message': 'Frontend no disponible. Usa los endpoints de la API.'}), 404
+    return response
+
+@app.route('/<path:filename>')
+def frontend_file(filename):
+    """Archivos estáticos del frontend"""
+    response = frontend_response(filename)
+    if response is None:
+        abort(404)
+    return response
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,502 @@
+"""
+Motor asíncrono (ASGI) del API Gateway
+
+Atiende la misma tabla de rutas de app.py sobre un event loop, con clientes HTTP
+no bloqueantes hacia los microservicios. Las rutas propias del gateway (health,
+frontend, ...) se delegan a la aplicación Flask.
+
+Uso: uvicorn asgi:application --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from urllib.parse import parse_qsl
+import httpx
+from a2wsgi import WSGIMiddleware
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags, quote_etag
+from app import (
+    app as flask_app, ROUTES, UPSTREAMS, CACHE_ENABLED, CACHE_TTLS, CACHE_INVALIDATIONS, RESPONSE_CACHE,
+    PASSTHROUGH, PASSTHROUGH_HEADERS, STREAM_CHUNK_SIZE, HEDGE_POLICIES, COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE,
+    TOKEN_VERIFIER, PUBLIC_ENDPOINTS, ADMISSION_ENABLED, ADMISSION, EVENT_HUB, EVENTS_HEARTBEAT, FORWARDED_REQUEST_HEADERS,
+    ROUTE_DEADLINES, STREAMED_ROUTES,
+)
+from admission import client_key
+from deadline import DEADLINE_HEADER, MIN_REMAINING_SECONDS, deadline_headers, remaining_budget
+from events import stream_events_async
+from tokens import InvalidToken, bearer_token, identity_headers
+from compression import choose_encoding, is_compressible, compress, compress_cached, StreamCompressor
+from cache import make_key
+from singleflight import AsyncSingleFlight
+from resilience import Bulkhead, BulkheadFullError, CircuitOpenError, UpstreamRejected
+
+ASYNC_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MAX_CONNECTIONS', 1000))
+
+
+class AsyncUpstreamClient:
+    """Cliente HTTP no bloqueante para un microservicio, con los mismos contadores que UpstreamClient"""
+
+    def __init__(self, upstream, max_connections=ASYNC_MAX_CONNECTIONS):
+        self.name = upstream.name
+        self.pool_size = upstream.pool_size
+        self.timeout = upstream.timeout
+        self.coalesce = upstream.coalesce
+        self.single_flight = AsyncSingleFlight()
+        # Las réplicas y el estado del circuito se comparten con el cliente síncrono del mismo microservicio
+        self.balancer = upstream.balancer
+        self.breaker = upstream.breaker
+        self.bulkhead = Bulkhead(max_connections)
+        self.max_connections = max_connections
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=self.pool_size),
+        )
+
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def request(self, method, path, stream=False, hedge=None, coalesce=True, **kwargs):
+        """
+        Envía una petición; los GET idénticos y concurrentes comparten una sola llamada.
+        Con `hedge` (HedgePolicy) los GET lentos se repiten en otra réplica. Con
+        coalesce=False el GET no se agrupa y, con stream=True, su cuerpo se lee por bloques.
+        """
+        def call(stream):
+            if method == 'GET' and hedge is not None:
+                return self.hedged_send(method, path, hedge, stream=stream, **kwargs)
+            return self.send(method, path, stream=stream, **kwargs)
+
+        if method == 'GET' and self.coalesce and coalesce:
+            # La respuesta agrupada se comparte entre varios clientes, así que se lee completa
+            key = path, tuple(sorted((kwargs.get('headers') or {}).items()))
+            return await self.single_flight.do(key, lambda: buffer_response(call(True)))
+        return await call(stream)
+
+    async def send(self, method, path, stream=False, exclude=None, on_instance=None, **kwargs):
+        """Envía una petición sin bloquear el event loop; con stream=True el cuerpo se lee después"""
+        if not self.bulkhead.try_acquire():
+            raise BulkheadFullError(f'Demasiadas peticiones simultáneas hacia {self.name}')
+        if not self.breaker.allow():
+            self.bulkhead.release()
+            raise CircuitOpenError(f'Circuito abierto para {self.name}', self.breaker.retry_after())
+
+        self.requests_total += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        instance = self.balancer.acquire(exclude=exclude)
+        if on_instance is not None:
+            on_instance(instance)
+        try:
+            request = self.client.build_request(method, f"{instance.url}{path}", **kwargs)
+            response = await self.client.send(request, stream=stream)
+        except httpx.HTTPError as e:
+            self.balancer.release(instance, False)
+            self.breaker.record(False, timeout=isinstance(e, httpx.TimeoutException))
+            self.errors_total += 1
+            raise
+        except asyncio.CancelledError:
+            # Intento de hedging descartado: no cuenta como fallo de la réplica
+            self.balancer.release(instance, None)
+            self.breaker.abandon()
+            raise
+        finally:
+            self.bulkhead.release()
+            self.in_flight -= 1
+        self.balancer.release(instance, response.status_code < 500)
+        self.breaker.record(response.status_code < 500)
+        return response
+
+    async def hedged_send(self, method, path, policy, **kwargs):
+        """Mismo hedging que UpstreamClient.hedged_send; el intento que pierde se cancela"""
+        delay = policy.delay()
+        if delay is None:
+            return await self.timed_send(policy, method, path, **kwargs)
+
+        first_instance = []
+        primary = asyncio.ensure_future(
+            self.timed_send(policy, method, path, on_instance=first_instance.append, **kwargs))
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not policy.try_hedge():
+                return await primary
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+
+        hedge = asyncio.ensure_future(
+            self.timed_send(policy, method, path, exclude=first_instance[0] if first_instance else None, **kwargs))
+        pending = {primary, hedge}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+        finally:
+            for task in (primary, hedge):
+                if task is not winner:
+                    task.cancel()
+                    task.add_done_callback(close_discarded)
+
+        if winner is None:
+            # Ambos intentos fallaron: se informa el error del primero
+            return await primary
+        if winner is hedge:
+            policy.record_win()
+        return winner.result()
+
+    async def timed_send(self, policy, method, path, **kwargs):
+        """send() que registra su latencia en la política de hedging"""
+        started = time.monotonic()
+        response = await self.send(method, path, **kwargs)
+        policy.record(time.monotonic() - started)
+        return response
+
+    def stats(self):
+        """Contadores de uso del cliente"""
+        return {
+            'instances': self.balancer.stats(),
+            'pool_size': self.pool_size,
+            'max_connections': self.max_connections,
+            'timeout': self.timeout,
+            'requests_total': self.requests_total,
+            'errors_total': self.errors_total,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'coalescing': self.single_flight.stats(),
+            'breaker': self.breaker.stats(),
+            'bulkhead': self.bulkhead.stats(),
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+async def buffer_response(pending):
+    """Versión asíncrona de buffer_response de upstream.py: guarda los bytes tal como llegaron en `encoded_content`"""
+    response = await pending
+    try:
+        encoded = b''.join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    shared = httpx.Response(response.status_code, headers=response.headers, content=encoded, request=response.request)
+    shared.encoded_content = encoded
+    return shared
+
+
+def close_discarded(task):
+    """Cierra la respuesta del intento que perdió (si llegó a tenerla) para liberar su conexión"""
+    if not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(task.result().aclose())
+
+
+class AsyncGateway:
+    """Aplicación ASGI que reenvía las rutas de la tabla ROUTES a los microservicios"""
+
+    def __init__(self, flask_app, routes, upstreams):
+        self.routes = {route.endpoint: route for route in routes}
+        self.url_adapter = flask_app.url_map.bind('gateway')
+        self.upstreams = {upstream.name: AsyncUpstreamClient(upstream) for upstream in upstreams}
+        self.fallback = WSGIMiddleware(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        received_at = time.monotonic()
+        endpoint, kwargs = self.match(scope)
+        if endpoint == 'gateway_stats':
+            await self.send_json(send, 200, self.stats(), scope)
+            return
+
+        route = self.routes.get(endpoint)
+        is_event_stream = endpoint == 'event_stream' and scope['method'] == 'GET'
+        if not is_event_stream and (route is None or route.method != scope['method']):
+            await self.fallback(scope, receive, send)
+            return
+
+        claims = headers = None
+        authorization = dict(scope.get('headers', [])).get(b'authorization', b'').decode('latin-1')
+        token = bearer_token(authorization)
+        if token is not None and endpoint not in PUBLIC_ENDPOINTS:
+            try:
+                claims = TOKEN_VERIFIER.verify(token)
+            except InvalidToken as e:
+                await self.send_json(send, 401, {'error': str(e)}, scope, [(b'www-authenticate', b'Bearer')])
+                return
+            headers = identity_headers(authorization, claims)
+
+        if ADMISSION_ENABLED:
+            client = scope.get('client') or ('', 0)
+            delay, retry_after = ADMISSION.admit(endpoint, client_key(claims, client[0]))
+            if retry_after:
+                await self.send_json(send, 429, {'error': 'Demasiadas peticiones, intente de nuevo más tarde'}, scope,
+                                     [(b'retry-after', str(math.ceil(retry_after)).encode('latin-1'))])
+                return
+            if delay:
+                await asyncio.sleep(delay)
+
+        if is_event_stream:
+            await self.event_stream(scope, receive, send)
+            return
+        await self.proxy(route, kwargs, scope, receive, send, headers, received_at)
+
+    def match(self, scope):
+        """Resuelve el endpoint de Flask que corresponde a la petición"""
+        if scope['type'] != 'http':
+            return None, {}
+        try:
+            return self.url_adapter.match(scope['path'], scope['method'])
+        except HTTPException:
+            return None, {}
+
+    async def proxy(self, route, kwargs, scope, receive, send, headers=None, received_at=None):
+        """Reenvía la petición al microservicio y devuelve su respuesta tal cual"""
+        upstream = self.upstreams[route.service.name]
+        path = route.path.format(**kwargs)
+        query_string = scope.get('query_string', b'').decode('latin-1')
+        if CACHE_ENABLED and route.endpoint in CACHE_TTLS:
+            await self.cached_proxy(route, upstream, path, query_string, scope, send)
+            return
+
+        request_kwargs = {'headers': dict(headers or {})}
+        client_headers = dict(scope.get('headers', []))
+        for name in FORWARDED_REQUEST_HEADERS:
+            if name.lower().encode('latin-1') in client_headers:
+                request_kwargs['headers'][name] = client_headers[name.lower().encode('latin-1')].decode('latin-1')
+        if route.endpoint in ROUTE_DEADLINES:
+            client_deadline = client_headers.get(DEADLINE_HEADER.lower().encode('latin-1'), b'').decode('latin-1')
+            remaining = remaining_budget(ROUTE_DEADLINES[route.endpoint], received_at or time.monotonic(),
+                                         time.monotonic(), client_deadline)
+            if remaining < MIN_REMAINING_SECONDS:
+                await self.send_json(send, 504, {'error': 'Se agotó el tiempo límite de la petición'}, scope)
+                return
+            request_kwargs['headers'].update(deadline_headers(remaining))
+            request_kwargs['timeout'] = remaining
+        if route.method == 'GET':
+            if query_string:
+                path = f"{path}?{query_string}"
+        else:
+            request_kwargs['content'] = await self.read_body(receive)
+            request_kwargs['headers']['Content-Type'] = 'application/json'
+
+        try:
+            response = await upstream.request(route.method, path, stream=PASSTHROUGH,
+                                              hedge=HEDGE_POLICIES.get(route.endpoint),
+                                              coalesce=route.endpoint not in STREAMED_ROUTES, **request_kwargs)
+        except (httpx.HTTPError, UpstreamRejected) as e:
+            await self.send_upstream_error(send, e, scope)
+            return
+
+        if route.endpoint in CACHE_INVALIDATIONS and response.status_code < 400:
+            RESPONSE_CACHE.invalidate(CACHE_INVALIDATIONS[route.endpoint])
+        await self.send_upstream_response(send, response, scope)
+
+    async def cached_proxy(self, route, upstream, path, query_string, scope, send):
+        """Versión asíncrona de cached_request de app.py"""
+        key = make_key(path, parse_qsl(query_string, keep_blank_values=True))
+        entry = RESPONSE_CACHE.get(key)
+        cache_status = b'HIT'
+        if entry is None:
+            cache_status = b'MISS'
+            generation = RESPONSE_CACHE.generation
+            try:
+                response = await upstream.request('GET', f"{path}?{query_string}" if query_string else path,
+                                                  hedge=HEDGE_POLICIES.get(route.endpoint))
+            except (httpx.HTTPError, UpstreamRejected) as e:
+                await self.send_upstream_error(send, e, scope)
+                return
+            if response.status_code != 200:
+                await self.send_upstream_response(send, response, scope)
+                return
+            content_type = response.headers.get('content-type', 'application/json')
+            entry = RESPONSE_CACHE.set(key, route.endpoint, response.content, content_type,
+                                      CACHE_TTLS[route.endpoint], generation)
+
+        encoding = self.negotiate_encoding(scope, entry.content_type, len(entry.body))
+        etag = f'{entry.etag}-{encoding}' if encoding else entry.etag
+        extra_headers = [(b'etag', quote_etag(etag).encode('latin-1')), (b'x-cache', cache_status)]
+        if COMPRESSION_ENABLED:
+            extra_headers.append((b'vary', b'Accept-Encoding'))
+        if_none_match = dict(scope.get('headers', [])).get(b'if-none-match')
+        if if_none_match and parse_etags(if_none_match.decode('latin-1')).contains(etag):
+            await self.send_body(send, 304, b'', entry.content_type, scope, extra_headers)
+        elif encoding:
+            extra_headers.append((b'content-encoding', encoding.encode('latin-1')))
+            await self.send_body(send, 200, compress_cached(RESPONSE_CACHE, key, entry, encoding), entry.content_type, scope, extra_headers)
+        else:
+            await self.send_body(send, 200, entry.body, entry.content_type, scope, extra_headers)
+
+    async def event_stream(self, scope, receive, send):
+        """Versión asíncrona de event_stream de app.py: cada cliente espera en el event loop, sin ocupar un hilo"""
+        if EVENT_HUB.clients >= EVENT_HUB.max_clients:
+            await self.send_json(send, 503, {'error': 'Demasiados clientes conectados al stream de eventos'}, scope,
+                                 [(b'retry-after', b'5')])
+            return
+        last_event_id = dict(scope.get('headers', [])).get(b'last-event-id', b'').decode('latin-1')
+        if not last_event_id:
+            last_event_id = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'))).get('last_event_id')
+        events = stream_events_async(EVENT_HUB, EVENT_HUB.parse_cursor(last_event_id), EVENTS_HEARTBEAT)
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            *self.cors_headers(scope),
+        ]})
+        # El servidor no avisa de la desconexión al enviar: se detecta con receive()
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            while True:
+                chunk = asyncio.ensure_future(events.__anext__())
+                await asyncio.wait({chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not chunk.done():
+                    chunk.cancel()
+                    await asyncio.wait({chunk})
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.result().encode('utf-8'), 'more_body': True})
+        finally:
+            disconnected.cancel()
+            await events.aclose()
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    def stats(self):
+        return {
+            'engine': 'asgi',
+            'upstreams': {name: upstream.stats() for name, upstream in self.upstreams.items()},
+            'hedging': {endpoint: policy.stats() for endpoint, policy in HEDGE_POLICIES.items()},
+            'cache': RESPONSE_CACHE.stats(),
+            'auth': TOKEN_VERIFIER.stats(),
+            'admission': ADMISSION.stats(),
+            'events': EVENT_HUB.stats(),
+        }
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for upstream in self.upstreams.values():
+                    await upstream.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def read_body(receive):
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        return body
+
+    async def send_upstream_response(self, send, response, scope):
+        """Envía los bytes y cabeceras del microservicio; si el cuerpo no se ha leído, lo reenvía por bloques"""
+        headers = [(name.lower().encode('latin-1'), response.headers[name].encode('latin-1'))
+                   for name in PASSTHROUGH_HEADERS if name in response.headers]
+        encoded = getattr(response, 'encoded_content', None)
+        if encoded is not None and 'content-encoding' in response.headers:
+            # Respuesta agrupada que llegó comprimida: se reenvían los bytes originales con su codificación
+            await send({'type': 'http.response.start', 'status': response.status_code,
+                        'headers': headers + self.cors_headers(scope)})
+            await send({'type': 'http.response.body', 'body': encoded})
+            return
+        if response.is_stream_consumed:
+            # httpx ya descomprimió el cuerpo: no aplica la codificación original
+            extra_headers = [header for header in headers
+                             if header[0] not in (b'content-type', b'content-encoding', b'content-length')]
+            content_type = response.headers.get('content-type', 'application/json')
+            body = response.content
+            encoding = self.negotiate_encoding(scope, content_type, len(body))
+            if encoding:
+                body = compress(body, encoding)
+                extra_headers = self.compressed_headers(extra_headers, encoding)
+            await self.send_body(send, response.status_code, body, content_type, scope, extra_headers)
+            return
+
+        compressor = None
+        if 'content-encoding' not in response.headers:
+            content_length = response.headers.get('content-length')
+            encoding = self.negotiate_encoding(scope, response.headers.get('content-type'),
+                                               int(content_length) if content_length else None)
+            if encoding:
+                compressor = StreamCompressor(encoding)
+                headers = self.compressed_headers([header for header in headers if header[0] != b'content-length'],
+                                                  encoding)
+        try:
+            await send({'type': 'http.response.start', 'status': response.status_code,
+                        'headers': headers + self.cors_headers(scope)})
+            async for chunk in response.aiter_raw(STREAM_CHUNK_SIZE):
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': compressor.flush() if compressor is not None else b''})
+        finally:
+            await response.aclose()
+
+    @staticmethod
+    def negotiate_encoding(scope, content_type, size=None):
+        """Versión asíncrona de negotiate_encoding de app.py"""
+        if not COMPRESSION_ENABLED or not is_compressible(content_type):
+            return None
+        if size is not None and size < COMPRESSION_MIN_SIZE:
+            return None
+        accept_encoding = dict(scope.get('headers', [])).get(b'accept-encoding', b'')
+        return choose_encoding(accept_encoding.decode('latin-1'))
+
+    @staticmethod
+    def compressed_headers(headers, encoding):
+        """Cabeceras de una respuesta comprimida en el gateway: el ETag del microservicio pasa a ser débil"""
+        compressed = []
+        for name, value in headers:
+            if name == b'etag' and not value.startswith(b'W/'):
+                value = b'W/' + value
+            compressed.append((name, value))
+        return compressed + [(b'content-encoding', encoding.encode('latin-1')), (b'vary', b'Accept-Encoding')]
+
+    async def send_upstream_error(self, send, e, scope):
+        extra_headers = []
+        if isinstance(e, CircuitOpenError):
+            extra_headers.append((b'retry-after', str(max(round(e.retry_after), 1)).encode('latin-1')))
+        await self.send_json(send, 503, {'error': f'Error al comunicarse con el servicio: {str(e)}'}, scope, extra_headers)
+
+    async def send_json(self, send, status, payload, scope, extra_headers=()):
+        await self.send_body(send, status, json.dumps(payload).encode('utf-8'), 'application/json', scope, extra_headers)
+
+    async def send_body(self, send, status, body, content_type, scope, extra_headers=()):
+        headers = [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *extra_headers,
+            *self.cors_headers(scope),
+        ]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    def cors_headers(scope):
+        """Equivalente a CORS(app, supports_credentials=True) de la aplicación Flask"""
+        origin = dict(scope.get('headers', [])).get(b'origin')
+        if not origin:
+            return []
+        return [
+            (b'access-control-allow-origin', origin),
+            (b'access-control-allow-credentials', b'true'),
+            (b'vary', b'Origin'),
+        ]
+
+application = AsyncGateway(flask_app, ROUTES, UPSTREAMS)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('PORT', 8000)))
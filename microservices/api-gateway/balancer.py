@@ -0,0 +1,87 @@
+"""
+Balanceo de carga entre réplicas de un microservicio (least-outstanding-requests)
+"""
+import random
+import threading
+import time
+
+
+class Instance:
+    """Réplica de un microservicio con sus peticiones en curso y su estado de salud pasivo"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests_total = 0
+        self.failures_total = 0
+        self.times_ejected = 0
+
+    def is_available(self, now):
+        return self.ejected_until <= now
+
+    def stats(self, now):
+        return {
+            'url': self.url,
+            'healthy': self.is_available(now),
+            'outstanding': self.outstanding,
+            'requests_total': self.requests_total,
+            'failures_total': self.failures_total,
+            'times_ejected': self.times_ejected,
+        }
+
+
+class LeastOutstandingBalancer:
+    """
+    Elige la réplica con menos peticiones en curso; los empates se resuelven al azar.
+
+    Una réplica con `max_failures` errores seguidos se saca de rotación durante
+    `ejection_seconds` y vuelve a admitirse pasado ese tiempo. Si todas están
+    fuera de rotación se usa igualmente la que salió primero, para no rechazar
+    peticiones por un fallo de detección.
+    """
+
+    def __init__(self, urls, max_failures=3, ejection_seconds=30):
+        self.instances = [Instance(url) for url in urls]
+        self.max_failures = max_failures
+        self.ejection_seconds = ejection_seconds
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude=None):
+        """Reserva una réplica para una petición; hay que devolverla con release()"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [instance for instance in self.instances if instance is not exclude] or self.instances
+            available = [instance for instance in candidates if instance.is_available(now)]
+            if available:
+                fewest = min(instance.outstanding for instance in available)
+                instance = random.choice([i for i in available if i.outstanding == fewest])
+            else:
+                instance = min(candidates, key=lambda i: i.ejected_until)
+            instance.outstanding += 1
+            instance.requests_total += 1
+            return instance
+
+    def release(self, instance, success):
+        """
+        Devuelve la réplica y actualiza su salud con el resultado de la petición
+        (success=None si la petición se abandonó sin resultado).
+        """
+        with self._lock:
+            instance.outstanding -= 1
+            if success is None:
+                return
+            if success:
+                instance.consecutive_failures = 0
+                return
+            instance.failures_total += 1
+            instance.consecutive_failures += 1
+            if instance.consecutive_failures >= self.max_failures and len(self.instances) > 1:
+                instance.ejected_until = time.monotonic() + self.ejection_seconds
+                instance.consecutive_failures = 0
+                instance.times_ejected += 1
+
+    def stats(self):
+        now = time.monotonic()
+        return [instance.stats(now) for instance in self.instances]
@@ -0,0 +1,46 @@
+"""
+Ejecución por lotes: varias peticiones del API Gateway en una sola llamada HTTP
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+# Rutas que no pueden ir en un lote: el propio lote y el stream de eventos, que no termina
+EXCLUDED_PATHS = ('/api/batch', '/api/events')
+
+
+def run_sub_request(app, item, headers, remote_addr=None):
+    """Despacha una sub-petición por la tabla de rutas del gateway y devuelve {status, body}"""
+    if not isinstance(item, dict):
+        return {'status': 400, 'body': {'error': 'Cada sub-petición debe ser un objeto {method, path, body}'}}
+
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in BATCH_METHODS:
+        return {'status': 405, 'body': {'error': 'Método no soportado'}}
+    if not isinstance(path, str) or not path.startswith('/api/') or path.startswith(EXCLUDED_PATHS):
+        return {'status': 400, 'body': {'error': 'path debe ser una ruta /api/ del gateway'}}
+
+    # La IP del cliente original se conserva para el control de admisión de cada sub-petición
+    request_options = {'method': method, 'headers': headers, 'environ_base': {'REMOTE_ADDR': remote_addr or '127.0.0.1'}}
+    if method in ('POST', 'PUT'):
+        request_options['json'] = item.get('body') or {}
+
+    with app.test_request_context(path, **request_options):
+        response = app.full_dispatch_request()
+        data = response.get_data()
+        response.close()
+
+    try:
+        body = json.loads(data) if data else None
+    except ValueError:
+        body = data.decode('utf-8', errors='replace')
+    return {'status': response.status_code, 'body': body}
+
+
+def run_batch(app, items, concurrency, headers, remote_addr=None):
+    """Ejecuta las sub-peticiones con a lo sumo `concurrency` en paralelo, conservando el orden"""
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(min(concurrency, len(items)), 1)) as executor:
+        return list(executor.map(lambda item: run_sub_request(app, item, headers, remote_addr), items))
@@ -0,0 +1,141 @@
+"""
+Benchmark del API Gateway: motor Flask (WSGI con hilos) vs motor asíncrono (ASGI)
+
+Levanta un microservicio simulado que tarda --delay segundos en responder (como
+la generación de guías con la transportadora), arranca el gateway con cada motor
+apuntando a él y lanza --requests peticiones con distintos niveles de concurrencia.
+
+Uso: python benchmark.py --delay 2 --concurrency 50 200 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+BENCH_PATH = '/api/shipping/guides/statistics/'
+
+
+async def slow_service(scope, receive, send):
+    """Microservicio simulado: espera SLOW_SERVICE_DELAY segundos y responde JSON"""
+    if scope['type'] != 'http':
+        return
+    await asyncio.sleep(float(os.environ.get('SLOW_SERVICE_DELAY', 1)))
+    body = json.dumps({'total_guides': 0, 'generated': 0, 'failed': 0}).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def start_process(args, env):
+    return subprocess.Popen(args, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} no respondió a tiempo')
+
+
+async def fetch(host, port, path):
+    """GET mínimo sobre asyncio para que el cliente no sea el cuello de botella"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def run_load(port, total, concurrency, path=BENCH_PATH):
+    """Lanza `total` peticiones con `concurrency` en vuelo y mide latencias"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if await asyncio.wait_for(fetch('127.0.0.1', port, path), 120) != 200:
+                    errors += 1
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'throughput': total / elapsed,
+        'p50': latencies[int(len(latencies) * 0.50)],
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=2.0, help='Latencia del microservicio simulado (s)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--requests', type=int, default=0, help='Peticiones por nivel (por defecto 2x la concurrencia)')
+    parser.add_argument('--port', type=int, default=18000)
+    args = parser.parse_args()
+
+    service_port, flask_port, asgi_port = args.port, args.port + 1, args.port + 2
+    env = dict(os.environ, SLOW_SERVICE_DELAY=str(args.delay),
+               SHIPPING_SERVICE_URL=f'http://127.0.0.1:{service_port}',
+               SHIPPING_SERVICE_TIMEOUT=str(args.delay * 10),
+               ASYNC_MAX_CONNECTIONS=str(max(args.concurrency)),
+               # El bulkhead del motor Flask se dimensiona igual que el límite de conexiones del motor ASGI
+               SHIPPING_SERVICE_MAX_CONCURRENCY=str(max(args.concurrency)),
+               # Los GET idénticos simultáneos se agruparían en una sola llamada al microservicio
+               GATEWAY_COALESCE_GETS='False',
+               # Todas las peticiones salen de 127.0.0.1: el presupuesto por cliente las rechazaría con 429
+               GATEWAY_ADMISSION='False')
+
+    uvicorn = [sys.executable, '-m', 'uvicorn', '--log-level', 'warning', '--backlog', '4096']
+    engines = {
+        'flask': [sys.executable, '-c',
+                  f"from app import app; app.run(host='127.0.0.1', port={flask_port}, threaded=True)"],
+        'asgi': uvicorn + ['--port', str(asgi_port), 'asgi:application'],
+    }
+    ports = {'flask': flask_port, 'asgi': asgi_port}
+
+    processes = [start_process(uvicorn + ['--port', str(service_port), 'benchmark:slow_service'], env)]
+    try:
+        for name, command in engines.items():
+            processes.append(start_process(command, env))
+        for name, port in ports.items():
+            wait_until_ready(f'http://127.0.0.1:{port}/health/')
+
+        print(f"{'motor':<8}{'concurrencia':>14}{'req/s':>10}{'p50 (s)':>10}{'p99 (s)':>10}{'errores':>10}")
+        for concurrency in args.concurrency:
+            total = args.requests or concurrency * 2
+            for name, port in ports.items():
+                result = asyncio.run(run_load(port, total, concurrency))
+                print(f"{name:<8}{concurrency:>14}{result['throughput']:>10.1f}"
+                      f"{result['p50']:>10.3f}{result['p99']:>10.3f}{result['errors']:>10}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
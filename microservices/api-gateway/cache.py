@@ -0,0 +1,109 @@
+"""
+Caché de respuestas del API Gateway con TTL por ruta, desalojo LRU y ETag
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+
+# variants: cuerpos ya comprimidos por codificación (gzip, br), se llenan al servir la entrada con add_variant
+CacheEntry = namedtuple('CacheEntry', ['endpoint', 'body', 'content_type', 'etag', 'expires_at', 'variants'])
+
+
+def make_key(path, query_items):
+    """Llave de caché: ruta del microservicio + query string normalizado"""
+    return f"{path}?{urlencode(sorted(query_items))}"
+
+
+class ResponseCache:
+    """Caché LRU en memoria, acotada por número de entradas y por bytes"""
+
+    def __init__(self, max_entries=1000, max_bytes=50 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Se incrementa en cada invalidación para descartar respuestas pedidas antes de ella
+        self.generation = 0
+
+    @staticmethod
+    def make_etag(body):
+        """ETag fuerte (sin comillas) derivado del contenido de la respuesta"""
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def get(self, key):
+        """Devuelve la entrada vigente para la llave o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, endpoint, body, content_type, ttl, generation=None):
+        """Guarda una respuesta y desaloja las menos usadas si se supera el límite"""
+        entry = CacheEntry(endpoint, body, content_type, self.make_etag(body), time.monotonic() + ttl, {})
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.size_bytes += len(body)
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def add_variant(self, key, entry, encoding, body):
+        """Guarda el cuerpo comprimido de una entrada y lo cuenta en size_bytes; no guarda nada si la entrada ya salió de la caché"""
+        with self._lock:
+            if self._entries.get(key) is not entry or encoding in entry.variants:
+                return entry.variants.get(encoding, body)
+            entry.variants[encoding] = body
+            self.size_bytes += len(body)
+            while self.size_bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return body
+
+    def invalidate(self, endpoints):
+        """Elimina todas las entradas de los endpoints indicados"""
+        endpoints = set(endpoints)
+        with self._lock:
+            self.generation += 1
+            keys = [key for key, entry in self._entries.items() if entry.endpoint in endpoints]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size_bytes -= len(entry.body) + sum(len(body) for body in entry.variants.values())
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'size_bytes': self.size_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
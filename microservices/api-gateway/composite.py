@@ -0,0 +1,77 @@
+"""
+Vistas compuestas del API Gateway: combinan en una sola respuesta datos de varios microservicios
+"""
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import requests
+
+
+class PartError(Exception):
+    """Una de las partes de la vista compuesta no se pudo obtener"""
+
+    def __init__(self, message, status_code=503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def fetch_part(service, path, timeout):
+    """GET a un microservicio que devuelve el JSON o lanza PartError (también si el cuerpo no es JSON)"""
+    try:
+        response = service.request('GET', path, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        raise PartError(f'Error al comunicarse con el servicio {service.name}: {str(e)}')
+    if response.status_code != 200:
+        raise PartError(f'El servicio {service.name} respondió {response.status_code}', response.status_code)
+    try:
+        return response.json()
+    except ValueError:
+        raise PartError(f'El servicio {service.name} respondió un cuerpo que no es JSON', 502)
+
+
+class PendingPart:
+    """Parte en curso con su propio plazo, contado desde que se lanzó"""
+
+    def __init__(self, executor, service, path, timeout):
+        self.future = executor.submit(fetch_part, service, path, timeout)
+        self.deadline = time.monotonic() + timeout
+
+    def result(self):
+        try:
+            return self.future.result(timeout=max(self.deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            raise PartError('Tiempo de espera agotado', 504)
+
+
+def compose_order_view(order_id, executor, orders, shipping, products, inventory, part_timeout):
+    """
+    Pedido + guías de envío + producto + bodega en un solo documento.
+
+    El pedido y sus guías se piden a la vez; el producto y la bodega se piden en
+    cuanto llega el pedido. Si una parte distinta del pedido falla o se demora más
+    de `part_timeout`, el documento se devuelve parcial con el error de esa parte.
+    """
+    started = time.monotonic()
+    order_part = PendingPart(executor, orders, f'/api/orders/{order_id}/', part_timeout)
+    parts = {'shipping_guides': PendingPart(executor, shipping, f'/api/guides/order/{order_id}/', part_timeout)}
+
+    try:
+        order = order_part.result()
+    except PartError as e:
+        return {'error': str(e)}, e.status_code
+
+    parts['product'] = PendingPart(executor, products, f"/api/products/{order['product_id']}/", part_timeout)
+    if order.get('warehouse_id'):
+        parts['warehouse'] = PendingPart(executor, inventory, f"/api/warehouses/{order['warehouse_id']}/", part_timeout)
+
+    document = {'order': order, 'shipping_guides': None, 'product': None, 'warehouse': None}
+    errors = {}
+    for name, part in parts.items():
+        try:
+            document[name] = part.result()
+        except PartError as e:
+            errors[name] = str(e)
+
+    document['partial'] = bool(errors)
+    document['errors'] = errors
+    document['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+    return document, 200
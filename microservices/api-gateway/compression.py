@@ -0,0 +1,127 @@
+"""
+Compresión de respuestas del API Gateway (gzip y, si está instalado, brotli) según Accept-Encoding
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+from collections import namedtuple
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# Los eventos SSE se entregan uno a uno: comprimirlos por bloques los retendría en el compresor
+UNCOMPRESSED_TYPES = ('text/event-stream',)
+
+StaticAsset = namedtuple('StaticAsset', ['body', 'content_type', 'etag', 'variants'])
+
+
+def choose_encoding(accept_encoding):
+    """Codificación preferida que acepta el cliente (br antes que gzip) o None"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type):
+    return (bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(UNCOMPRESSED_TYPES))
+
+
+def compress(body, encoding, static=False):
+    """Comprime un cuerpo completo; `static=True` usa el nivel máximo (se hace una sola vez)"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if static else 4)
+    return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+
+
+def compress_cached(cache, key, entry, encoding):
+    """Cuerpo de una entrada de la caché de respuestas en la codificación pedida, comprimido una sola vez"""
+    body = entry.variants.get(encoding)
+    if body is None:
+        body = cache.add_variant(key, entry, encoding, compress(entry.body, encoding))
+    return body
+
+
+class StreamCompressor:
+    """Compresión incremental para las respuestas que se reenvían por bloques"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=4)
+        else:
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def flush(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Generador que comprime un iterable de bloques y lo cierra al terminar"""
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def load_static_assets(directory):
+    """
+    Lee los archivos del frontend y prepara al arrancar sus copias comprimidas y su ETag.
+
+    Devuelve {ruta relativa: StaticAsset}; cada codificación tiene su propio ETag fuerte.
+    """
+    assets = {}
+    if not os.path.isdir(directory):
+        return assets
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            full_path = os.path.join(root, filename)
+            name = os.path.relpath(full_path, directory).replace(os.sep, '/')
+            with open(full_path, 'rb') as f:
+                body = f.read()
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            if content_type.startswith('text/'):
+                content_type += '; charset=utf-8'
+            variants = {}
+            if is_compressible(content_type):
+                for encoding in ENCODINGS:
+                    compressed = compress(body, encoding, static=True)
+                    if len(compressed) < len(body):
+                        variants[encoding] = compressed
+            assets[name] = StaticAsset(body, content_type, hashlib.blake2b(body, digest_size=16).hexdigest(), variants)
+    return assets
@@ -0,0 +1,32 @@
+"""
+Presupuesto de tiempo de las peticiones que crean pedidos
+
+El gateway fija el presupuesto al recibir la petición y lo envía al
+microservicio en X-Deadline-Ms como milisegundos restantes. Cada servicio acota
+sus llamadas a lo que queda y reenvía el resto, así que el límite cubre toda la
+cadena (gateway -> orders -> inventory) sin depender de que los relojes coincidan.
+"""
+
+DEADLINE_HEADER = 'X-Deadline-Ms'
+# Por debajo de este margen no se reenvía la petición: no alcanzaría a responder
+MIN_REMAINING_SECONDS = 0.05
+
+
+def parse_budget(value):
+    """Segundos de un valor de X-Deadline-Ms, o None si falta o no es un número"""
+    try:
+        return float(value) / 1000 if value else None
+    except ValueError:
+        return None
+
+
+def remaining_budget(route_budget, received_at, now, client_value=None):
+    """Segundos que quedan del presupuesto de la ruta, acotado por el X-Deadline-Ms que envió el cliente"""
+    client_budget = parse_budget(client_value)
+    budget = route_budget if client_budget is None else min(route_budget, client_budget)
+    return budget - (now - received_at)
+
+
+def deadline_headers(remaining):
+    """Cabecera para el microservicio: un margen menos que el timeout del gateway, para que su 504 llegue antes"""
+    return {DEADLINE_HEADER: str(max(int((remaining - MIN_REMAINING_SECONDS) * 1000), 0))}
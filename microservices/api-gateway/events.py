@@ -0,0 +1,271 @@
+"""
+Stream de cambios de estado de pedidos y guías de envío (Server-Sent Events)
+
+Un solo hilo por proceso consulta a los microservicios los eventos nuevos
+(`?after=<id>`) y los reparte desde un buffer en memoria a todos los clientes
+conectados. El id de cada evento SSE es el cursor compuesto de todas las
+fuentes (p. ej. `12.5`): un cliente que se reconecta con Last-Event-ID recibe
+solo lo que se perdió y, si su cursor ya salió del buffer, lo que falta se
+pide directamente a los microservicios.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque, namedtuple
+import requests
+
+# name: clave de la fuente en el cursor; path: endpoint de eventos del microservicio; event: nombre del evento SSE
+EventSource = namedtuple('EventSource', ['name', 'upstream', 'path', 'event'])
+BufferedEvent = namedtuple('BufferedEvent', ['seq', 'source', 'id', 'data'])
+
+RETRY_MS = 3000
+
+
+class StatusEventHub:
+    """
+    Buffer compartido de eventos de estado con un hilo que lo alimenta.
+
+    `seq` numera los eventos en el orden en que llegan al buffer; los clientes
+    lo usan para esperar solo lo nuevo. `_base` guarda, por fuente, el id
+    anterior al evento más antiguo que sigue en el buffer.
+    """
+
+    def __init__(self, sources, poll_interval=1.0, buffer_size=1000, page_size=100, max_clients=1000):
+        self.sources = sources
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.page_size = page_size
+        self.max_clients = max_clients
+        self._buffer = deque()
+        self._tip = None
+        self._base = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._async_waiters = set()
+        self._poller = None
+        self.clients = 0
+        self.events_received = 0
+        self.backlog_requests = 0
+        self.poll_errors = 0
+
+    def start(self):
+        if self._poller is not None:
+            return
+        with self._cond:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name='status-events', daemon=True)
+                self._poller.start()
+
+    def _poll(self):
+        while True:
+            try:
+                self.poll_once()
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                self.poll_errors += 1
+            time.sleep(self.poll_interval)
+
+    def poll_once(self):
+        """Lee los eventos nuevos de cada fuente; la primera vez solo fija el cursor actual"""
+        if self._tip is None:
+            tip = {source.name: self.fetch(source)['last_id'] for source in self.sources}
+            with self._cond:
+                self._tip = tip
+                self._base = dict(tip)
+                self._publish()
+            return
+        for source in self.sources:
+            while True:
+                events = self.fetch(source, after=self._tip[source.name])['events']
+                self._append(source, events)
+                if len(events) < self.page_size:
+                    break
+
+    def fetch(self, source, after=None):
+        params = {'limit': self.page_size}
+        if after is not None:
+            params['after'] = after
+        response = source.upstream.request('GET', source.path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def _append(self, source, events):
+        if not events:
+            return
+        with self._cond:
+            for data in events:
+                self._seq += 1
+                self._buffer.append(BufferedEvent(self._seq, source.name, data['id'], data))
+                if len(self._buffer) > self.buffer_size:
+                    evicted = self._buffer.popleft()
+                    self._base[evicted.source] = evicted.id
+            self._tip[source.name] = events[-1]['id']
+            self.events_received += len(events)
+            self._publish()
+
+    def _publish(self):
+        """Despierta a los clientes en espera (se llama con el lock tomado)"""
+        self._seq += 1
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def ready(self):
+        return self._tip is not None
+
+    def current(self):
+        """Cursor de la última lectura y su seq, para seguir los cambios desde ahora"""
+        with self._cond:
+            return dict(self._tip), self._seq
+
+    def needs_backlog(self, cursor):
+        """True si parte de lo que le falta al cliente ya no está en el buffer"""
+        return any(cursor[source.name] < self._base[source.name] for source in self.sources)
+
+    def since(self, cursor, after_seq=0):
+        """
+        Eventos posteriores a `cursor` como [(EventSource, data)], el cursor tras
+        ellos y el seq desde el que esperar los siguientes. Puede pedir a los
+        microservicios lo que ya salió del buffer.
+        """
+        cursor = dict(cursor)
+        with self._cond:
+            base = dict(self._base)
+        events = []
+        for source in self.sources:
+            if cursor[source.name] < base[source.name]:
+                events.extend((source, data) for data in self._backlog(source, cursor, base[source.name]))
+
+        with self._cond:
+            seq = self._seq
+            # Una fuente cuyo buffer ya avanzó más allá del cursor se completa en la siguiente llamada
+            current = {source.name: cursor[source.name] >= self._base[source.name] for source in self.sources}
+            new = []
+            for item in reversed(self._buffer):
+                if item.seq <= after_seq:
+                    break
+                if current[item.source] and item.id > cursor[item.source]:
+                    new.append(item)
+        sources = {source.name: source for source in self.sources}
+        events.extend((sources[item.source], item.data) for item in reversed(new))
+        for source, data in events:
+            cursor[source.name] = max(cursor[source.name], data['id'])
+        return events, cursor, seq if all(current.values()) else 0
+
+    def _backlog(self, source, cursor, base_id):
+        """Eventos de una fuente entre el cursor del cliente y el inicio del buffer (una página)"""
+        self.backlog_requests += 1
+        page = self.fetch(source, after=cursor[source.name])['events']
+        backlog = [data for data in page if data['id'] <= base_id]
+        if len(backlog) < len(page) or len(page) < self.page_size:
+            # Ya no queda nada entre el cursor y el buffer
+            cursor[source.name] = base_id
+        elif backlog:
+            cursor[source.name] = backlog[-1]['id']
+        return backlog
+
+    def wait(self, seq, timeout):
+        """Espera hasta que haya eventos con seq posterior a `seq`; False si se agotó el timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq > seq, timeout)
+
+    async def wait_async(self, seq, timeout):
+        """Versión de wait() para el event loop: el hilo lector lo despierta con call_soon_threadsafe"""
+        event = asyncio.Event()
+        waiter = asyncio.get_running_loop(), event
+        with self._cond:
+            if self._seq > seq:
+                return True
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+    def format_cursor(self, cursor):
+        return '.'.join(str(cursor[source.name]) for source in self.sources)
+
+    def parse_cursor(self, value):
+        """Cursor de un Last-Event-ID, o None si no viene o no es válido (el cliente empieza desde ahora)"""
+        parts = (value or '').strip().split('.')
+        if len(parts) != len(self.sources) or not all(part.isdigit() for part in parts):
+            return None
+        return {source.name: int(part) for source, part in zip(self.sources, parts)}
+
+    def render(self, events, cursor_before):
+        """Texto SSE de una tanda de eventos; cada uno lleva como id el cursor tras él"""
+        cursor = dict(cursor_before)
+        chunks = []
+        for source, data in events:
+            cursor[source.name] = max(cursor[source.name], data['id'])
+            chunks.append(f"id: {self.format_cursor(cursor)}\nevent: {source.event}\n"
+                          f"data: {json.dumps(data, separators=(',', ':'))}\n\n")
+        return ''.join(chunks)
+
+    def stats(self):
+        return {
+            'clients': self.clients,
+            'max_clients': self.max_clients,
+            'cursor': self.format_cursor(self._tip) if self._tip is not None else None,
+            'buffered': len(self._buffer),
+            'events_received': self.events_received,
+            'backlog_requests': self.backlog_requests,
+            'poll_errors': self.poll_errors,
+        }
+
+
+def stream_events(hub, cursor, heartbeat):
+    """Generador SSE para Flask: un hilo por cliente, bloqueado en hub.wait() entre eventos"""
+    hub.start()
+    hub.clients += 1
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        seq = 0
+        while True:
+            if hub.ready():
+                if cursor is None:
+                    cursor, seq = hub.current()
+                try:
+                    events, next_cursor, seq = hub.since(cursor, seq)
+                except (requests.exceptions.RequestException, ValueError, KeyError):
+                    time.sleep(hub.poll_interval)
+                    continue
+                if events:
+                    yield hub.render(events, cursor)
+                cursor = next_cursor
+            if not hub.wait(seq, heartbeat):
+                yield ": keep-alive\n\n"
+    finally:
+        hub.clients -= 1
+
+
+async def stream_events_async(hub, cursor, heartbeat):
+    """Versión de stream_events para el motor asíncrono: solo el backlog se pide en un hilo"""
+    hub.start()
+    hub.clients += 1
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        seq = 0
+        while True:
+            if hub.ready():
+                if cursor is None:
+                    cursor, seq = hub.current()
+                try:
+                    if hub.needs_backlog(cursor):
+                        events, next_cursor, seq = await asyncio.to_thread(hub.since, cursor, seq)
+                    else:
+                        events, next_cursor, seq = hub.since(cursor, seq)
+                except (requests.exceptions.RequestException, ValueError, KeyError):
+                    await asyncio.sleep(hub.poll_interval)
+                    continue
+                if events:
+                    yield hub.render(events, cursor)
+                cursor = next_cursor
+            if not await hub.wait_async(seq, heartbeat):
+                yield ": keep-alive\n\n"
+    finally:
+        hub.clients -= 1
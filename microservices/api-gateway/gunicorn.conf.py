@@ -0,0 +1,29 @@
+"""
+Configuración de Gunicorn para producción: procesos pre-fork con el motor asíncrono (asgi.py)
+
+Uso: gunicorn -c gunicorn.conf.py asgi:application
+
+La caché, los circuit breakers y el control de admisión viven en memoria, así
+que son por proceso: con N procesos los presupuestos de admisión se multiplican por N.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# Un proceso con event loop por núcleo
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Reciclaje de procesos tras N peticiones (con jitter para que no se reinicien todos a la vez)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# Apagado ordenado: con SIGTERM se terminan las peticiones en curso durante graceful_timeout segundos
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = '-'
+errorlog = '-'
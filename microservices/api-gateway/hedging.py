@@ -0,0 +1,77 @@
+"""
+Hedging de peticiones GET: un segundo intento a otra réplica cuando el primero tarda más de lo habitual
+"""
+import threading
+from collections import deque
+
+
+class HedgePolicy:
+    """
+    Política de hedging de una ruta.
+
+    El umbral es el percentil `percentile` de las latencias recientes de la ruta
+    (ventana de `window` muestras); mientras no haya `min_samples` no se hace
+    hedging. Cada petición suma `budget_ratio` fichas hasta `budget_burst` y cada
+    segundo intento gasta una, así que la carga extra no pasa de ~`budget_ratio`.
+    """
+
+    def __init__(self, percentile=95, budget_ratio=0.1, budget_burst=10, min_delay=0.01, window=500,
+                 min_samples=50):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._threshold = None
+        self._pending_samples = 0
+        self._tokens = budget_burst
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+    def delay(self):
+        """Segundos a esperar antes del segundo intento, o None si aún no hay suficientes muestras"""
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self._tokens + self.budget_ratio, self.budget_burst)
+            return self._threshold
+
+    def record(self, elapsed):
+        """Registra la latencia de un intento que obtuvo respuesta"""
+        with self._lock:
+            self._latencies.append(elapsed)
+            self._pending_samples += 1
+            # Recalcula el percentil cada cierto número de muestras, no en cada petición
+            if len(self._latencies) >= self.min_samples and (self._threshold is None or self._pending_samples >= 20):
+                ordered = sorted(self._latencies)
+                index = min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)
+                self._threshold = max(ordered[index], self.min_delay)
+                self._pending_samples = 0
+
+    def try_hedge(self):
+        """Gasta una ficha del presupuesto para lanzar un segundo intento"""
+        with self._lock:
+            if self._tokens < 1:
+                self.budget_exhausted += 1
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self):
+        return {
+            'percentile': self.percentile,
+            'threshold_ms': round(self._threshold * 1000, 1) if self._threshold is not None else None,
+            'samples': len(self._latencies),
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'budget_exhausted': self.budget_exhausted,
+        }
@@ -0,0 +1,141 @@
+"""
+Circuit breaker y bulkhead por microservicio para el API Gateway
+"""
+import threading
+import time
+from collections import deque
+import requests
+
+
+class UpstreamRejected(requests.exceptions.RequestException):
+    """El gateway rechazó la petición sin enviarla al microservicio"""
+
+
+class CircuitOpenError(UpstreamRejected):
+    def __init__(self, message, retry_after=0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BulkheadFullError(UpstreamRejected):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Abre el circuito cuando la tasa de errores/timeouts de la ventana supera el umbral.
+
+    Con el circuito abierto las peticiones se rechazan de inmediato; pasado
+    `open_seconds` se deja pasar una petición de prueba (half-open) que decide si
+    el circuito se cierra de nuevo o vuelve a abrirse.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate=0.5, min_requests=10, window=30, open_seconds=15):
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._results = deque()
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejections = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def allow(self):
+        """Indica si se puede enviar una petición al microservicio"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejections += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejections += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record(self, success, timeout=False):
+        """Registra el resultado de una petición enviada"""
+        now = time.monotonic()
+        with self._lock:
+            if not success:
+                self.failures += 1
+                if timeout:
+                    self.timeouts += 1
+
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if success:
+                    self.state = self.CLOSED
+                    self._results.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._results.append((now, success))
+            while self._results and self._results[0][0] < now - self.window:
+                self._results.popleft()
+            if len(self._results) >= self.min_requests:
+                failed = sum(1 for _, ok in self._results if not ok)
+                if failed / len(self._results) >= self.failure_rate:
+                    self._open(now)
+
+    def abandon(self):
+        """La petición se canceló antes de tener resultado: libera el turno de prueba si lo tenía"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def retry_after(self):
+        """Segundos que faltan para volver a probar el microservicio"""
+        return max(self.open_seconds - (time.monotonic() - self._opened_at), 0)
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self._opened_at = now
+        self._results.clear()
+        self.times_opened += 1
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'times_opened': self.times_opened,
+            'rejections': self.rejections,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+        }
+
+
+class Bulkhead:
+    """Límite de peticiones simultáneas hacia un microservicio; las que sobran se rechazan sin esperar"""
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejections = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self.active >= self.max_concurrent:
+                self.rejections += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+    def stats(self):
+        return {'max_concurrent': self.max_concurrent, 'active': self.active, 'rejections': self.rejections}
@@ -0,0 +1,87 @@
+"""
+Agrupación (single-flight) de peticiones GET idénticas y concurrentes hacia un microservicio
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Ejecuta una sola vez las llamadas concurrentes con la misma llave y reparte el resultado"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """Versión para el event loop de SingleFlight: los que esperan comparten un mismo Future"""
+
+    def __init__(self):
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        self.executed += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita el aviso de excepción no recuperada cuando nadie más esperaba
+            future.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self):
+        return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
@@ -0,0 +1,120 @@
+"""
+Verificación local de los tokens de acceso emitidos por auth-service (JWT HS256)
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import threading
+import time
+import requests
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def bearer_token(authorization):
+    """Token de una cabecera `Authorization: Bearer <token>`, o None"""
+    if not authorization or not authorization.startswith('Bearer '):
+        return None
+    return authorization[len('Bearer '):].strip() or None
+
+
+def identity_headers(authorization, claims):
+    """Cabeceras con la identidad verificada que el gateway envía a los microservicios"""
+    return {
+        'Authorization': authorization,
+        'X-User-Id': claims['sub'],
+        'X-User-Role': claims.get('role', ''),
+    }
+
+
+class AccessTokenVerifier:
+    """
+    Verifica firma y expiración de los tokens de acceso con la llave en memoria,
+    sin llamar a auth-service.
+
+    Las sesiones revocadas (logout) se piden a auth-service en segundo plano cada
+    `revocation_interval` segundos; un token de una sesión revocada se rechaza
+    aunque no haya expirado. Si auth-service no responde se conserva la última lista.
+    """
+
+    def __init__(self, secret, auth_service, revocation_interval=15):
+        self._key = secret.encode('utf-8')
+        self.auth_service = auth_service
+        self.revocation_interval = revocation_interval
+        self._revoked = frozenset()
+        self._lock = threading.Lock()
+        self._poller = None
+        self.verified = 0
+        self.rejected = 0
+        self.revocation_refreshes = 0
+        self.revocation_errors = 0
+
+    def verify(self, token):
+        """Devuelve los claims del token o lanza InvalidToken"""
+        self._start_poller()
+        try:
+            claims = self.decode(token)
+            if claims.get('sid') in self._revoked:
+                raise InvalidToken('Token revocado')
+        except InvalidToken:
+            self.rejected += 1
+            raise
+        self.verified += 1
+        return claims
+
+    def decode(self, token):
+        try:
+            header, payload, signature = token.split('.')
+            expected = hmac.new(self._key, f'{header}.{payload}'.encode('ascii'), hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, _b64decode(signature)):
+                raise InvalidToken('Firma del token inválida')
+            if json.loads(_b64decode(header)).get('alg') != 'HS256':
+                raise InvalidToken('Algoritmo del token no soportado')
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, binascii.Error):
+            raise InvalidToken('Token mal formado')
+        if claims.get('exp', 0) <= time.time():
+            raise InvalidToken('Token expirado')
+        if 'sub' not in claims:
+            raise InvalidToken('Token sin usuario')
+        return claims
+
+    def refresh_revocations(self):
+        """Actualiza la lista de sesiones revocadas desde auth-service"""
+        try:
+            response = self.auth_service.request('GET', '/api/auth/revoked/')
+            response.raise_for_status()
+            self._revoked = frozenset(response.json()['revoked'])
+            self.revocation_refreshes += 1
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            self.revocation_errors += 1
+
+    def _start_poller(self):
+        if self._poller is not None:
+            return
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name='token-revocations', daemon=True)
+                self._poller.start()
+
+    def _poll(self):
+        while True:
+            self.refresh_revocations()
+            time.sleep(self.revocation_interval)
+
+    def stats(self):
+        return {
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'revoked_sessions': len(self._revoked),
+            'revocation_refreshes': self.revocation_refreshes,
+            'revocation_errors': self.revocation_errors,
+        }
@@ -0,0 +1,201 @@
+"""
+Clientes HTTP con pool de conexiones keep-alive hacia los microservicios
+"""
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from http.cookiejar import DefaultCookiePolicy
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from singleflight import SingleFlight
+from resilience import CircuitBreaker, Bulkhead, CircuitOpenError, BulkheadFullError
+from balancer import LeastOutstandingBalancer
+
+
+class UpstreamClient:
+    """Cliente HTTP persistente para un microservicio (una o varias réplicas) con contadores de uso del pool"""
+
+    def __init__(self, name, urls, pool_size=10, timeout=10, coalesce=True, breaker=None, max_concurrent=50,
+                 max_failures=3, ejection_seconds=30):
+        self.name = name
+        self.balancer = LeastOutstandingBalancer(urls, max_failures=max_failures, ejection_seconds=ejection_seconds)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight()
+        self.breaker = breaker or CircuitBreaker()
+        self.bulkhead = Bulkhead(max_concurrent)
+        # Hilos para los GET con hedging: el primer intento y el segundo corren en paralelo
+        self.hedge_executor = ThreadPoolExecutor(max_workers=max_concurrent * 2)
+
+        self.session = requests.Session()
+        # La sesión se comparte entre usuarios: nunca debe guardar ni reenviar cookies
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.adapter = HTTPAdapter(pool_connections=len(self.balancer.instances), pool_maxsize=pool_size)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self._lock = threading.Lock()
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.pool_overflows = 0
+
+    def request(self, method, path, hedge=None, coalesce=True, **kwargs):
+        """
+        Envía una petición; los GET idénticos y concurrentes comparten una sola llamada.
+        Con `hedge` (HedgePolicy) los GET lentos se repiten en otra réplica. Con
+        coalesce=False el GET no se agrupa y, si se pide stream=True, su cuerpo se lee por bloques.
+        """
+        def call():
+            if method == 'GET' and hedge is not None:
+                return self.hedged_send(method, path, hedge, **kwargs)
+            return self.send(method, path, **kwargs)
+
+        if method == 'GET' and self.coalesce and coalesce:
+            # La respuesta agrupada se comparte entre varios clientes, así que se lee completa
+            kwargs['stream'] = True
+            return self.single_flight.do(self.flight_key(path, kwargs), lambda: buffer_response(call()))
+        return call()
+
+    def flight_key(self, path, kwargs):
+        """Llave de agrupación: URL final (ruta + query string) y cabeceras enviadas"""
+        url = requests.Request('GET', f"http://{self.name}{path}", params=kwargs.get('params')).prepare().url
+        return url, tuple(sorted((kwargs.get('headers') or {}).items()))
+
+    def send(self, method, path, exclude=None, on_instance=None, **kwargs):
+        """
+        Envía una petición a la réplica con menos peticiones en curso, reutilizando
+        las conexiones abiertas del pool, si el bulkhead y el circuit breaker lo permiten.
+
+        `exclude` evita una réplica si hay otra disponible; `on_instance` recibe la réplica elegida.
+        """
+        if not self.bulkhead.try_acquire():
+            raise BulkheadFullError(f'Demasiadas peticiones simultáneas hacia {self.name}')
+        if not self.breaker.allow():
+            self.bulkhead.release()
+            raise CircuitOpenError(f'Circuito abierto para {self.name}', self.breaker.retry_after())
+
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self.requests_total += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if self.in_flight > self.pool_size:
+                self.pool_overflows += 1
+        instance = self.balancer.acquire(exclude=exclude)
+        if on_instance is not None:
+            on_instance(instance)
+        try:
+            response = self.session.request(method, f"{instance.url}{path}", **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.balancer.release(instance, False)
+            self.breaker.record(False, timeout=isinstance(e, requests.exceptions.Timeout))
+            with self._lock:
+                self.errors_total += 1
+            raise
+        finally:
+            self.bulkhead.release()
+            with self._lock:
+                self.in_flight -= 1
+        self.balancer.release(instance, response.status_code < 500)
+        self.breaker.record(response.status_code < 500)
+        return response
+
+    def hedged_send(self, method, path, policy, **kwargs):
+        """
+        Envía la petición y, si no hay respuesta dentro del umbral de `policy` y queda
+        presupuesto, lanza un segundo intento a otra réplica. Gana la primera respuesta;
+        la otra se descarta cuando llega.
+        """
+        delay = policy.delay()
+        if delay is None:
+            return self.timed_send(policy, method, path, **kwargs)
+
+        first_instance = []
+        primary = self.hedge_executor.submit(
+            self.timed_send, policy, method, path, on_instance=first_instance.append, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not policy.try_hedge():
+            return primary.result()
+
+        hedge = self.hedge_executor.submit(
+            self.timed_send, policy, method, path, exclude=first_instance[0] if first_instance else None, **kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is not None:
+                break
+        else:
+            # Ambos intentos fallaron: se informa el error del primero
+            return primary.result()
+
+        if winner is hedge:
+            policy.record_win()
+        for future in (primary, hedge):
+            if future is not winner:
+                future.add_done_callback(close_discarded)
+        return winner.result()
+
+    def timed_send(self, policy, method, path, **kwargs):
+        """send() que registra su latencia en la política de hedging"""
+        started = time.monotonic()
+        response = self.send(method, path, **kwargs)
+        policy.record(time.monotonic() - started)
+        return response
+
+    def stats(self):
+        """Contadores de uso del cliente y de sus pools de conexiones"""
+        connections_opened = 0
+        requests_sent = 0
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+            requests_sent += pool.num_requests
+
+        return {
+            'instances': self.balancer.stats(),
+            'pool_size': self.pool_size,
+            'timeout': self.timeout,
+            'requests_total': self.requests_total,
+            'errors_total': self.errors_total,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'pool_overflows': self.pool_overflows,
+            'connections_opened': connections_opened,
+            'connections_reused': max(requests_sent - connections_opened, 0),
+            'coalescing': self.single_flight.stats(),
+            'breaker': self.breaker.stats(),
+            'bulkhead': self.bulkhead.stats(),
+        }
+
+
+def buffer_response(response):
+    """
+    Lee completa una respuesta pedida con stream=True para compartirla.
+
+    `encoded_content` guarda los bytes tal como llegaron (con su Content-Encoding)
+    para reenviarlos sin recomprimir; `content` queda con el cuerpo decodificado.
+    """
+    try:
+        encoded = response.raw.read(decode_content=False)
+    finally:
+        response.raw.release_conn()
+    decoded = urllib3.HTTPResponse(body=io.BytesIO(encoded), headers=response.raw.headers, status=response.status_code,
+                                   preload_content=False, decode_content=True).read()
+    response._content = decoded
+    response._content_consumed = True
+    response.encoded_content = encoded
+    return response
+
+
+def close_discarded(future):
+    """Cierra la respuesta del intento que perdió para liberar su conexión"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
@@ -83,12 +83,18 @@ AUTH_USER_MODEL = 'users.User'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'users.authentication.AccessTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Tokens de acceso firmados (HS256); el API Gateway los verifica con la misma llave
+ACCESS_TOKEN_SECRET = os.environ.get('ACCESS_TOKEN_SECRET', 'access-token-secret')
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', 300))
+REFRESH_TOKEN_TTL = int(os.environ.get('REFRESH_TOKEN_TTL', 7 * 24 * 3600))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8000",
     "http://localhost:8001",
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User
+from .models import User, RefreshToken
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -7,3 +7,9 @@ class UserAdmin(admin.ModelAdmin):
     list_filter = ['role', 'is_active']
     search_fields = ['username', 'email', 'first_name', 'last_name']
 
+
+@admin.register(RefreshToken)
+class RefreshTokenAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'created_at', 'expires_at', 'revoked_at']
+    list_filter = ['revoked_at']
+    search_fields = ['user__username']
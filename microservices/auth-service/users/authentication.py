@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from .models import User, RefreshToken
+from .tokens import InvalidToken, decode_jwt
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """Autenticación con el token de acceso firmado (Authorization: Bearer <token>)"""
+
+    def authenticate(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not header.startswith('Bearer '):
+            return None
+        try:
+            claims = decode_jwt(header[len('Bearer '):].strip(), settings.ACCESS_TOKEN_SECRET)
+        except InvalidToken as e:
+            raise AuthenticationFailed(str(e))
+
+        user = User.objects.filter(id=claims.get('sub'), is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('Usuario no encontrado o inactivo')
+        if RefreshToken.objects.filter(id=claims.get('sid'), revoked_at__isnull=False).exists():
+            raise AuthenticationFailed('Token revocado')
+        return user, claims
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 class User(AbstractUser):
     ADMIN = 'ADMIN'
@@ -55,3 +56,24 @@ class User(AbstractUser):
     def has_role(self, *roles):
         return self.role in roles
 
+
+class RefreshToken(models.Model):
+    """Sesión de tokens de un usuario: hash del token de refresco vigente y su revocación"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Token de refresco'
+        verbose_name_plural = 'Tokens de refresco'
+        indexes = [
+            models.Index(fields=['revoked_at']),
+        ]
+
+    def __str__(self):
+        return f"Sesión {self.id} de {self.user.username}"
+
+    def is_active(self):
+        return self.revoked_at is None and self.expires_at > timezone.now()
@@ -0,0 +1,134 @@
+"""
+Tokens de acceso firmados (JWT HS256) y tokens de refresco
+
+El token de acceso lleva el id, el username y el rol del usuario y dura pocos
+minutos; el API Gateway lo verifica con la misma llave sin consultar este
+servicio. El token de refresco es opaco, se guarda solo su hash y permite
+obtener un nuevo token de acceso hasta que la sesión se revoca (logout).
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import RefreshToken
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(signing_input, secret):
+    return hmac.new(secret.encode('utf-8'), signing_input.encode('ascii'), hashlib.sha256).digest()
+
+
+def encode_jwt(claims, secret):
+    header = _b64encode(json.dumps({'alg': 'HS256', 'typ': 'JWT'}, separators=(',', ':')).encode('utf-8'))
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    signature = _b64encode(_sign(f'{header}.{payload}', secret))
+    return f'{header}.{payload}.{signature}'
+
+
+def decode_jwt(token, secret):
+    """Devuelve los claims de un token con firma válida y no expirado, o lanza InvalidToken"""
+    try:
+        header, payload, signature = token.split('.')
+        if not hmac.compare_digest(_sign(f'{header}.{payload}', secret), _b64decode(signature)):
+            raise InvalidToken('Firma del token inválida')
+        if json.loads(_b64decode(header)).get('alg') != 'HS256':
+            raise InvalidToken('Algoritmo del token no soportado')
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, binascii.Error):
+        raise InvalidToken('Token mal formado')
+    if claims.get('exp', 0) <= time.time():
+        raise InvalidToken('Token expirado')
+    return claims
+
+
+def hash_token(raw_token):
+    return hashlib.sha256(raw_token.encode('utf-8')).hexdigest()
+
+
+def access_token(user, refresh):
+    now = int(time.time())
+    claims = {
+        'sub': str(user.id),
+        'username': user.username,
+        'role': user.role,
+        'sid': refresh.id,
+        'iat': now,
+        'exp': now + settings.ACCESS_TOKEN_TTL,
+    }
+    return encode_jwt(claims, settings.ACCESS_TOKEN_SECRET)
+
+
+def token_response(user, refresh, raw_refresh_token):
+    return {
+        'access_token': access_token(user, refresh),
+        'refresh_token': raw_refresh_token,
+        'token_type': 'Bearer',
+        'expires_in': settings.ACCESS_TOKEN_TTL,
+    }
+
+
+def issue_tokens(user):
+    """Abre una sesión de tokens para el usuario y devuelve el par acceso/refresco"""
+    raw_refresh_token = secrets.token_urlsafe(32)
+    refresh = RefreshToken.objects.create(
+        user=user,
+        token_hash=hash_token(raw_refresh_token),
+        expires_at=timezone.now() + timedelta(seconds=settings.REFRESH_TOKEN_TTL),
+    )
+    return token_response(user, refresh, raw_refresh_token)
+
+
+def refresh_tokens(raw_refresh_token):
+    """
+    Canjea un token de refresco vigente por un par nuevo. La sesión (sid) se
+    conserva; el token de refresco anterior deja de servir.
+    """
+    with transaction.atomic():
+        refresh = (RefreshToken.objects.select_for_update().select_related('user')
+                   .filter(token_hash=hash_token(raw_refresh_token)).first())
+        if refresh is None or not refresh.is_active() or not refresh.user.is_active:
+            raise InvalidToken('Token de refresco inválido o expirado')
+        raw_refresh_token = secrets.token_urlsafe(32)
+        refresh.token_hash = hash_token(raw_refresh_token)
+        refresh.expires_at = timezone.now() + timedelta(seconds=settings.REFRESH_TOKEN_TTL)
+        refresh.save(update_fields=['token_hash', 'expires_at'])
+    return token_response(refresh.user, refresh, raw_refresh_token)
+
+
+def revoke_session(session_id=None, raw_refresh_token=None):
+    """Revoca una sesión de tokens por su id (sid) o por su token de refresco"""
+    sessions = RefreshToken.objects.filter(revoked_at__isnull=True)
+    if session_id is not None:
+        sessions = sessions.filter(id=session_id)
+    elif raw_refresh_token:
+        sessions = sessions.filter(token_hash=hash_token(raw_refresh_token))
+    else:
+        return 0
+    return sessions.update(revoked_at=timezone.now())
+
+
+def recently_revoked_sessions():
+    """
+    Sesiones revocadas cuyos tokens de acceso aún no han expirado: son las únicas
+    que el API Gateway necesita rechazar además de los tokens expirados.
+    """
+    since = timezone.now() - timedelta(seconds=settings.ACCESS_TOKEN_TTL)
+    return list(RefreshToken.objects.filter(revoked_at__gte=since).values_list('id', flat=True))
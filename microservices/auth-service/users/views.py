@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from django.contrib.auth import login, logout
 from .serializers import UserSerializer, LoginSerializer, UserDetailSerializer
 from .models import User
+from .tokens import InvalidToken, issue_tokens, refresh_tokens, revoke_session, recently_revoked_sessions
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -17,17 +18,41 @@ def login_view(request):
         user_data = UserSerializer(user).data
         return Response({
             'message': 'Login exitoso',
-            'user': user_data
+            'user': user_data,
+            **issue_tokens(user),
         }, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
-    """Endpoint para cerrar sesión"""
+    """Endpoint para cerrar sesión; revoca también la sesión de tokens"""
+    if isinstance(request.auth, dict):
+        revoke_session(session_id=request.auth.get('sid'))
+    else:
+        revoke_session(raw_refresh_token=request.data.get('refresh_token'))
     logout(request)
     return Response({'message': 'Logout exitoso'}, status=status.HTTP_200_OK)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def refresh_view(request):
+    """Endpoint para obtener un nuevo token de acceso con el token de refresco"""
+    refresh_token = request.data.get('refresh_token')
+    if not refresh_token:
+        return Response({'error': 'Debe proporcionar refresh_token'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        tokens = refresh_tokens(refresh_token)
+    except InvalidToken as e:
+        return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response(tokens, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def revoked_sessions(request):
+    """Sesiones de tokens revocadas cuyos tokens de acceso aún no expiran (las consulta el API Gateway)"""
+    return Response({'revoked': recently_revoked_sessions()}, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def profile_view(request):
@@ -30,6 +30,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'warehouse.deadline.DeadlineMiddleware',
 ]
 
 ROOT_URLCONF = 'inventory_service.urls'
@@ -90,3 +91,10 @@ CORS_ALLOW_CREDENTIALS = True
 
 PRODUCTS_SERVICE_URL = os.environ.get('PRODUCTS_SERVICE_URL', 'http://products-service:8002')
 
+# Reservas de stock en dos fases (apartar -> confirmar o liberar)
+RESERVATION_TTL_SECONDS = float(os.environ.get('RESERVATION_TTL_SECONDS', 60))
+RESERVATION_MAX_TTL_SECONDS = float(os.environ.get('RESERVATION_MAX_TTL_SECONDS', 900))
+# Cada cuántos segundos, como mínimo, se devuelven al inventario las reservas vencidas al apartar stock
+RESERVATION_SWEEP_INTERVAL = float(os.environ.get('RESERVATION_SWEEP_INTERVAL', 15))
+# Segundos que se recuerda el request_id de cada descuento de reserve-nearest para no repetirlo en un reintento
+ALLOCATION_RECORD_TTL_SECONDS = float(os.environ.get('ALLOCATION_RECORD_TTL_SECONDS', 24 * 3600))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Warehouse, Inventory, Measurement
+from .models import Warehouse, Inventory, Measurement, StockAllocation, StockReservation
 
 @admin.register(Warehouse)
 class WarehouseAdmin(admin.ModelAdmin):
@@ -13,6 +13,17 @@ class InventoryAdmin(admin.ModelAdmin):
     list_filter = ['warehouse']
     search_fields = ['product_name']
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'inventory', 'units', 'status', 'expires_at', 'created_at']
+    list_filter = ['status']
+
+@admin.register(StockAllocation)
+class StockAllocationAdmin(admin.ModelAdmin):
+    list_display = ['request_id', 'inventory', 'units', 'status', 'created_at']
+    list_filter = ['status']
+    search_fields = ['request_id']
+
 @admin.register(Measurement)
 class MeasurementAdmin(admin.ModelAdmin):
     list_display = ['product_name', 'value', 'unit', 'place', 'dateTime']
@@ -0,0 +1,139 @@
+"""
+Asignación de bodega para un pedido: elige la bodega más cercana con stock y descuenta en la misma transacción
+
+Las bodegas candidatas se ordenan por distancia haversine en la propia consulta
+y el descuento es un UPDATE condicionado al stock disponible, así que dos
+pedidos simultáneos no pueden llevarse las mismas unidades: si otro pedido se
+adelantó, el UPDATE no afecta filas y se pasa a la siguiente bodega.
+
+Con `request_id` el descuento queda registrado (StockAllocation): repetir la
+misma petición tras un timeout devuelve la bodega ya descontada en lugar de
+descontar otra vez, y cancelar devuelve las unidades.
+"""
+from datetime import timedelta
+from math import asin, cos, radians, sin, sqrt
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+from django.utils import timezone
+from .models import Inventory, StockAllocation
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia haversine en km entre dos puntos en grados"""
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+
+
+def distance_km_expression(lat, lon):
+    """Expresión SQL con la distancia haversine (km) desde (lat, lon) a la bodega del inventario"""
+    lat, lon = radians(lat), radians(lon)
+    warehouse_lat = Radians(F('warehouse__latitude'))
+    warehouse_lon = Radians(F('warehouse__longitude'))
+    a = (Power(Sin((warehouse_lat - lat) / 2), 2)
+         + Cos(lat) * Cos(warehouse_lat) * Power(Sin((warehouse_lon - lon) / 2), 2))
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(Least(a, 1.0)))
+
+
+def candidates_with_stock(product_id, units, lat, lon):
+    """Inventarios del producto en bodegas activas con al menos `units` disponibles, del más cercano al más lejano"""
+    return (Inventory.objects
+            .filter(product_id=product_id, warehouse__is_active=True,
+                    quantity__gte=F('reserved_quantity') + units)
+            .select_related('warehouse')
+            .annotate(distance=distance_km_expression(lat, lon))
+            .order_by('distance', 'id'))
+
+
+def allocate_nearest(product_id, units, lat, lon, preferred_warehouse=None, **changes):
+    """
+    Aplica `changes` (un UPDATE) al inventario de la bodega preferida si tiene stock, o al de la más cercana que lo tenga.
+
+    Debe llamarse dentro de una transacción. Devuelve el inventario actualizado
+    (con `distance` en km) o None si ninguna bodega tiene stock suficiente.
+    """
+    candidates = list(candidates_with_stock(product_id, units, lat, lon))
+    if preferred_warehouse:
+        candidates.sort(key=lambda inventory: inventory.warehouse.name != preferred_warehouse)
+    for inventory in candidates:
+        updated = Inventory.objects.filter(
+            pk=inventory.pk, quantity__gte=F('reserved_quantity') + units
+        ).update(**changes)
+        if updated:
+            inventory.refresh_from_db(fields=['quantity', 'reserved_quantity'])
+            return inventory
+    return None
+
+
+def reserve_nearest(product_id, units, lat, lon, preferred_warehouse=None, request_id=None):
+    """
+    Descuenta `units` de la bodega preferida si tiene stock, o de la más cercana que lo tenga.
+
+    Devuelve el inventario descontado (con `distance` en km) o None si ninguna bodega
+    tiene stock suficiente. Con `request_id`, una petición repetida devuelve el
+    inventario que ya se descontó, y una ya cancelada devuelve None.
+    """
+    if request_id is None:
+        with transaction.atomic():
+            return allocate_nearest(product_id, units, lat, lon, preferred_warehouse, quantity=F('quantity') - units)
+
+    try:
+        with transaction.atomic():
+            previous = _previous_allocation(request_id, lat, lon)
+            if previous is not None:
+                return previous or None
+            inventory = allocate_nearest(product_id, units, lat, lon, preferred_warehouse,
+                                         quantity=F('quantity') - units)
+            if inventory is not None:
+                StockAllocation.objects.create(request_id=request_id, inventory=inventory, units=units)
+            return inventory
+    except IntegrityError:
+        # Una petición simultánea con el mismo request_id se registró primero; este descuento se deshizo
+        return _previous_allocation(request_id, lat, lon) or None
+
+
+def _previous_allocation(request_id, lat, lon):
+    """Inventario ya descontado para `request_id` (con `distance`), False si se canceló, o None si no hay registro"""
+    allocation = (StockAllocation.objects.select_related('inventory__warehouse')
+                  .filter(request_id=request_id).first())
+    if allocation is None:
+        return None
+    if allocation.status == StockAllocation.CANCELLED:
+        return False
+    inventory = allocation.inventory
+    inventory.distance = haversine_km(lat, lon, inventory.warehouse.latitude, inventory.warehouse.longitude)
+    return inventory
+
+
+def cancel_allocation(request_id):
+    """
+    Devuelve las unidades descontadas con `request_id`. Si el descuento aún no
+    llegó, deja el registro cancelado para que no se aplique cuando llegue.
+    Devuelve las unidades devueltas.
+    """
+    try:
+        with transaction.atomic():
+            allocation = StockAllocation.objects.select_for_update().filter(request_id=request_id).first()
+            if allocation is None:
+                StockAllocation.objects.create(request_id=request_id, status=StockAllocation.CANCELLED)
+                return 0
+            if allocation.status == StockAllocation.CANCELLED:
+                return 0
+            Inventory.objects.filter(pk=allocation.inventory_id).update(quantity=F('quantity') + allocation.units)
+            allocation.status = StockAllocation.CANCELLED
+            allocation.save(update_fields=['status'])
+            return allocation.units
+    except IntegrityError:
+        # El descuento se registró mientras tanto: se cancela ese registro
+        return cancel_allocation(request_id)
+
+
+def forget_allocations(max_age_seconds):
+    """Borra los registros de descuentos más viejos que `max_age_seconds`; ya nadie los va a reintentar"""
+    deleted, _ = StockAllocation.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=max_age_seconds)
+    ).delete()
+    return deleted
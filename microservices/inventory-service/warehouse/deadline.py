@@ -0,0 +1,101 @@
+"""
+Tiempo límite de la petición en curso, recibido en X-Deadline-Ms (milisegundos restantes)
+
+Mismo esquema que en orders-service: el middleware fija el instante límite al
+llegar la petición, y las llamadas a products-service acotan su timeout con
+timeout(). En PostgreSQL además se fija statement_timeout con el tiempo que
+trae la petición, así que una consulta que ya no alcanza a responder a tiempo
+se cancela en lugar de seguir ocupando la conexión y las filas bloqueadas.
+"""
+import contextvars
+import time
+import requests
+from django.db import DatabaseError, OperationalError, connection
+from django.http import JsonResponse
+
+DEADLINE_HEADER = 'X-Deadline-Ms'
+MIN_REMAINING_SECONDS = 0.05
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Se agotó el tiempo de la petición; es un Timeout para que el manejo de errores de red existente lo trate igual"""
+
+
+def remaining():
+    """Segundos que quedan a la petición en curso, o None si no tiene tiempo límite"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left < MIN_REMAINING_SECONDS
+
+
+def timeout(default):
+    """Timeout para una llamada: `default` acotado a lo que queda; lanza DeadlineExceeded si ya no alcanza"""
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_REMAINING_SECONDS:
+        raise DeadlineExceeded('Se agotó el tiempo límite de la petición')
+    return min(default, left)
+
+
+def headers():
+    """Cabecera con lo que queda menos un margen: el 504 del servicio siguiente llega antes que el timeout de la llamada"""
+    left = remaining()
+    return {} if left is None else {DEADLINE_HEADER: str(max(int((left - MIN_REMAINING_SECONDS) * 1000), 0))}
+
+
+def parse_budget(value):
+    """Segundos de un valor de X-Deadline-Ms, o None si falta o no es un número"""
+    try:
+        return float(value) / 1000 if value else None
+    except ValueError:
+        return None
+
+
+def _set_statement_timeout(milliseconds):
+    with connection.cursor() as cursor:
+        if milliseconds is None:
+            cursor.execute('RESET statement_timeout')
+        else:
+            cursor.execute("SELECT set_config('statement_timeout', %s, false)", [str(milliseconds)])
+
+
+class DeadlineMiddleware:
+    """Fija el tiempo límite de cada petición; responde 504 si llega sin tiempo o si se agota durante la vista"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        budget = parse_budget(request.headers.get(DEADLINE_HEADER))
+        if budget is None:
+            return self.get_response(request)
+        if budget < MIN_REMAINING_SECONDS:
+            return JsonResponse({'error': 'La petición llegó sin tiempo para procesarse'}, status=504)
+
+        token = _deadline.set(time.monotonic() + budget)
+        limit_statements = connection.vendor == 'postgresql'
+        try:
+            if limit_statements:
+                _set_statement_timeout(int(budget * 1000))
+            return self.get_response(request)
+        finally:
+            _deadline.reset(token)
+            if limit_statements:
+                # La conexión se reutiliza en otras peticiones: se vuelve al valor por defecto
+                try:
+                    _set_statement_timeout(None)
+                except DatabaseError:
+                    pass
+
+    def process_exception(self, request, exception):
+        # En PostgreSQL la consulta cancelada por statement_timeout llega como OperationalError
+        if isinstance(exception, DeadlineExceeded) or (isinstance(exception, OperationalError) and expired()):
+            return JsonResponse({'error': 'Se agotó el tiempo límite de la petición'}, status=504)
+        return None
@@ -0,0 +1,21 @@
+"""Comando para devolver al inventario las reservas de stock vencidas."""
+import time
+from django.core.management.base import BaseCommand
+from warehouse.reservations import expire_holds
+
+
+class Command(BaseCommand):
+    help = 'Devuelve al inventario las reservas de stock vencidas (una vez, o cada --every segundos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help='Repetir el barrido cada N segundos en lugar de ejecutarlo una sola vez')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_holds()
+            if expired:
+                self.stdout.write(f'{expired} reservas vencidas devueltas al inventario')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
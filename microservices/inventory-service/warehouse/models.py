@@ -78,6 +78,66 @@ class Inventory(models.Model):
     def get_available_quantity(self):
         return self.quantity - self.reserved_quantity
 
+class StockReservation(models.Model):
+    """Unidades apartadas de un inventario (suman a reserved_quantity) hasta que se confirman, liberan o vencen"""
+    HELD = 'HELD'
+    COMMITTED = 'COMMITTED'
+    RELEASED = 'RELEASED'
+    EXPIRED = 'EXPIRED'
+    STATUS_CHOICES = [
+        (HELD, 'Apartada'),
+        (COMMITTED, 'Confirmada'),
+        (RELEASED, 'Liberada'),
+        (EXPIRED, 'Vencida'),
+    ]
+    
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='reservations')
+    units = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Reserva de stock'
+        verbose_name_plural = 'Reservas de stock'
+        ordering = ['-created_at']
+        indexes = [
+            # Para el barrido de reservas vencidas
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"Reserva {self.id}: {self.units} u de {self.inventory_id} ({self.status})"
+
+class StockAllocation(models.Model):
+    """Descuento hecho por reserve-nearest con el request_id del cliente: un reintento no descuenta dos veces"""
+    ALLOCATED = 'ALLOCATED'
+    CANCELLED = 'CANCELLED'
+    STATUS_CHOICES = [
+        (ALLOCATED, 'Descontado'),
+        (CANCELLED, 'Cancelado'),
+    ]
+    
+    request_id = models.CharField(max_length=64, unique=True)
+    # Sin inventario: se canceló antes de que llegara el descuento, que ya no se aplicará
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='allocations')
+    units = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ALLOCATED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Descuento de stock'
+        verbose_name_plural = 'Descuentos de stock'
+        indexes = [
+            # Para borrar los registros viejos en el barrido
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Descuento {self.request_id}: {self.units} u ({self.status})"
+
 class Measurement(models.Model):
     variable_name = models.CharField(max_length=50)
     value = models.FloatField(null=True, blank=True, default=None)
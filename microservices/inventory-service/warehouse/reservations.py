@@ -0,0 +1,239 @@
+"""
+Reservas de stock en dos fases: apartar -> confirmar o liberar, con vencimiento
+
+Apartar suma las unidades a reserved_quantity de la bodega elegida (sin tocar
+quantity) y devuelve una reserva con fecha de vencimiento. Confirmar descuenta
+las unidades de quantity y de reserved_quantity; liberar o vencer solo las
+devuelve a reserved_quantity. Cada paso es un UPDATE corto, así que quien
+aparta no mantiene filas bloqueadas mientras termina el resto del pedido.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .allocation import allocate_nearest, forget_allocations, haversine_km
+from .models import Inventory, StockReservation
+
+SWEEP_BATCH_SIZE = 500
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+class ReservationNotHeld(Exception):
+    pass
+
+
+class StockChanged(Exception):
+    pass
+
+
+def hold_nearest(product_id, units, lat, lon, preferred_warehouse=None, ttl=None):
+    """
+    Aparta `units` en la bodega preferida si tiene stock, o en la más cercana que lo tenga.
+
+    Devuelve (reserva, inventario con `distance`) o None si ninguna bodega tiene stock suficiente.
+    """
+    sweep_if_due()
+    ttl = min(ttl or settings.RESERVATION_TTL_SECONDS, settings.RESERVATION_MAX_TTL_SECONDS)
+    with transaction.atomic():
+        inventory = allocate_nearest(product_id, units, lat, lon, preferred_warehouse,
+                                     reserved_quantity=F('reserved_quantity') + units)
+        if inventory is None:
+            return None
+        reservation = StockReservation.objects.create(
+            inventory=inventory,
+            units=units,
+            expires_at=timezone.now() + timedelta(seconds=ttl)
+        )
+    return reservation, inventory
+
+
+def hold_many(lines, ttl=None):
+    """
+    Aparta varias líneas ({'product_id', 'units', 'lat', 'lon', 'preferred_warehouse'?}) en una sola transacción.
+
+    Bloquea una vez los inventarios de todos los productos, asigna cada línea en
+    memoria (bodega preferida o la más cercana con stock, descontando lo asignado
+    a las líneas anteriores) y aplica un solo UPDATE por inventario. Devuelve una
+    lista alineada con `lines`: (reserva, inventario, distancia_km) o None si la
+    línea no tiene stock. Lanza StockChanged si el stock cambió entre la lectura y
+    el UPDATE (solo posible en bases sin bloqueo de filas); no se aparta nada.
+    """
+    sweep_if_due()
+    ttl = min(ttl or settings.RESERVATION_TTL_SECONDS, settings.RESERVATION_MAX_TTL_SECONDS)
+    with transaction.atomic():
+        inventories = (Inventory.objects.select_for_update(of=('self',)).select_related('warehouse')
+                       .filter(product_id__in={line['product_id'] for line in lines}, warehouse__is_active=True)
+                       .order_by('id'))
+        by_product = defaultdict(list)
+        available = {}
+        for inventory in inventories:
+            by_product[inventory.product_id].append(inventory)
+            available[inventory.id] = inventory.get_available_quantity()
+        
+        allocations = []
+        held_units = defaultdict(int)
+        for line in lines:
+            units = line['units']
+            candidates = [(inventory.warehouse.name != line.get('preferred_warehouse'),
+                           haversine_km(line['lat'], line['lon'], inventory.warehouse.latitude, inventory.warehouse.longitude),
+                           inventory.id, inventory)
+                          for inventory in by_product[line['product_id']] if available[inventory.id] >= units]
+            if not candidates:
+                allocations.append(None)
+                continue
+            _, distance, _, inventory = min(candidates, key=lambda candidate: candidate[:3])
+            available[inventory.id] -= units
+            held_units[inventory.id] += units
+            allocations.append((inventory, distance))
+        
+        for inventory_id in sorted(held_units):
+            updated = Inventory.objects.filter(
+                pk=inventory_id, quantity__gte=F('reserved_quantity') + held_units[inventory_id]
+            ).update(reserved_quantity=F('reserved_quantity') + held_units[inventory_id])
+            if not updated:
+                raise StockChanged('El stock cambió mientras se apartaba; intente de nuevo')
+        
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        reservations = iter(StockReservation.objects.bulk_create([
+            StockReservation(inventory=allocation[0], units=line['units'], expires_at=expires_at)
+            for line, allocation in zip(lines, allocations) if allocation is not None
+        ]))
+    return [(next(reservations), *allocation) if allocation is not None else None for allocation in allocations]
+
+
+def _locked(reservation_id):
+    return StockReservation.objects.select_for_update(of=('self',)).select_related('inventory__warehouse').get(pk=reservation_id)
+
+
+def commit(reservation_id):
+    """
+    Confirma una reserva: descuenta sus unidades del inventario.
+
+    Confirmar dos veces la misma reserva no descuenta dos veces. Lanza
+    StockReservation.DoesNotExist o ReservationNotHeld si ya no está apartada.
+    """
+    with transaction.atomic():
+        reservation = _locked(reservation_id)
+        if reservation.status == StockReservation.HELD and reservation.expires_at <= timezone.now():
+            _return_units([reservation], StockReservation.EXPIRED)
+            reservation.status = StockReservation.EXPIRED
+        elif reservation.status == StockReservation.HELD:
+            Inventory.objects.filter(pk=reservation.inventory_id).update(
+                quantity=F('quantity') - reservation.units,
+                reserved_quantity=F('reserved_quantity') - reservation.units
+            )
+            reservation.status = StockReservation.COMMITTED
+            reservation.save(update_fields=['status', 'updated_at'])
+    # Se lanza fuera de la transacción para no deshacer el vencimiento recién aplicado
+    if reservation.status != StockReservation.COMMITTED:
+        raise ReservationNotHeld(f'La reserva {reservation.id} no está apartada ({reservation.get_status_display()})')
+    return reservation
+
+
+def release(reservation_id):
+    """
+    Libera una reserva apartada: sus unidades vuelven a estar disponibles.
+
+    Liberar una reserva ya liberada o vencida no hace nada; lanza ReservationNotHeld si ya se confirmó.
+    """
+    with transaction.atomic():
+        reservation = _locked(reservation_id)
+        if reservation.status == StockReservation.HELD:
+            _return_units([reservation], StockReservation.RELEASED)
+            reservation.status = StockReservation.RELEASED
+    if reservation.status == StockReservation.COMMITTED:
+        raise ReservationNotHeld(f'La reserva {reservation.id} ya fue confirmada')
+    return reservation
+
+
+def finish_many(reservation_ids, action):
+    """
+    Confirma (action='commit') o libera (action='release') varias reservas en una transacción.
+
+    Las unidades se agrupan por inventario: un UPDATE por inventario en lugar de
+    uno por reserva. Las reservas vencidas no se confirman. Devuelve {id: estado
+    final} de las reservas que existen.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        reservations = list(StockReservation.objects.select_for_update()
+                            .filter(pk__in=reservation_ids).order_by('id'))
+        held = [reservation for reservation in reservations if reservation.status == StockReservation.HELD]
+        if action == 'commit':
+            expired = [reservation for reservation in held if reservation.expires_at <= now]
+            committing = [reservation for reservation in held if reservation.expires_at > now]
+            if expired:
+                _return_units(expired, StockReservation.EXPIRED)
+            units_by_inventory = defaultdict(int)
+            for reservation in committing:
+                units_by_inventory[reservation.inventory_id] += reservation.units
+            for inventory_id in sorted(units_by_inventory):
+                Inventory.objects.filter(pk=inventory_id).update(
+                    quantity=F('quantity') - units_by_inventory[inventory_id],
+                    reserved_quantity=F('reserved_quantity') - units_by_inventory[inventory_id]
+                )
+            StockReservation.objects.filter(pk__in=[reservation.pk for reservation in committing]).update(
+                status=StockReservation.COMMITTED, updated_at=now
+            )
+            statuses = {reservation.pk: StockReservation.EXPIRED for reservation in expired}
+            statuses.update({reservation.pk: StockReservation.COMMITTED for reservation in committing})
+        else:
+            if held:
+                _return_units(held, StockReservation.RELEASED)
+            statuses = {reservation.pk: StockReservation.RELEASED for reservation in held}
+    return {reservation.pk: statuses.get(reservation.pk, reservation.status) for reservation in reservations}
+
+
+def _return_units(reservations, new_status):
+    """Devuelve a los inventarios las unidades de reservas apartadas, con un UPDATE por inventario"""
+    units_by_inventory = defaultdict(int)
+    for reservation in reservations:
+        units_by_inventory[reservation.inventory_id] += reservation.units
+    # Siempre en el mismo orden, para que dos barridos simultáneos no se bloqueen entre sí
+    for inventory_id in sorted(units_by_inventory):
+        Inventory.objects.filter(pk=inventory_id).update(
+            reserved_quantity=F('reserved_quantity') - units_by_inventory[inventory_id]
+        )
+    StockReservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).update(
+        status=new_status, updated_at=timezone.now()
+    )
+
+
+def expire_holds(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Devuelve al inventario todas las reservas apartadas que vencieron; retorna cuántas venció"""
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked: las reservas que se están confirmando o liberando en este momento se dejan para ese camino
+            batch = list(StockReservation.objects.select_for_update(skip_locked=True)
+                         .filter(status=StockReservation.HELD, expires_at__lte=now)
+                         .only('id', 'inventory_id', 'units')[:batch_size])
+            if batch:
+                _return_units(batch, StockReservation.EXPIRED)
+        expired += len(batch)
+        if len(batch) < batch_size:
+            return expired
+
+
+def sweep_if_due():
+    """
+    Barre las reservas vencidas (y borra los registros viejos de reserve-nearest)
+    si pasaron RESERVATION_SWEEP_INTERVAL segundos desde el último barrido de este proceso
+    """
+    global _last_sweep
+    now = time.monotonic()
+    if now - _last_sweep < settings.RESERVATION_SWEEP_INTERVAL or not _sweep_lock.acquire(blocking=False):
+        return 0
+    try:
+        _last_sweep = now
+        forget_allocations(settings.ALLOCATION_RECORD_TTL_SECONDS)
+        return expire_holds()
+    finally:
+        _sweep_lock.release()
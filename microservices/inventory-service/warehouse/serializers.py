@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Warehouse, Inventory, Measurement
+from .models import Warehouse, Inventory, Measurement, StockReservation
 
 class WarehouseSerializer(serializers.ModelSerializer):
     current_stock = serializers.SerializerMethodField()
@@ -36,6 +36,19 @@ class InventorySerializer(serializers.ModelSerializer):
     def get_available_quantity(self, obj):
         return obj.get_available_quantity()
 
+class StockReservationSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(source='inventory.product_id', read_only=True)
+    warehouse_id = serializers.IntegerField(source='inventory.warehouse_id', read_only=True)
+    warehouse_name = serializers.CharField(source='inventory.warehouse.name', read_only=True)
+    
+    class Meta:
+        model = StockReservation
+        fields = [
+            'id', 'inventory', 'product_id', 'warehouse_id', 'warehouse_name',
+            'units', 'status', 'expires_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
 class MeasurementSerializer(serializers.ModelSerializer):
     place_name = serializers.CharField(source='place.name', read_only=True)
     
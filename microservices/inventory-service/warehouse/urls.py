@@ -3,9 +3,20 @@ from . import views
 
 urlpatterns = [
     path('warehouses/', views.warehouse_list, name='warehouse_list'),
+    path('warehouses/locations/', views.warehouse_locations, name='warehouse_locations'),
     path('warehouses/<int:warehouse_id>/', views.warehouse_detail, name='warehouse_detail'),
+    path('inventory/reserve-nearest/', views.inventory_reserve_nearest, name='inventory_reserve_nearest'),
+    path('inventory/reserve-nearest/<str:request_id>/cancel/', views.inventory_reserve_nearest_cancel,
+         name='inventory_reserve_nearest_cancel'),
     path('inventory/<str:product_name>/', views.inventory_by_product, name='inventory_by_product'),
     path('inventory/<str:product_name>/restock/', views.inventory_restock, name='inventory_restock'),
+    path('reservations/', views.reservation_create, name='reservation_create'),
+    path('reservations/bulk/', views.reservation_bulk_create, name='reservation_bulk_create'),
+    path('reservations/bulk/commit/', views.reservation_bulk_commit, name='reservation_bulk_commit'),
+    path('reservations/bulk/release/', views.reservation_bulk_release, name='reservation_bulk_release'),
+    path('reservations/<int:reservation_id>/', views.reservation_detail, name='reservation_detail'),
+    path('reservations/<int:reservation_id>/commit/', views.reservation_commit, name='reservation_commit'),
+    path('reservations/<int:reservation_id>/release/', views.reservation_release, name='reservation_release'),
     path('measurements/', views.measurement_list, name='measurement_list'),
     path('measurements/create/', views.measurement_create, name='measurement_create'),
 ]
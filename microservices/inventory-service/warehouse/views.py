@@ -2,11 +2,19 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Count, F, Max
+from django.views.decorators.http import condition
 from django.conf import settings
 import requests
-from .models import Warehouse, Inventory, Measurement
-from .serializers import WarehouseSerializer, InventorySerializer, MeasurementSerializer
+from .models import Warehouse, Inventory, Measurement, StockReservation
+from . import deadline
+from .allocation import cancel_allocation, reserve_nearest
+from .deadline import DeadlineExceeded
+from .reservations import (ReservationNotHeld, StockChanged, commit, finish_many, hold_many, hold_nearest, release,
+                           sweep_if_due)
+from .serializers import WarehouseSerializer, InventorySerializer, MeasurementSerializer, StockReservationSerializer
+
+RESERVATIONS_BULK_MAX_LINES = 1000
 
 @api_view(['GET'])
 def warehouse_list(request):
@@ -15,6 +23,19 @@ def warehouse_list(request):
     serializer = WarehouseSerializer(warehouses, many=True)
     return Response(serializer.data)
 
+def warehouse_locations_etag(request):
+    """ETag de la lista de bodegas: cambia al crear, borrar o editar cualquier bodega"""
+    summary = Warehouse.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    updated = summary['updated'].timestamp() if summary['updated'] else 0
+    return f"{summary['count']}-{updated}"
+
+@condition(etag_func=warehouse_locations_etag)
+@api_view(['GET'])
+def warehouse_locations(request):
+    """Coordenadas de las bodegas activas, para el índice espacial de orders-service (responde 304 si no cambiaron)"""
+    warehouses = Warehouse.objects.filter(is_active=True).values('id', 'name', 'latitude', 'longitude')
+    return Response(list(warehouses))
+
 @api_view(['GET'])
 def warehouse_detail(request, warehouse_id):
     """Obtener detalles de una bodega"""
@@ -30,7 +51,7 @@ def inventory_by_product(request, product_name):
     """Obtener inventario de un producto por nombre"""
     try:
         products_url = f"{settings.PRODUCTS_SERVICE_URL}/api/products/name/{product_name}/"
-        product_response = requests.get(products_url, timeout=5)
+        product_response = requests.get(products_url, headers=deadline.headers(), timeout=deadline.timeout(5))
         
         if product_response.status_code != 200:
             return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
@@ -41,6 +62,8 @@ def inventory_by_product(request, product_name):
         inventories = Inventory.objects.filter(product_id=product_id)
         serializer = InventorySerializer(inventories, many=True)
         return Response(serializer.data)
+    except DeadlineExceeded as e:
+        return Response({'error': str(e)}, status=status.HTTP_504_GATEWAY_TIMEOUT)
     except requests.RequestException:
         return Response({'error': 'Error al comunicarse con el servicio de productos'}, 
                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -57,7 +80,7 @@ def inventory_restock(request, product_name):
                            status=status.HTTP_400_BAD_REQUEST)
         
         products_url = f"{settings.PRODUCTS_SERVICE_URL}/api/products/name/{product_name}/"
-        product_response = requests.get(products_url, timeout=5)
+        product_response = requests.get(products_url, headers=deadline.headers(), timeout=deadline.timeout(5))
         
         if product_response.status_code != 200:
             return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
@@ -78,25 +101,202 @@ def inventory_restock(request, product_name):
                 defaults={'product_name': product_name_cache, 'quantity': 0}
             )
             
-            if units < 0 and inventory.quantity + units < 0:
+            # Al restar, las unidades apartadas por reservas no se pueden tocar: UPDATE condicionado al disponible
+            rows = Inventory.objects.filter(pk=inventory.pk)
+            if units < 0:
+                rows = rows.filter(quantity__gte=F('reserved_quantity') - units)
+            updated = rows.update(quantity=F('quantity') + units)
+            inventory.refresh_from_db()
+            if not updated:
                 return Response(
-                    {'error': f'Stock insuficiente. Disponible: {inventory.quantity}, Solicitado: {abs(units)}'}, 
+                    {'error': f'Stock insuficiente. Disponible: {inventory.get_available_quantity()}, Solicitado: {abs(units)}'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            Inventory.objects.filter(pk=inventory.pk).update(
-                quantity=F('quantity') + units
-            )
-            inventory.refresh_from_db()
         
         serializer = InventorySerializer(inventory)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except (ValueError, KeyError) as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except DeadlineExceeded as e:
+        return Response({'error': str(e)}, status=status.HTTP_504_GATEWAY_TIMEOUT)
     except requests.RequestException:
         return Response({'error': 'Error al comunicarse con el servicio de productos'}, 
                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
+def parse_allocation_request(data):
+    """(product_id, units, lat, lon) de una petición de asignación de bodega, o ValueError con el mensaje para el cliente"""
+    try:
+        product_id = int(data['product_id'])
+        units = int(data['units'])
+        lat = float(data['lat'])
+        lon = float(data['lon'])
+    except KeyError as e:
+        raise ValueError(f'Falta el campo {e.args[0]}')
+    except (TypeError, ValueError):
+        raise ValueError('product_id, units, lat y lon deben ser numéricos')
+    if units <= 0:
+        raise ValueError('La cantidad debe ser mayor que cero')
+    return product_id, units, lat, lon
+
+@api_view(['POST'])
+def inventory_reserve_nearest(request):
+    """
+    Descontar unidades de la bodega más cercana con stock (o de la preferida si tiene)
+
+    Recibe product_id, units, lat, lon y opcionalmente preferred_warehouse (nombre)
+    y request_id. Elige la bodega y descuenta en una sola transacción; 409 si
+    ninguna tiene stock. Repetir la petición con el mismo request_id no descuenta otra vez.
+    """
+    try:
+        product_id, units, lat, lon = parse_allocation_request(request.data)
+        request_id = request.data.get('request_id')
+        if request_id is not None and not (isinstance(request_id, str) and 0 < len(request_id) <= 64):
+            raise ValueError('request_id debe ser un texto de hasta 64 caracteres')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if request_id is not None:
+        sweep_if_due()
+    inventory = reserve_nearest(product_id, units, lat, lon, request.data.get('preferred_warehouse'), request_id)
+    if inventory is None:
+        return Response({'error': f'Stock insuficiente en todas las bodegas. Solicitado: {units}'},
+                       status=status.HTTP_409_CONFLICT)
+    
+    return Response({
+        'warehouse_id': inventory.warehouse_id,
+        'warehouse_name': inventory.warehouse.name,
+        'inventory_id': inventory.id,
+        'distance': inventory.distance,
+        'quantity': inventory.quantity,
+        'available_quantity': inventory.get_available_quantity(),
+    }, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+def inventory_reserve_nearest_cancel(request, request_id):
+    """Devolver las unidades descontadas por reserve-nearest con `request_id` (o impedir que se descuenten si aún no llegó)"""
+    return Response({'request_id': request_id, 'returned_units': cancel_allocation(request_id)})
+
+@api_view(['POST'])
+def reservation_create(request):
+    """
+    Apartar unidades en la bodega más cercana con stock (o en la preferida si tiene)
+
+    Recibe lo mismo que reserve-nearest y opcionalmente ttl (segundos). Las unidades
+    quedan en reserved_quantity hasta confirmar o liberar la reserva, o hasta que vence.
+    """
+    try:
+        product_id, units, lat, lon = parse_allocation_request(request.data)
+        ttl = float(request.data['ttl']) if request.data.get('ttl') is not None else None
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    held = hold_nearest(product_id, units, lat, lon, request.data.get('preferred_warehouse'), ttl)
+    if held is None:
+        return Response({'error': f'Stock insuficiente en todas las bodegas. Solicitado: {units}'},
+                       status=status.HTTP_409_CONFLICT)
+    
+    reservation, inventory = held
+    data = StockReservationSerializer(reservation).data
+    data['distance'] = inventory.distance
+    return Response(data, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+def reservation_bulk_create(request):
+    """
+    Apartar varias líneas en una sola transacción: {"lines": [{product_id, units, lat, lon, preferred_warehouse?}], "ttl"?}
+
+    Responde {"results": [...]} en el orden de las líneas: la reserva de cada una
+    o {"error": ...} si no hay stock para esa línea.
+    """
+    lines = request.data.get('lines')
+    if not isinstance(lines, list) or not lines:
+        return Response({'error': 'lines debe ser una lista no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(lines) > RESERVATIONS_BULK_MAX_LINES:
+        return Response({'error': f'Máximo {RESERVATIONS_BULK_MAX_LINES} líneas por petición'},
+                       status=status.HTTP_400_BAD_REQUEST)
+    try:
+        parsed = []
+        for line in lines:
+            product_id, units, lat, lon = parse_allocation_request(line)
+            parsed.append({'product_id': product_id, 'units': units, 'lat': lat, 'lon': lon,
+                           'preferred_warehouse': line.get('preferred_warehouse')})
+        ttl = float(request.data['ttl']) if request.data.get('ttl') is not None else None
+    except (TypeError, ValueError, AttributeError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        allocations = hold_many(parsed, ttl)
+    except StockChanged as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    
+    results = []
+    for line, allocation in zip(parsed, allocations):
+        if allocation is None:
+            results.append({'error': f"Stock insuficiente en todas las bodegas. Solicitado: {line['units']}"})
+            continue
+        reservation, inventory, distance = allocation
+        results.append({
+            'id': reservation.id,
+            'inventory': inventory.id,
+            'product_id': inventory.product_id,
+            'warehouse_id': inventory.warehouse_id,
+            'warehouse_name': inventory.warehouse.name,
+            'units': reservation.units,
+            'status': reservation.status,
+            'expires_at': reservation.expires_at,
+            'distance': distance,
+        })
+    return Response({'results': results}, status=status.HTTP_201_CREATED)
+
+def finish_reservations_bulk(request, action):
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(reservation_id, int) for reservation_id in ids):
+        return Response({'error': 'ids debe ser una lista de ids de reserva'}, status=status.HTTP_400_BAD_REQUEST)
+    statuses = finish_many(ids, action)
+    return Response({'results': {str(reservation_id): reservation_status
+                                 for reservation_id, reservation_status in statuses.items()}})
+
+@api_view(['POST'])
+def reservation_bulk_commit(request):
+    """Confirmar varias reservas ({"ids": [...]}) con un UPDATE por inventario; responde el estado final de cada una"""
+    return finish_reservations_bulk(request, 'commit')
+
+@api_view(['POST'])
+def reservation_bulk_release(request):
+    """Liberar varias reservas ({"ids": [...]}); responde el estado final de cada una"""
+    return finish_reservations_bulk(request, 'release')
+
+@api_view(['GET'])
+def reservation_detail(request, reservation_id):
+    """Obtener el estado de una reserva"""
+    try:
+        reservation = StockReservation.objects.select_related('inventory__warehouse').get(id=reservation_id)
+    except StockReservation.DoesNotExist:
+        return Response({'error': 'Reserva no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(StockReservationSerializer(reservation).data)
+
+@api_view(['POST'])
+def reservation_commit(request, reservation_id):
+    """Confirmar una reserva: descuenta sus unidades del inventario (409 si ya se liberó o venció)"""
+    try:
+        reservation = commit(reservation_id)
+    except StockReservation.DoesNotExist:
+        return Response({'error': 'Reserva no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    except ReservationNotHeld as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(StockReservationSerializer(reservation).data)
+
+@api_view(['POST'])
+def reservation_release(request, reservation_id):
+    """Liberar una reserva: sus unidades vuelven a estar disponibles (409 si ya se confirmó)"""
+    try:
+        reservation = release(reservation_id)
+    except StockReservation.DoesNotExist:
+        return Response({'error': 'Reserva no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    except ReservationNotHeld as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(StockReservationSerializer(reservation).data)
+
 @api_view(['GET'])
 def measurement_list(request):
     """Listar todas las mediciones"""
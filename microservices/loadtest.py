@@ -0,0 +1,120 @@
+"""
+Prueba de carga de un microservicio: servidor de desarrollo (manage.py runserver) vs Gunicorn
+
+Arranca el microservicio con cada servidor, espera a que /ready/ responda y lanza
+peticiones GET a --path con distintos niveles de concurrencia. La base de datos
+se toma de las variables de entorno del servicio (DB_HOST, DB_PORT, ...).
+
+Uso: python loadtest.py products-service --path /api/products/ --concurrency 10 50 200
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+def start_process(args, cwd, env):
+    return subprocess.Popen(args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} no respondió a tiempo')
+
+
+async def fetch(host, port, path):
+    """GET mínimo sobre asyncio para que el cliente no sea el cuello de botella"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def run_load(port, path, total, concurrency):
+    """Lanza `total` peticiones con `concurrency` en vuelo y mide latencias"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if await asyncio.wait_for(fetch('127.0.0.1', port, path), 60) != 200:
+                    errors += 1
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'throughput': total / elapsed,
+        'p50': latencies[int(len(latencies) * 0.50)],
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('service', help='Directorio del microservicio, p. ej. products-service')
+    parser.add_argument('--path', default='/ready/', help='Ruta a consultar')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--requests', type=int, default=0, help='Peticiones por nivel (por defecto 10x la concurrencia)')
+    parser.add_argument('--port', type=int, default=19000)
+    args = parser.parse_args()
+
+    service_dir = os.path.join(BASE_DIR, args.service)
+    project = args.service.replace('-service', '_service')
+    env = dict(os.environ, DEBUG='False')
+    servers = {
+        'runserver': [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{args.port}'],
+        'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{args.port + 1}',
+                     f'{project}.wsgi'],
+    }
+    ports = {'runserver': args.port, 'gunicorn': args.port + 1}
+
+    processes = []
+    try:
+        for name, command in servers.items():
+            processes.append(start_process(command, service_dir, env))
+        for name, port in ports.items():
+            wait_until_ready(f'http://127.0.0.1:{port}/ready/')
+
+        print(f"{'servidor':<12}{'concurrencia':>14}{'req/s':>10}{'p50 (s)':>10}{'p99 (s)':>10}{'errores':>10}")
+        for concurrency in args.concurrency:
+            total = args.requests or concurrency * 10
+            for name, port in ports.items():
+                result = asyncio.run(run_load(port, args.path, total, concurrency))
+                print(f"{name:<12}{concurrency:>14}{result['throughput']:>10.1f}"
+                      f"{result['p50']:>10.3f}{result['p99']:>10.3f}{result['errors']:>10}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
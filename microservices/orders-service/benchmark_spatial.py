@@ -0,0 +1,88 @@
+"""
+Benchmark de la selección de bodega: recorrido lineal con haversine vs índice espacial (k-d tree)
+
+Genera --warehouses bodegas aleatorias dentro de Colombia y, para cada tamaño,
+mide la construcción del índice y el tiempo por consulta de las k bodegas más
+cercanas, con stock en todas las bodegas o solo en una fracción de ellas. La
+última columna es la lista ordenada de respaldo de k bodegas (WarehouseIndex.rank,
+vectorizada con numpy si está instalado). No necesita Django ni base de datos.
+Es el camino de INVENTORY_ALLOCATION_MODE=restock: en los demás modos la bodega
+se elige en inventory-service y orders-service no usa el índice.
+
+Uso: python benchmark_spatial.py --warehouses 10 1000 100000 --queries 200
+"""
+import argparse
+import heapq
+import random
+import time
+from math import asin, cos, radians, sin, sqrt
+from orders import spatial
+from orders.spatial import WarehouseIndex
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * asin(sqrt(a))
+
+
+def random_point(rng):
+    return rng.uniform(-4.5, 13.5), rng.uniform(-79, -66)
+
+
+def linear_nearest(warehouses, candidates, lat, lon, k):
+    """Lo que hacía orders-service: medir la distancia a cada bodega con stock"""
+    distances = ((haversine_km(lon, lat, warehouses[warehouse_id]['longitude'], warehouses[warehouse_id]['latitude']),
+                  warehouses[warehouse_id]) for warehouse_id in candidates)
+    return heapq.nsmallest(k, distances, key=lambda item: item[0])
+
+
+def per_query_us(function, queries):
+    started = time.perf_counter()
+    for lat, lon in queries:
+        function(lat, lon)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--warehouses', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--stock', type=float, nargs='+', default=[1.0, 0.1],
+                        help='Fracción de bodegas con stock suficiente')
+    parser.add_argument('-k', type=int, nargs='+', default=[1, 5])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [random_point(rng) for _ in range(args.queries)]
+    print(f"numpy: {'sí' if spatial.numpy is not None else 'no'}")
+    print(f"{'bodegas':>9}{'build (ms)':>12}{'stock':>7}{'k':>4}{'lineal (µs)':>13}{'índice (µs)':>13}"
+          f"{'speedup':>9}{'rank (µs)':>11}")
+    for size in args.warehouses:
+        warehouses = {}
+        for warehouse_id in range(1, size + 1):
+            lat, lon = random_point(rng)
+            warehouses[warehouse_id] = {'id': warehouse_id, 'name': f'Bodega {warehouse_id}',
+                                        'latitude': lat, 'longitude': lon}
+        started = time.perf_counter()
+        index = WarehouseIndex(warehouses.values())
+        build_ms = (time.perf_counter() - started) * 1000
+
+        for fraction in args.stock:
+            candidates = {warehouse_id for warehouse_id in warehouses if rng.random() < fraction} or {1}
+            for k in args.k:
+                # Ambos caminos deben elegir las mismas bodegas
+                lat, lon = queries[0]
+                expected = [item[1]['id'] for item in linear_nearest(warehouses, candidates, lat, lon, k)]
+                assert [item[1]['id'] for item in index.nearest_among(candidates, lat, lon, k)] == expected
+                assert [item[1]['id'] for item in index.rank(candidates, lat, lon, limit=k)] == expected
+                linear = per_query_us(lambda lat, lon: linear_nearest(warehouses, candidates, lat, lon, k), queries)
+                indexed = per_query_us(lambda lat, lon: index.nearest_among(candidates, lat, lon, k), queries)
+                ranked = per_query_us(lambda lat, lon: index.rank(candidates, lat, lon, limit=k), queries)
+                print(f"{size:>9}{build_ms:>12.1f}{fraction:>7.0%}{k:>4}{linear:>13.1f}{indexed:>13.1f}"
+                      f"{linear / indexed:>8.1f}x{ranked:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
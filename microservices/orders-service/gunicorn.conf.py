@@ -0,0 +1,27 @@
+"""
+Configuración de Gunicorn para producción
+
+Uso: gunicorn -c gunicorn.conf.py orders_service.wsgi
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8004)}"
+
+# Procesos pre-fork según los núcleos disponibles, cada uno con algunos hilos para las vistas que esperan I/O
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Reciclaje de procesos tras N peticiones (con jitter para que no se reinicien todos a la vez)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Apagado ordenado: con SIGTERM se terminan las peticiones en curso durante graceful_timeout segundos
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = '-'
+errorlog = '-'
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order
+from .models import IdempotencyKey, Order, OrderRequest, OrderStatusEvent
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -7,3 +7,17 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at']
     search_fields = ['product_name', 'customer_name']
 
+@admin.register(OrderStatusEvent)
+class OrderStatusEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order', 'previous_status', 'status', 'created_at']
+    list_filter = ['status']
+
+@admin.register(OrderRequest)
+class OrderRequestAdmin(admin.ModelAdmin):
+    list_display = ['id', 'product_name', 'units', 'status', 'order', 'confirmed', 'created_at', 'finished_at']
+    list_filter = ['status']
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['id', 'scope', 'key', 'response_status', 'created_at', 'expires_at']
+    search_fields = ['key']
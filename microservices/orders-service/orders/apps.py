@@ -4,3 +4,5 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,162 @@
+"""
+Pedidos en lote: varios carritos, cada uno con varias líneas (producto y unidades)
+
+Cada línea se convierte en un pedido. El lote completo usa una consulta de
+productos, una petición que aparta el stock de todas las líneas (inventory-service
+agrupa los cambios por inventario en una transacción), un bulk_create de pedidos
+y una petición que confirma todas las reservas, en lugar de varias llamadas por línea.
+"""
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import requests
+from . import deadline
+from .logic import finish_reservations, hold_stock_many
+from .models import Order, OrderStatusEvent
+from .product_cache import PRODUCT_CACHE, ProductLookupError, fetch_products
+
+
+def place_orders_bulk(carts, max_retries=3):
+    """
+    Crea un pedido por línea de cada carrito.
+
+    `carts` es [{'lat', 'lon', 'customer_id', 'main_warehouse_name', 'lines': [{'product', 'units'}]}].
+    Las líneas de productos inexistentes no crean pedido. Lanza ValueError si no se
+    pueden consultar los productos y requests.RequestException si inventory-service
+    no responde al apartar el stock.
+    """
+    started = time.perf_counter()
+    items = [(cart, line) for cart in carts for line in cart['lines']]
+
+    product_names = [line['product'] for _, line in items]
+    try:
+        if settings.PRODUCT_CACHE_ENABLED:
+            products = PRODUCT_CACHE.get_many(product_names)
+        else:
+            products = fetch_products(set(product_names))
+    except ProductLookupError as e:
+        raise ValueError(str(e))
+
+    # Índices (en `items`) de las líneas con producto conocido: son las que se apartan y crean pedido
+    known = [index for index, (_, line) in enumerate(items) if products.get(line['product']) is not None]
+    holds = hold_stock_many([
+        {
+            'product_id': products[items[index][1]['product']]['id'],
+            'units': items[index][1]['units'],
+            'lat': items[index][0]['lat'],
+            'lon': items[index][0]['lon'],
+            'preferred_warehouse': items[index][0].get('main_warehouse_name')
+        }
+        for index in known
+    ], max_retries=max_retries) if known else []
+    holds = dict(zip(known, holds))
+
+    orders = {}
+    for index in known:
+        cart, line = items[index]
+        product = products[line['product']]
+        hold = holds[index]
+        held = 'id' in hold
+        orders[index] = Order(
+            product_id=product['id'],
+            product_name=line['product'],
+            units=line['units'],
+            customer_id=cart.get('customer_id'),
+            total_price=float(product['unit_price']) * line['units'],
+            status=Order.PENDING if held else Order.REJECTED,
+            warehouse_id=hold['warehouse_id'] if held else None,
+            warehouse_name=hold['warehouse_name'] if held else None
+        )
+    held_orders = [(orders[index], holds[index]['id']) for index in known if 'id' in holds[index]]
+
+    try:
+        # bulk_create no emite post_save: los eventos de estado se escriben aquí
+        with transaction.atomic():
+            Order.objects.bulk_create(orders.values())
+            OrderStatusEvent.objects.bulk_create([OrderStatusEvent(order=order, status=order.status)
+                                                  for order in orders.values()])
+    except Exception:
+        _release([reservation_id for _, reservation_id in held_orders])
+        raise
+
+    statuses = _commit([reservation_id for _, reservation_id in held_orders], max_retries)
+
+    now = timezone.now()
+    confirmed = [order for order, reservation_id in held_orders if statuses.get(reservation_id) == 'COMMITTED']
+    rejected = [order for order, reservation_id in held_orders if statuses.get(reservation_id) != 'COMMITTED']
+    with transaction.atomic():
+        Order.objects.filter(pk__in=[order.pk for order in confirmed]).update(
+            status=Order.CONFIRMED, confirmed_at=now, updated_at=now
+        )
+        Order.objects.filter(pk__in=[order.pk for order in rejected]).update(
+            status=Order.REJECTED, warehouse_id=None, warehouse_name=None, updated_at=now
+        )
+        OrderStatusEvent.objects.bulk_create(
+            [OrderStatusEvent(order=order, status=Order.CONFIRMED, previous_status=Order.PENDING) for order in confirmed]
+            + [OrderStatusEvent(order=order, status=Order.REJECTED, previous_status=Order.PENDING) for order in rejected]
+        )
+    for order in confirmed:
+        order.status, order.confirmed_at = Order.CONFIRMED, now
+    for order in rejected:
+        order.status, order.warehouse_id, order.warehouse_name = Order.REJECTED, None, None
+
+    results = []
+    index = 0
+    for cart in carts:
+        cart_orders = []
+        for line in cart['lines']:
+            order = orders.get(index)
+            index += 1
+            if order is None:
+                cart_orders.append({
+                    'product': line['product'],
+                    'units': line['units'],
+                    'error': f"Producto {line['product']} no encontrado"
+                })
+                continue
+            cart_orders.append({
+                'order_id': order.id,
+                'product': order.product_name,
+                'units': order.units,
+                'status': order.status,
+                'assigned_warehouse': order.warehouse_name,
+                'confirmed': order.status == Order.CONFIRMED
+            })
+        results.append({
+            'orders': cart_orders,
+            'confirmed': sum(1 for entry in cart_orders if entry.get('confirmed'))
+        })
+
+    elapsed = time.perf_counter() - started
+    return {
+        'carts': results,
+        'lines': len(items),
+        'confirmed': len(confirmed),
+        'rejected': len(items) - len(confirmed),
+        'elapsed_seconds': round(elapsed, 3),
+        'lines_per_second': round(len(items) / elapsed, 1) if elapsed > 0 else None
+    }
+
+
+def _commit(reservation_ids, max_retries):
+    """Confirma las reservas; confirmar dos veces no descuenta dos veces, así que se reintenta ante errores de red"""
+    if not reservation_ids:
+        return {}
+    for attempt in range(1, max_retries + 1):
+        try:
+            return finish_reservations(reservation_ids, 'commit')
+        except requests.RequestException:
+            if attempt >= max_retries or deadline.expired():
+                # Los pedidos quedan rechazados; si no se pueden liberar, las reservas vencen solas
+                _release(reservation_ids)
+                return {}
+
+
+def _release(reservation_ids):
+    if not reservation_ids:
+        return
+    try:
+        finish_reservations(reservation_ids, 'release', cleanup=True)
+    except requests.RequestException:
+        pass
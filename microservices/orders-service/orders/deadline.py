@@ -0,0 +1,80 @@
+"""
+Tiempo límite de la petición en curso, recibido del gateway en X-Deadline-Ms (milisegundos restantes)
+
+El middleware convierte la cabecera en un instante de time.monotonic() al
+llegar la petición. Cada llamada a otro servicio usa timeout() y headers(): su
+timeout se acota a lo que queda y el servicio siguiente recibe el resto. Se
+envía lo que queda (y no una hora absoluta) para no depender de que los relojes
+de los servidores coincidan.
+"""
+import contextvars
+import time
+import requests
+from django.http import JsonResponse
+
+DEADLINE_HEADER = 'X-Deadline-Ms'
+# Por debajo de este margen no se empieza otra llamada: no alcanzaría a responder
+MIN_REMAINING_SECONDS = 0.05
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Se agotó el tiempo de la petición; es un Timeout para que el manejo de errores de red existente lo trate igual"""
+
+
+def remaining():
+    """Segundos que quedan a la petición en curso, o None si no tiene tiempo límite"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left < MIN_REMAINING_SECONDS
+
+
+def timeout(default):
+    """Timeout para una llamada: `default` acotado a lo que queda; lanza DeadlineExceeded si ya no alcanza"""
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_REMAINING_SECONDS:
+        raise DeadlineExceeded('Se agotó el tiempo límite de la petición')
+    return min(default, left)
+
+
+def headers():
+    """Cabecera con lo que queda menos un margen: el 504 del servicio siguiente llega antes que el timeout de la llamada"""
+    left = remaining()
+    return {} if left is None else {DEADLINE_HEADER: str(max(int((left - MIN_REMAINING_SECONDS) * 1000), 0))}
+
+
+def parse_budget(value):
+    """Segundos de un valor de X-Deadline-Ms, o None si falta o no es un número"""
+    try:
+        return float(value) / 1000 if value else None
+    except ValueError:
+        return None
+
+
+class DeadlineMiddleware:
+    """Fija el tiempo límite de cada petición; responde 504 si llega sin tiempo o si se agota durante la vista"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        budget = parse_budget(request.headers.get(DEADLINE_HEADER))
+        if budget is not None and budget < MIN_REMAINING_SECONDS:
+            return JsonResponse({'error': 'La petición llegó sin tiempo para procesarse'}, status=504)
+        token = _deadline.set(time.monotonic() + budget if budget is not None else None)
+        try:
+            return self.get_response(request)
+        finally:
+            _deadline.reset(token)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, DeadlineExceeded):
+            return JsonResponse({'error': str(exception)}, status=504)
+        return None
@@ -0,0 +1,150 @@
+"""
+Idempotency-Key para las vistas que crean pedidos
+
+La primera petición con una llave guarda una fila "en curso" (la restricción
+única sobre (scope, key) hace que solo una la obtenga), ejecuta la vista y
+guarda su respuesta. Un reintento con la misma llave recibe esa respuesta sin
+volver a crear el pedido ni descontar stock; un duplicado simultáneo espera a
+que la original termine en lugar de ejecutarse otra vez. Las respuestas 5xx y
+las excepciones no se guardan: la llave se libera para que el reintento se ejecute.
+"""
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from . import deadline
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+WAIT_POLL_SECONDS = 0.05
+CLAIM_ATTEMPTS = 3
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def idempotent(scope_name):
+    """Decorador de vista: con cabecera Idempotency-Key, ejecuta la vista una sola vez por llave y repite su respuesta"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'error': f'{IDEMPOTENCY_HEADER} debe tener como máximo {MAX_KEY_LENGTH} caracteres'},
+                                    status=400)
+            sweep_if_due()
+            scope = f"{scope_name}:{request.headers.get('X-User-Id', '')}"
+            request_hash = hashlib.sha256(request.path.encode('utf-8') + b'\n' + request.body).hexdigest()
+
+            for _ in range(CLAIM_ATTEMPTS):
+                record, claimed = _claim(scope, key, request_hash)
+                if claimed:
+                    return _run(record, view, request, *args, **kwargs)
+                if record.request_hash != request_hash:
+                    return JsonResponse({'error': f'La {IDEMPOTENCY_HEADER} ya se usó con otra petición'}, status=422)
+                if record.response_status is None:
+                    record = _wait(record)
+                    if record is None:
+                        continue  # La petición original falló y liberó la llave: esta la toma
+                    if record.response_status is None:
+                        break
+                return _replay(record)
+            return JsonResponse({'error': f'Hay una petición en curso con la misma {IDEMPOTENCY_HEADER}'},
+                                status=409, headers={'Retry-After': '1'})
+        return wrapper
+    return decorator
+
+
+def _claim(scope, key, request_hash):
+    """Devuelve (fila, True) si esta petición obtuvo la llave, o (fila existente, False)"""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(scope=scope, key=key, request_hash=request_hash,
+                                                 expires_at=expires_at), True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if record is None:
+        return _claim(scope, key, request_hash)
+    abandoned = (record.response_status is None
+                 and record.created_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS))
+    if record.expires_at <= now or abandoned:
+        # Se reutiliza la fila solo si nadie más la tomó entre la lectura y el UPDATE
+        taken = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).update(
+            request_hash=request_hash, response_status=None, response_body=None,
+            response_content_type=None, created_at=now, expires_at=expires_at
+        )
+        if taken:
+            record.refresh_from_db()
+            return record, True
+        record.refresh_from_db()
+    return record, False
+
+
+def _run(record, view, request, *args, **kwargs):
+    # Filtrado por created_at: si otra petición tomó la llave por darla por abandonada, su fila no se toca
+    owned = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+    try:
+        response = view(request, *args, **kwargs)
+    except Exception:
+        owned.delete()
+        raise
+    if response.status_code >= 500:
+        owned.delete()
+        return response
+    owned.update(response_status=response.status_code, response_body=response.content.decode(response.charset),
+                 response_content_type=response.get('Content-Type'))
+    return response
+
+
+def _wait(record):
+    """
+    Espera a que termine la petición que tiene la llave; None si la liberó sin guardar respuesta.
+
+    La espera no pasa del tiempo límite de esta petición (X-Deadline-Ms): si se
+    acaba antes, se devuelve la fila sin respuesta y el cliente recibe 409.
+    """
+    wait = settings.IDEMPOTENCY_WAIT_SECONDS
+    left = deadline.remaining()
+    if left is not None:
+        wait = min(wait, left - deadline.MIN_REMAINING_SECONDS)
+    wait_until = time.monotonic() + wait
+    while time.monotonic() < wait_until:
+        time.sleep(WAIT_POLL_SECONDS)
+        current = IdempotencyKey.objects.filter(pk=record.pk).first()
+        if current is None or current.response_status is not None:
+            return current
+    return record
+
+
+def _replay(record):
+    response = HttpResponse(record.response_body, status=record.response_status,
+                            content_type=record.response_content_type)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def sweep_if_due():
+    """Borra las llaves vencidas si pasaron IDEMPOTENCY_SWEEP_INTERVAL segundos desde el último barrido de este proceso"""
+    global _last_sweep
+    now = time.monotonic()
+    if now - _last_sweep < settings.IDEMPOTENCY_SWEEP_INTERVAL or not _sweep_lock.acquire(blocking=False):
+        return 0
+    try:
+        _last_sweep = now
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+    finally:
+        _sweep_lock.release()
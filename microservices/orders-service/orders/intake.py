@@ -0,0 +1,162 @@
+"""
+Recepción asíncrona de pedidos: cola en la base de datos de orders y workers que la drenan
+
+La vista guarda la solicitud (un INSERT) y responde 202 sin esperar a products
+ni a inventory. Los workers toman la solicitud en cola más antigua con
+SELECT ... FOR UPDATE SKIP LOCKED, así que varios hilos y varios procesos pueden
+drenar la misma tabla sin tomar dos veces la misma solicitud y sin otro broker.
+"""
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .logic import place_order_atomic
+from .models import OrderRequest
+
+METRICS_SAMPLE_SIZE = 1000
+
+
+class QueueFull(Exception):
+    pass
+
+
+def enqueue_order(product_name, units, lat, lon, customer_id=None, main_warehouse_name=None):
+    """Guarda una solicitud de pedido en la cola; lanza QueueFull si ya hay ORDER_QUEUE_MAX_DEPTH en espera"""
+    if settings.ORDER_QUEUE_MAX_DEPTH and queue_depth() >= settings.ORDER_QUEUE_MAX_DEPTH:
+        raise QueueFull('La cola de pedidos está llena; intente más tarde')
+    return OrderRequest.objects.create(
+        product_name=product_name,
+        units=units,
+        lat=lat,
+        lon=lon,
+        customer_id=customer_id,
+        main_warehouse_name=main_warehouse_name
+    )
+
+
+def queue_depth():
+    return OrderRequest.objects.filter(status=OrderRequest.QUEUED).count()
+
+
+def claim_next():
+    """Toma la solicitud en cola más antigua que no esté tomando otro worker, o None si no hay"""
+    with transaction.atomic():
+        order_request = (OrderRequest.objects.select_for_update(skip_locked=True)
+                         .filter(status=OrderRequest.QUEUED).order_by('id').first())
+        if order_request is None:
+            return None
+        order_request.status = OrderRequest.PROCESSING
+        order_request.started_at = timezone.now()
+        order_request.save(update_fields=['status', 'started_at'])
+    return order_request
+
+
+def process(order_request):
+    """Crea el pedido de una solicitud tomada y guarda el resultado en ella"""
+    try:
+        order, confirmed = place_order_atomic(
+            product_name=order_request.product_name,
+            units=order_request.units,
+            user_lat=order_request.lat,
+            user_lon=order_request.lon,
+            customer_id=order_request.customer_id,
+            main_warehouse_name=order_request.main_warehouse_name
+        )
+        order_request.status = OrderRequest.DONE
+        order_request.order = order
+        order_request.confirmed = confirmed
+    except ValueError as e:
+        order_request.status = OrderRequest.FAILED
+        order_request.error = str(e)
+    except Exception as e:
+        order_request.status = OrderRequest.FAILED
+        order_request.error = f'Error al procesar el pedido: {e.__class__.__name__}'
+    order_request.finished_at = timezone.now()
+    order_request.save(update_fields=['status', 'order', 'confirmed', 'error', 'finished_at'])
+    return order_request
+
+
+def fail_stale(max_age=None):
+    """
+    Marca como fallidas las solicitudes que llevan más de `max_age` segundos procesándose (su worker se detuvo).
+
+    No se vuelven a encolar: el worker pudo haber descontado stock antes de
+    detenerse y repetir la solicitud podría crear un segundo pedido.
+    """
+    max_age = max_age or settings.ORDER_QUEUE_STALE_SECONDS
+    return OrderRequest.objects.filter(
+        status=OrderRequest.PROCESSING, started_at__lt=timezone.now() - timedelta(seconds=max_age)
+    ).update(status=OrderRequest.FAILED, error='El worker se detuvo mientras procesaba la solicitud',
+             finished_at=timezone.now())
+
+
+def run_worker(stop_event, poll_seconds=None):
+    """Procesa solicitudes hasta que se active `stop_event`; sin trabajo espera `poll_seconds` antes de volver a mirar"""
+    poll_seconds = poll_seconds or settings.ORDER_QUEUE_POLL_SECONDS
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                order_request = claim_next()
+                if order_request is not None:
+                    process(order_request)
+                    continue
+            except DatabaseError:
+                # Base de datos no disponible o bloqueada: se reintenta con una conexión nueva tras la espera
+                connection.close()
+            stop_event.wait(poll_seconds)
+    finally:
+        connection.close()
+
+
+def start_workers(count, stop_event, poll_seconds=None):
+    """Arranca `count` hilos worker; el trabajo es casi todo espera de red, así que los hilos bastan"""
+    threads = [threading.Thread(target=run_worker, args=(stop_event, poll_seconds),
+                                name=f'order-worker-{number}', daemon=True)
+               for number in range(1, count + 1)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'p50': round(values[len(values) // 2], 1),
+        'p95': round(values[min(int(len(values) * 0.95), len(values) - 1)], 1),
+        'max': round(values[-1], 1)
+    }
+
+
+def queue_stats(window_seconds=None):
+    """Profundidad de la cola y latencias (ms) de las solicitudes terminadas en los últimos `window_seconds`"""
+    window_seconds = window_seconds or settings.ORDER_QUEUE_METRICS_WINDOW
+    now = timezone.now()
+    oldest = (OrderRequest.objects.filter(status=OrderRequest.QUEUED).order_by('id')
+              .values_list('created_at', flat=True).first())
+    recent = OrderRequest.objects.filter(finished_at__gte=now - timedelta(seconds=window_seconds))
+    counts = dict(recent.values_list('status').annotate(total=Count('id')).order_by())
+    # Latencias de las METRICS_SAMPLE_SIZE terminadas más recientes
+    finished = list(recent.filter(started_at__isnull=False)
+                    .order_by('-finished_at')
+                    .values_list('status', 'created_at', 'started_at', 'finished_at')[:METRICS_SAMPLE_SIZE])
+
+    def milliseconds(start, end):
+        return (end - start).total_seconds() * 1000
+
+    return {
+        'queued': queue_depth(),
+        'processing': OrderRequest.objects.filter(status=OrderRequest.PROCESSING).count(),
+        'oldest_queued_seconds': round((now - oldest).total_seconds(), 3) if oldest else None,
+        'window_seconds': window_seconds,
+        'done': counts.get(OrderRequest.DONE, 0),
+        'failed': counts.get(OrderRequest.FAILED, 0),
+        'sampled': len(finished),
+        'wait_ms': _percentiles([milliseconds(created, started) for _, created, started, _ in finished]),
+        'processing_ms': _percentiles([milliseconds(started, ended) for _, _, started, ended in finished]),
+        'total_ms': _percentiles([milliseconds(created, ended) for _, created, _, ended in finished])
+    }
@@ -1,67 +1,177 @@
-from typing import Optional, Tuple
-from math import radians, cos, sin, asin, sqrt
+import uuid
+from collections import deque
+from typing import List, Optional, Tuple
 from django.db import transaction
 from django.conf import settings
 from django.utils import timezone
 import requests
+from . import deadline
+from .deadline import DeadlineExceeded
 from .models import Order
+from .product_cache import PRODUCT_CACHE, ProductLookupError, fetch_product
+from .warehouses import WAREHOUSES
 
-def haversine_km(lon1, lat1, lon2, lat2) -> float:
-    """Retorna la distancia en km entre dos puntos geográficos"""
-    R = 6371.0
-    dlon = radians(lon2 - lon1)
-    dlat = radians(lat2 - lat1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    return 2 * R * asin(sqrt(a))
+# Liberar reservas al abortar un pedido no depende del tiempo límite de la petición: si se agotó, igual se libera
+CLEANUP_TIMEOUT_SECONDS = 2
 
-def find_nearest_warehouse_with_stock(product_name: str, units: int, user_lat: float, user_lon: float) -> Optional[dict]:
-    """Encuentra la bodega más cercana con stock suficiente"""
+def rank_warehouses_with_stock(
+    product_name: str,
+    units: int,
+    user_lat: float,
+    user_lon: float,
+    main_warehouse_name: Optional[str] = None,
+    limit: Optional[int] = None
+) -> List[dict]:
+    """
+    Bodegas con stock suficiente en el orden en que se deben intentar: la bodega
+    principal (si tiene stock) y luego de la más cercana a la más lejana.
+    Solo se usa con INVENTORY_ALLOCATION_MODE=restock; en los demás modos elige inventory-service
+    """
     try:
         inventory_url = f"{settings.INVENTORY_SERVICE_URL}/api/inventory/{product_name}/"
-        response = requests.get(inventory_url, timeout=5)
+        response = requests.get(inventory_url, headers=deadline.headers(), timeout=deadline.timeout(5))
         
         if response.status_code != 200:
-            return None
+            return []
         
-        inventories = response.json()
-        available_inventories = [
-            inv for inv in inventories 
+        available_inventories = {
+            inv['warehouse']: inv for inv in response.json()
             if inv.get('available_quantity', 0) >= units
-        ]
+        }
         
         if not available_inventories:
-            return None
-        
-        warehouses_url = f"{settings.INVENTORY_SERVICE_URL}/api/warehouses/"
-        warehouses_response = requests.get(warehouses_url, timeout=5)
-        
-        if warehouses_response.status_code != 200:
-            return None
-        
-        warehouses = {w['id']: w for w in warehouses_response.json()}
-        nearest = None
-        min_distance = float('inf')
-        
-        for inv in available_inventories:
-            warehouse_id = inv['warehouse']
-            warehouse = warehouses.get(warehouse_id)
-            if warehouse:
-                distance = haversine_km(
-                    user_lon, user_lat,
-                    warehouse['longitude'], warehouse['latitude']
-                )
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest = {
-                        'warehouse_id': warehouse_id,
-                        'warehouse_name': warehouse['name'],
-                        'inventory_id': inv['id'],
-                        'distance': distance
-                    }
+            return []
         
-        return nearest
+        index = WAREHOUSES.index()
+    except DeadlineExceeded:
+        raise
     except requests.RequestException:
+        return []
+    
+    ranked = []
+    main_warehouse = index.by_name.get(main_warehouse_name) if main_warehouse_name else None
+    if main_warehouse and main_warehouse['id'] in available_inventories:
+        inventory = available_inventories.pop(main_warehouse['id'])
+        ranked.append((index.distance_km(main_warehouse['id'], user_lat, user_lon), main_warehouse, inventory))
+    
+    limit = limit or settings.ORDER_WAREHOUSE_CANDIDATES
+    others = limit - len(ranked)
+    nearest = index.nearest_among(available_inventories, user_lat, user_lon, k=others) if others > 0 else []
+    for distance, warehouse in nearest:
+        ranked.append((distance, warehouse, available_inventories[warehouse['id']]))
+    
+    return [
+        {
+            'warehouse_id': warehouse['id'],
+            'warehouse_name': warehouse['name'],
+            'inventory_id': inventory['id'],
+            'distance': distance
+        }
+        for distance, warehouse, inventory in ranked
+    ]
+
+def reserve_nearest_warehouse(
+    product_id: int,
+    units: int,
+    user_lat: float,
+    user_lon: float,
+    main_warehouse_name: Optional[str] = None,
+    request_id: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Pide a inventory-service que elija la bodega (la principal o la más cercana con
+    stock) y descuente las unidades en una sola transacción. Devuelve la bodega
+    elegida o None si ninguna tiene stock; los errores de comunicación se propagan.
+    Repetir la llamada con el mismo `request_id` no descuenta dos veces
+    """
+    reserve_url = f"{settings.INVENTORY_SERVICE_URL}/api/inventory/reserve-nearest/"
+    response = requests.post(reserve_url, json={
+        'product_id': product_id,
+        'units': units,
+        'lat': user_lat,
+        'lon': user_lon,
+        'preferred_warehouse': main_warehouse_name,
+        'request_id': request_id
+    }, headers=deadline.headers(), timeout=deadline.timeout(5))
+    
+    if response.status_code == 409:
         return None
+    response.raise_for_status()
+    return response.json()
+
+def hold_stock(
+    product_id: int,
+    units: int,
+    user_lat: float,
+    user_lon: float,
+    main_warehouse_name: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Aparta las unidades en inventory-service (bodega principal o la más cercana con
+    stock) sin descontarlas todavía. Devuelve la reserva o None si ninguna bodega
+    tiene stock; los errores de comunicación se propagan
+    """
+    reservations_url = f"{settings.INVENTORY_SERVICE_URL}/api/reservations/"
+    response = requests.post(reservations_url, json={
+        'product_id': product_id,
+        'units': units,
+        'lat': user_lat,
+        'lon': user_lon,
+        'preferred_warehouse': main_warehouse_name
+    }, headers=deadline.headers(), timeout=deadline.timeout(5))
+    
+    if response.status_code == 409:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+def _call_options(default_timeout: float, cleanup: bool) -> dict:
+    """Cabeceras y timeout de una llamada; `cleanup` usa un timeout fijo corto sin X-Deadline-Ms"""
+    if cleanup:
+        return {'headers': {}, 'timeout': CLEANUP_TIMEOUT_SECONDS}
+    return {'headers': deadline.headers(), 'timeout': deadline.timeout(default_timeout)}
+
+def finish_reservation(reservation_id: int, action: str, cleanup: bool = False) -> bool:
+    """
+    Confirma (action='commit') o libera (action='release') una reserva; False si ya no estaba apartada.
+    Con cleanup=True la llamada no usa el tiempo límite de la petición
+    """
+    reservation_url = f"{settings.INVENTORY_SERVICE_URL}/api/reservations/{reservation_id}/{action}/"
+    response = requests.post(reservation_url, **_call_options(5, cleanup))
+    
+    if response.status_code == 409:
+        return False
+    response.raise_for_status()
+    return True
+
+def cancel_nearest_reservation(request_id: str) -> None:
+    """Devuelve lo descontado por reserve-nearest con `request_id`; si aún no llegó, inventory ya no lo aplicará"""
+    cancel_url = f"{settings.INVENTORY_SERVICE_URL}/api/inventory/reserve-nearest/{request_id}/cancel/"
+    response = requests.post(cancel_url, **_call_options(5, cleanup=True))
+    response.raise_for_status()
+
+def hold_stock_many(lines: List[dict], max_retries: int = 3) -> List[dict]:
+    """
+    Aparta varias líneas ({'product_id', 'units', 'lat', 'lon', 'preferred_warehouse'}) con una
+    sola petición a inventory-service. Devuelve, en el orden de las líneas, la reserva
+    o {'error': ...} si la línea no tiene stock; los errores de comunicación se propagan
+    """
+    reservations_url = f"{settings.INVENTORY_SERVICE_URL}/api/reservations/bulk/"
+    for attempt in range(1, max_retries + 1):
+        response = requests.post(reservations_url, json={'lines': lines}, headers=deadline.headers(),
+                                 timeout=deadline.timeout(10))
+        # 409: el stock cambió mientras se apartaba y no se apartó nada; se puede repetir
+        if response.status_code != 409 or attempt >= max_retries:
+            break
+    response.raise_for_status()
+    return response.json()['results']
+
+def finish_reservations(reservation_ids: List[int], action: str, cleanup: bool = False) -> dict:
+    """Confirma (action='commit') o libera (action='release') varias reservas; devuelve {id: estado final}"""
+    reservations_url = f"{settings.INVENTORY_SERVICE_URL}/api/reservations/bulk/{action}/"
+    response = requests.post(reservations_url, json={'ids': reservation_ids}, **_call_options(10, cleanup))
+    response.raise_for_status()
+    return {int(reservation_id): status for reservation_id, status in response.json()['results'].items()}
 
 def place_order_atomic(
     product_name: str, 
@@ -78,18 +188,18 @@ def place_order_atomic(
         raise ValueError("units must be > 0")
     
     try:
-        products_url = f"{settings.PRODUCTS_SERVICE_URL}/api/products/name/{product_name}/"
-        product_response = requests.get(products_url, timeout=5)
-        
-        if product_response.status_code != 200:
-            raise ValueError(f"Producto {product_name} no encontrado")
-        
-        product_data = product_response.json()
-        product_id = product_data['id']
-        unit_price = float(product_data['unit_price'])
-        total_price = unit_price * units
-    except requests.RequestException:
-        raise ValueError("Error al comunicarse con el servicio de productos")
+        if settings.PRODUCT_CACHE_ENABLED:
+            product_data = PRODUCT_CACHE.get(product_name)
+        else:
+            product_data = fetch_product(product_name)
+    except ProductLookupError as e:
+        raise ValueError(str(e))
+    if product_data is None:
+        raise ValueError(f"Producto {product_name} no encontrado")
+
+    product_id = product_data['id']
+    unit_price = float(product_data['unit_price'])
+    total_price = unit_price * units
     
     order = Order.objects.create(
         product_id=product_id,
@@ -100,62 +210,104 @@ def place_order_atomic(
         status=Order.PENDING
     )
     
+    candidates = None
+    reservation = None
+    # Igual en todos los reintentos: si un intento sí descontó pero su respuesta se perdió, el siguiente no descuenta otra vez
+    allocation_request_id = uuid.uuid4().hex
     for attempt in range(1, max_retries + 1):
         try:
-            if main_warehouse_name:
-                try:
-                    warehouses_url = f"{settings.INVENTORY_SERVICE_URL}/api/warehouses/"
-                    warehouses_response = requests.get(warehouses_url, timeout=5)
-                    warehouses = {w['name']: w for w in warehouses_response.json()}
-                    
-                    if main_warehouse_name in warehouses:
-                        warehouse_id = warehouses[main_warehouse_name]['id']
-                        inventory_url = f"{settings.INVENTORY_SERVICE_URL}/api/inventory/{product_name}/"
-                        inv_response = requests.get(inventory_url, timeout=5)
-                        
-                        if inv_response.status_code == 200:
-                            inventories = inv_response.json()
-                            for inv in inventories:
-                                if inv['warehouse'] == warehouse_id and inv['available_quantity'] >= units:
-                                    restock_url = f"{settings.INVENTORY_SERVICE_URL}/api/inventory/{product_name}/restock/"
-                                    restock_response = requests.post(restock_url, json={
-                                        'units': -units,
-                                        'warehouse': main_warehouse_name
-                                    }, timeout=5)
-                                    
-                                    if restock_response.status_code == 200:
-                                        order.status = Order.CONFIRMED
-                                        order.warehouse_id = warehouse_id
-                                        order.warehouse_name = main_warehouse_name
-                                        order.confirmed_at = timezone.now()
-                                        order.save()
-                                        return order, True
-                except requests.RequestException:
-                    pass
+            if settings.INVENTORY_ALLOCATION_MODE == 'hold':
+                # Una llamada más que reserve-nearest (ver INVENTORY_ALLOCATION_MODE en settings).
+                # Un reintento reutiliza la reserva ya apartada y confirmarla dos veces no descuenta dos veces
+                if reservation is None:
+                    reservation = hold_stock(product_id, units, user_lat, user_lon, main_warehouse_name)
+                    if reservation is None:
+                        order.status = Order.REJECTED
+                        order.save()
+                        return order, False
+                    order.warehouse_id = reservation['warehouse_id']
+                    order.warehouse_name = reservation['warehouse_name']
+                    order.save()
+                
+                if finish_reservation(reservation['id'], 'commit'):
+                    order.status = Order.CONFIRMED
+                    order.confirmed_at = timezone.now()
+                    order.save()
+                    return order, True
+                
+                # La reserva venció antes de confirmarse
+                order.status = Order.REJECTED
+                order.warehouse_id = None
+                order.warehouse_name = None
+                order.save()
+                return order, False
             
-            nearest = find_nearest_warehouse_with_stock(product_name, units, user_lat, user_lon)
+            if settings.INVENTORY_ALLOCATION_MODE == 'reserve-nearest':
+                chosen = reserve_nearest_warehouse(product_id, units, user_lat, user_lon, main_warehouse_name,
+                                                   allocation_request_id)
+                if chosen:
+                    order.status = Order.CONFIRMED
+                    order.warehouse_id = chosen['warehouse_id']
+                    order.warehouse_name = chosen['warehouse_name']
+                    order.confirmed_at = timezone.now()
+                    order.save()
+                    return order, True
+                
+                order.status = Order.REJECTED
+                order.save()
+                return order, False
             
-            if nearest:
+            # Se consulta una sola vez: los reintentos y los descuentos fallidos avanzan por la misma lista
+            if candidates is None:
+                candidates = deque(rank_warehouses_with_stock(
+                    product_name, units, user_lat, user_lon, main_warehouse_name
+                ))
+            
+            while candidates:
+                candidate = candidates[0]
                 restock_url = f"{settings.INVENTORY_SERVICE_URL}/api/inventory/{product_name}/restock/"
                 restock_response = requests.post(restock_url, json={
                     'units': -units,
-                    'warehouse': nearest['warehouse_name']
-                }, timeout=5)
+                    'warehouse': candidate['warehouse_name']
+                }, headers=deadline.headers(), timeout=deadline.timeout(5))
                 
                 if restock_response.status_code == 200:
                     order.status = Order.CONFIRMED
-                    order.warehouse_id = nearest['warehouse_id']
-                    order.warehouse_name = nearest['warehouse_name']
+                    order.warehouse_id = candidate['warehouse_id']
+                    order.warehouse_name = candidate['warehouse_name']
                     order.confirmed_at = timezone.now()
                     order.save()
                     return order, True
+                
+                # Otro pedido se llevó el stock de esta bodega: se pasa a la siguiente más cercana
+                candidates.popleft()
             
             order.status = Order.REJECTED
             order.save()
             return order, False
             
         except Exception as e:
-            if attempt >= max_retries:
+            # Sin tiempo para otro intento se termina aquí, aunque queden reintentos
+            out_of_time = deadline.expired()
+            if attempt >= max_retries or out_of_time:
+                if reservation is not None:
+                    try:
+                        finish_reservation(reservation['id'], 'release', cleanup=True)
+                    except requests.RequestException:
+                        pass  # Si no se puede liberar, la reserva vence sola
+                if settings.INVENTORY_ALLOCATION_MODE == 'reserve-nearest':
+                    # El último intento pudo haber descontado en inventory aunque no llegara la respuesta
+                    try:
+                        cancel_nearest_reservation(allocation_request_id)
+                    except requests.RequestException:
+                        pass  # El descuento queda registrado en StockAllocation con este request_id para conciliarlo
+                # El pedido no queda PENDING para siempre: la vista responde el error y el pedido se rechaza
+                order.status = Order.REJECTED
+                order.warehouse_id = None
+                order.warehouse_name = None
+                order.save()
+                if out_of_time and not isinstance(e, DeadlineExceeded):
+                    raise DeadlineExceeded('Se agotó el tiempo límite de la petición') from e
                 raise
             continue
     
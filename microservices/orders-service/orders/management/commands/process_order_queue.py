@@ -0,0 +1,32 @@
+"""Comando que drena la cola de solicitudes de pedido con un pool de hilos."""
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.intake import fail_stale, start_workers
+
+
+class Command(BaseCommand):
+    help = 'Procesa las solicitudes de pedido en cola con --workers hilos hasta recibir SIGTERM o Ctrl+C'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.ORDER_QUEUE_WORKERS,
+                            help='Número de hilos que procesan solicitudes')
+        parser.add_argument('--poll', type=float, default=settings.ORDER_QUEUE_POLL_SECONDS,
+                            help='Segundos de espera de cada hilo cuando la cola está vacía')
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        threads = start_workers(options['workers'], stop_event, options['poll'])
+        self.stdout.write(f"{len(threads)} workers procesando la cola de pedidos")
+        try:
+            while not stop_event.wait(settings.ORDER_QUEUE_STALE_SECONDS / 2):
+                failed = fail_stale()
+                if failed:
+                    self.stdout.write(f'{failed} solicitudes abandonadas marcadas como fallidas')
+        except KeyboardInterrupt:
+            stop_event.set()
+        # Cada hilo termina la solicitud que tiene en curso antes de salir
+        for thread in threads:
+            thread.join()
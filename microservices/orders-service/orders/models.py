@@ -49,8 +49,97 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        # Un índice por filtro del listado, terminado en el orden de la paginación por cursor
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
+            models.Index(fields=['customer_id', '-created_at', '-id']),
+            models.Index(fields=['product_id', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"Pedido #{self.id} - {self.product_name} x{self.units} [{self.get_status_display()}]"
 
+
+class OrderStatusEvent(models.Model):
+    """Cambio de estado de un pedido; el id incremental sirve de cursor para el stream de eventos"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    previous_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Cambio de estado de pedido'
+        verbose_name_plural = 'Cambios de estado de pedidos'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Pedido #{self.order_id}: {self.previous_status or '-'} -> {self.status}"
+
+
+class OrderRequest(models.Model):
+    """Solicitud de pedido recibida en modo asíncrono; la tabla es la cola que drenan los workers"""
+    QUEUED = 'QUEUED'
+    PROCESSING = 'PROCESSING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+    STATUS_CHOICES = [
+        (QUEUED, 'En cola'),
+        (PROCESSING, 'Procesando'),
+        (DONE, 'Procesada'),
+        (FAILED, 'Fallida'),
+    ]
+
+    product_name = models.CharField(max_length=100)
+    units = models.PositiveIntegerField(validators=[validate_positive_quantity])
+    lat = models.FloatField()
+    lon = models.FloatField()
+    customer_id = models.IntegerField(null=True, blank=True)
+    main_warehouse_name = models.CharField(max_length=100, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    order = models.OneToOneField(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='intake_request')
+    confirmed = models.BooleanField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Solicitud de pedido'
+        verbose_name_plural = 'Solicitudes de pedido'
+        ordering = ['id']
+        # Los workers toman la solicitud en cola más antigua; las métricas leen las terminadas recientemente
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['finished_at']),
+        ]
+
+    def __str__(self):
+        return f"Solicitud #{self.id} - {self.product_name} x{self.units} [{self.get_status_display()}]"
+
+
+class IdempotencyKey(models.Model):
+    """Respuesta guardada de una petición con Idempotency-Key, para repetirla ante reintentos del cliente"""
+    scope = models.CharField(max_length=150)  # Endpoint y usuario: la misma llave de dos clientes no choca
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)  # None mientras la petición está en curso
+    response_body = models.TextField(blank=True, null=True)
+    response_content_type = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Llave de idempotencia'
+        verbose_name_plural = 'Llaves de idempotencia'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} [{self.response_status or 'en curso'}]"
@@ -0,0 +1,39 @@
+"""
+Paginación por cursor (keyset) sobre (created_at, id), de más reciente a más antiguo
+
+Cada página se pide con el cursor del último pedido de la anterior, así que la
+consulta usa el índice y su costo no depende de cuántas páginas se recorrieron.
+"""
+import base64
+import binascii
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(order):
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value):
+    """Devuelve (created_at, id) de un cursor o lanza InvalidCursor"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode('utf-8')
+        created_at, order_id = raw.rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        order_id = int(order_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise InvalidCursor('Cursor inválido')
+    if created_at is None:
+        raise InvalidCursor('Cursor inválido')
+    return created_at, order_id
+
+
+def after_cursor(queryset, cursor):
+    """Pedidos que van después del cursor en el orden (-created_at, -id)"""
+    created_at, order_id = decode_cursor(cursor)
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
@@ -0,0 +1,200 @@
+"""
+Caché local de productos por nombre (id y precio unitario) para crear pedidos
+
+Cada entrada está fresca durante `ttl` segundos; después, y hasta `stale_ttl`
+segundos más, se sigue sirviendo mientras un hilo la renueva en segundo plano
+(stale-while-revalidate). Los nombres que products-service no conoce se
+guardan como ausentes durante `negative_ttl`. La caché es por proceso.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import requests
+from django.conf import settings
+from . import deadline
+from .deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# product es None si el nombre no existe en products-service
+CacheEntry = namedtuple('CacheEntry', ['product', 'fresh_until', 'stale_until'])
+
+
+class ProductLookupError(Exception):
+    pass
+
+
+def fetch_product(product_name):
+    """Consulta products-service; devuelve {'id', 'unit_price'}, None si el producto no existe, o lanza ProductLookupError"""
+    try:
+        response = requests.get(f"{settings.PRODUCTS_SERVICE_URL}/api/products/name/{product_name}/",
+                                headers=deadline.headers(), timeout=deadline.timeout(5))
+    except DeadlineExceeded:
+        raise
+    except requests.RequestException:
+        raise ProductLookupError("Error al comunicarse con el servicio de productos")
+    if response.status_code == 404:
+        return None
+    if response.status_code != 200:
+        raise ProductLookupError(f"Producto {product_name} no encontrado")
+    try:
+        data = response.json()
+        return {'id': data['id'], 'unit_price': data['unit_price']}
+    except (ValueError, KeyError, TypeError):
+        raise ProductLookupError("Respuesta inválida del servicio de productos")
+
+
+def fetch_products(product_names):
+    """Consulta varios productos en una sola petición; devuelve {nombre: {'id', 'unit_price'} o None} o lanza ProductLookupError"""
+    try:
+        response = requests.post(f"{settings.PRODUCTS_SERVICE_URL}/api/products/names/",
+                                 json={'names': list(product_names)}, headers=deadline.headers(),
+                                 timeout=deadline.timeout(5))
+    except DeadlineExceeded:
+        raise
+    except requests.RequestException:
+        raise ProductLookupError("Error al comunicarse con el servicio de productos")
+    if response.status_code != 200:
+        raise ProductLookupError("Error al consultar los productos")
+    products = dict.fromkeys(product_names)
+    try:
+        for data in response.json()['products']:
+            products[data['name']] = {'id': data['id'], 'unit_price': data['unit_price']}
+    except (ValueError, KeyError, TypeError):
+        raise ProductLookupError("Respuesta inválida del servicio de productos")
+    return products
+
+
+class ProductCache:
+    """Caché LRU de productos con TTL, stale-while-revalidate y caché negativa"""
+
+    def __init__(self, fetch, fetch_many=None, max_entries=1000, ttl=60, stale_ttl=300, negative_ttl=30):
+        self.fetch = fetch
+        self.fetch_many = fetch_many
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    def get(self, product_name):
+        """Producto por nombre, o None si no existe. Solo consulta products-service si no hay entrada utilizable"""
+        found, product = self._lookup(product_name)
+        return product if found else self._load(product_name)
+
+    def get_many(self, product_names):
+        """{nombre: producto o None}; los nombres sin entrada utilizable se piden juntos en una sola consulta"""
+        products = {}
+        missing = []
+        for product_name in dict.fromkeys(product_names):
+            found, product = self._lookup(product_name)
+            if found:
+                products[product_name] = product
+            else:
+                missing.append(product_name)
+        if missing:
+            if self.fetch_many is None:
+                fetched = {product_name: self.fetch(product_name) for product_name in missing}
+            else:
+                fetched = self.fetch_many(missing)
+            for product_name in missing:
+                self.set(product_name, fetched.get(product_name))
+                products[product_name] = fetched.get(product_name)
+        return products
+
+    def _lookup(self, product_name):
+        """(True, producto) si hay una entrada utilizable, o (False, None) si hay que consultar products-service"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(product_name)
+            if entry is not None and now < entry.stale_until:
+                self._entries.move_to_end(product_name)
+                if entry.product is None:
+                    self.negative_hits += 1
+                elif now < entry.fresh_until:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    self._start_refresh(product_name)
+                return True, entry.product
+            self.misses += 1
+        return False, None
+
+    def _load(self, product_name):
+        product = self.fetch(product_name)
+        self.set(product_name, product)
+        return product
+
+    def set(self, product_name, product):
+        now = time.monotonic()
+        if product is None:
+            entry = CacheEntry(None, now + self.negative_ttl, now + self.negative_ttl)
+        else:
+            entry = CacheEntry(product, now + self.ttl, now + self.ttl + self.stale_ttl)
+        with self._lock:
+            self._entries[product_name] = entry
+            self._entries.move_to_end(product_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, product_name):
+        with self._lock:
+            self._entries.pop(product_name, None)
+
+    def _start_refresh(self, product_name):
+        """Renueva una entrada vencida en segundo plano, una sola vez por nombre (se llama con el lock tomado)"""
+        if product_name in self._refreshing:
+            return
+        self._refreshing.add(product_name)
+        threading.Thread(target=self._refresh, args=(product_name,), name='product-cache-refresh', daemon=True).start()
+
+    def _refresh(self, product_name):
+        try:
+            self._load(product_name)
+            self.refreshes += 1
+        except Exception:
+            # Cualquier error (también una respuesta mal formada): se sigue sirviendo la entrada vencida hasta stale_until
+            logger.exception('No se pudo renovar el producto %s en la caché', product_name)
+            self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(product_name)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl,
+            'negative_ttl': self.negative_ttl,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': round((lookups - self.misses) / lookups, 3) if lookups else 0,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+            'evictions': self.evictions,
+        }
+
+
+PRODUCT_CACHE = ProductCache(
+    fetch_product,
+    fetch_many=fetch_products,
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+    ttl=settings.PRODUCT_CACHE_TTL,
+    stale_ttl=settings.PRODUCT_CACHE_STALE_TTL,
+    negative_ttl=settings.PRODUCT_CACHE_NEGATIVE_TTL,
+)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Order
+from .models import Order, OrderRequest
 
 class OrderSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -14,3 +14,14 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at', 'confirmed_at', 'delivered_at']
 
+
+class OrderRequestSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    order = OrderSerializer(read_only=True)
+    
+    class Meta:
+        model = OrderRequest
+        fields = [
+            'id', 'status', 'status_display', 'product_name', 'units', 'customer_id',
+            'order', 'confirmed', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
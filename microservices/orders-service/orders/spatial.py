@@ -0,0 +1,191 @@
+"""
+Índice espacial de bodegas: k-d tree sobre coordenadas en la esfera unitaria
+
+Cada bodega se guarda como un punto (x, y, z) de la esfera unitaria, así que la
+distancia euclídea entre puntos (cuerda) crece igual que la distancia sobre la
+superficie: el vecino más cercano por cuerda es el más cercano por haversine,
+sin casos especiales en el antimeridiano ni en los polos.
+"""
+import heapq
+import itertools
+from math import asin, cos, log2, radians, sin, sqrt
+
+try:
+    import numpy
+except ImportError:  # numpy es opcional: sin él las distancias se calculan una a una
+    numpy = None
+
+EARTH_RADIUS_KM = 6371.0
+# Con menos candidatos el costo fijo de crear arreglos de numpy supera al de medirlos en Python
+VECTORIZE_MIN_CANDIDATES = 64
+
+
+def to_unit_vector(lat, lon):
+    lat, lon = radians(lat), radians(lon)
+    return cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat)
+
+
+def chord_to_km(chord):
+    """Distancia sobre la superficie (km) correspondiente a una cuerda de la esfera unitaria"""
+    return 2 * EARTH_RADIUS_KM * asin(min(chord / 2, 1.0))
+
+
+def haversine_km_many(lat, lon, latitudes, longitudes):
+    """
+    Distancias haversine (km) desde (lat, lon) en grados a cada punto, dado en radianes.
+
+    Si `latitudes` y `longitudes` son arreglos de numpy el cálculo se hace en una
+    sola pasada vectorizada; si son listas se recorren en Python.
+    """
+    lat, lon = radians(lat), radians(lon)
+    if numpy is not None and isinstance(latitudes, numpy.ndarray):
+        a = (numpy.sin((latitudes - lat) / 2) ** 2
+             + cos(lat) * numpy.cos(latitudes) * numpy.sin((longitudes - lon) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+    cos_lat = cos(lat)
+    return [2 * EARTH_RADIUS_KM * asin(sqrt(min(sin((other_lat - lat) / 2) ** 2
+                                                + cos_lat * cos(other_lat) * sin((other_lon - lon) / 2) ** 2, 1.0)))
+            for other_lat, other_lon in zip(latitudes, longitudes)]
+
+
+class _Node:
+    __slots__ = ('point', 'warehouse', 'axis', 'left', 'right')
+
+    def __init__(self, point, warehouse, axis, left, right):
+        self.point = point
+        self.warehouse = warehouse
+        self.axis = axis
+        self.left = left
+        self.right = right
+
+
+class WarehouseIndex:
+    """
+    k-d tree inmutable de bodegas ({'id', 'name', 'latitude', 'longitude', ...}).
+
+    Se construye una vez por versión de la lista de bodegas (O(n log² n)) y se
+    reemplaza completo cuando cambia; las consultas no toman locks.
+    """
+
+    def __init__(self, warehouses):
+        warehouses = list(warehouses)
+        self.by_id = {warehouse['id']: warehouse for warehouse in warehouses}
+        self.by_name = {warehouse['name']: warehouse for warehouse in warehouses}
+        self._points = {warehouse['id']: to_unit_vector(warehouse['latitude'], warehouse['longitude'])
+                        for warehouse in warehouses}
+        self._root = self._build([(self._points[warehouse['id']], warehouse) for warehouse in warehouses])
+        # Coordenadas en radianes por fila, para ordenar subconjuntos completos con haversine_km_many
+        self._rows = {warehouse['id']: row for row, warehouse in enumerate(warehouses)}
+        self._warehouses = warehouses
+        self._latitudes = [radians(warehouse['latitude']) for warehouse in warehouses]
+        self._longitudes = [radians(warehouse['longitude']) for warehouse in warehouses]
+        if numpy is not None:
+            self._latitude_array = numpy.array(self._latitudes, dtype=float)
+            self._longitude_array = numpy.array(self._longitudes, dtype=float)
+            # ids ordenados y su fila: traducir ids a filas con searchsorted en vez de un dict por candidato
+            ids = numpy.array(list(self._rows), dtype=numpy.int64)
+            self._sorted_rows = numpy.argsort(ids, kind='stable')
+            self._sorted_ids = ids[self._sorted_rows]
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def _build(self, items):
+        if not items:
+            return None
+        # Se corta por el eje de mayor dispersión: las bodegas se concentran en una región pequeña de la esfera
+        coordinates = list(zip(*(item[0] for item in items)))
+        axis = max(range(3), key=lambda a: max(coordinates[a]) - min(coordinates[a]))
+        items.sort(key=lambda item: item[0][axis])
+        middle = len(items) // 2
+        point, warehouse = items[middle]
+        return _Node(point, warehouse, axis, self._build(items[:middle]), self._build(items[middle + 1:]))
+
+    def nearest(self, lat, lon):
+        """
+        Genera (distancia_km, bodega) de la más cercana a la más lejana.
+
+        Búsqueda best-first: la cola mezcla bodegas (con su distancia real) y
+        subárboles (con una cota inferior de su distancia), así que cada bodega
+        sale en orden y el recorrido se detiene en cuanto el llamador deja de pedir.
+        """
+        query = to_unit_vector(lat, lon)
+        counter = itertools.count()
+        heap = [(0.0, next(counter), self._root, None)] if self._root is not None else []
+        while heap:
+            bound, _, node, warehouse = heapq.heappop(heap)
+            if node is None:
+                yield chord_to_km(sqrt(bound)), warehouse
+                continue
+            point = node.point
+            distance = ((query[0] - point[0]) ** 2 + (query[1] - point[1]) ** 2 + (query[2] - point[2]) ** 2)
+            heapq.heappush(heap, (distance, next(counter), None, node.warehouse))
+            diff = query[node.axis] - point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            if near is not None:
+                heapq.heappush(heap, (bound, next(counter), near, None))
+            if far is not None:
+                # Todo el subárbol lejano está al otro lado del plano de corte
+                heapq.heappush(heap, (max(bound, diff * diff), next(counter), far, None))
+
+    def nearest_k(self, lat, lon, k=1, accept=None):
+        """Las k bodegas más cercanas que cumplen `accept(bodega)`, como [(distancia_km, bodega)]"""
+        found = []
+        for distance, warehouse in self.nearest(lat, lon):
+            if accept is None or accept(warehouse):
+                found.append((distance, warehouse))
+                if len(found) == k:
+                    break
+        return found
+
+    def nearest_among(self, warehouse_ids, lat, lon, k=1):
+        """
+        Las k bodegas más cercanas de un subconjunto (p. ej. las que tienen stock), como [(distancia_km, bodega)].
+
+        `warehouse_ids` se consulta con `in`, así que conviene pasar un set o un dict.
+        """
+        if not isinstance(warehouse_ids, (set, frozenset, dict)):
+            warehouse_ids = set(warehouse_ids)
+        m, n = len(warehouse_ids), len(self)
+        # Recorrer el árbol hasta dar con k candidatos cuesta ~k·n·log(n)/m; medir los m candidatos cuesta m
+        if m * m <= k * n * max(log2(max(n, 2)), 1):
+            return self.rank(warehouse_ids, lat, lon, limit=k)
+        return self.nearest_k(lat, lon, k, accept=lambda warehouse: warehouse['id'] in warehouse_ids)
+
+    def rank(self, warehouse_ids, lat, lon, limit=None):
+        """
+        Bodegas del subconjunto ordenadas de la más cercana a la más lejana, como [(distancia_km, bodega)].
+
+        Mide todos los candidatos en una sola pasada (vectorizada si hay numpy) y
+        ordena solo los `limit` primeros; los ids que no están en el índice se ignoran.
+        """
+        if not self._warehouses:
+            return []
+        if numpy is None or len(warehouse_ids) < VECTORIZE_MIN_CANDIDATES:
+            rows = [self._rows[warehouse_id] for warehouse_id in warehouse_ids if warehouse_id in self._rows]
+            distances = haversine_km_many(lat, lon, [self._latitudes[row] for row in rows],
+                                          [self._longitudes[row] for row in rows])
+            ranked = heapq.nsmallest(len(rows) if limit is None else limit, zip(distances, rows))
+            return [(distance, self._warehouses[row]) for distance, row in ranked]
+
+        ids = numpy.fromiter(warehouse_ids, dtype=numpy.int64, count=len(warehouse_ids))
+        positions = numpy.minimum(numpy.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        rows = self._sorted_rows[positions[self._sorted_ids[positions] == ids]]
+        if limit is None or limit > len(rows):
+            limit = len(rows)
+        if not limit:
+            return []
+        distances = haversine_km_many(lat, lon, self._latitude_array[rows], self._longitude_array[rows])
+        if limit < len(rows):
+            # argpartition separa los `limit` menores en O(m) y solo esos se ordenan
+            order = numpy.argpartition(distances, limit - 1)[:limit]
+            order = order[numpy.argsort(distances[order], kind='stable')]
+        else:
+            order = numpy.argsort(distances, kind='stable')
+        return [(distance, self._warehouses[row])
+                for distance, row in zip(distances[order].tolist(), rows[order].tolist())]
+
+    def distance_km(self, warehouse_id, lat, lon):
+        point = self._points[warehouse_id]
+        query = to_unit_vector(lat, lon)
+        return chord_to_km(sqrt(sum((query[axis] - point[axis]) ** 2 for axis in range(3))))
@@ -3,8 +3,14 @@ from . import views
 
 urlpatterns = [
     path('orders/', views.order_list, name='order_list'),
+    path('orders/events/', views.order_events, name='order_events'),
+    path('orders/bulk/', views.bulk_order_view, name='bulk_order'),
+    path('orders/create/', views.create_order_view, name='create_order'),
+    path('orders/requests/<int:request_id>/', views.order_request_detail, name='order_request_detail'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     path('orders/<str:product_name>/', views.place_order, name='place_order'),
-    path('orders/create/', views.create_order_view, name='create_order'),
+    path('order-queue/', views.order_queue_stats, name='order_queue_stats'),
+    path('product-cache/', views.product_cache_stats, name='product_cache_stats'),
+    path('warehouse-index/', views.warehouse_index_stats, name='warehouse_index_stats'),
 ]
 
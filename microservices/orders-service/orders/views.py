@@ -1,21 +1,112 @@
 import json
 import time
+from datetime import datetime
 from django.http import JsonResponse, HttpResponseBadRequest
+from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+import requests
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from .bulk import place_orders_bulk
+from .deadline import DeadlineExceeded
+from .idempotency import idempotent
+from .intake import QueueFull, enqueue_order, queue_stats
 from .logic import place_order_atomic
-from .serializers import OrderSerializer
-from .models import Order
+from .serializers import OrderRequestSerializer, OrderSerializer
+from .models import Order, OrderRequest, OrderStatusEvent
+from .pagination import InvalidCursor, after_cursor, encode_cursor
+from .product_cache import PRODUCT_CACHE
+from .warehouses import WAREHOUSES
+
+ORDERS_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
+EVENTS_MAX_LIMIT = 500
+ORDERS_BULK_MAX_LINES = 1000
+
+def parse_datetime_param(value):
+    """Fecha (YYYY-MM-DD, desde la medianoche) o fecha y hora ISO 8601; None si no es válida"""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.combine(day, datetime.min.time())
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 @api_view(['GET'])
 def order_list(request):
-    """Listar todos los pedidos"""
+    """
+    Listar pedidos de más reciente a más antiguo, por páginas.
+
+    Filtros: status (uno o varios separados por comas), customer_id, product_id,
+    created_after (incluido) y created_before (excluido). `limit` fija el tamaño
+    de la página y `cursor` (el next_cursor de la respuesta anterior) pide la siguiente.
+    """
+    params = request.query_params
     orders = Order.objects.all()
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    try:
+        limit = min(int(params.get('limit', ORDERS_PAGE_SIZE)), ORDERS_MAX_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError
+        for field in ('customer_id', 'product_id'):
+            if params.get(field):
+                orders = orders.filter(**{field: int(params[field])})
+    except ValueError:
+        return Response({'error': 'limit, customer_id y product_id deben ser enteros positivos'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if params.get('status'):
+        statuses = [value.strip().upper() for value in params['status'].split(',') if value.strip()]
+        orders = orders.filter(status__in=statuses)
+    for param, lookup in (('created_after', 'created_at__gte'), ('created_before', 'created_at__lt')):
+        if params.get(param):
+            value = parse_datetime_param(params[param])
+            if value is None:
+                return Response({'error': f'{param} debe ser una fecha ISO 8601'}, status=status.HTTP_400_BAD_REQUEST)
+            orders = orders.filter(**{lookup: value})
+    if params.get('cursor'):
+        try:
+            orders = after_cursor(orders, params['cursor'])
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Se pide un pedido de más para saber si hay otra página sin contar la tabla
+    page = list(orders.order_by('-created_at', '-id')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    serializer = OrderSerializer(page[:limit], many=True)
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+@api_view(['GET'])
+def order_events(request):
+    """
+    Cambios de estado de pedidos posteriores al cursor `after` (id del último evento recibido).
+    Sin `after` solo devuelve el cursor actual, para empezar a seguir los cambios desde ahora.
+    """
+    try:
+        after = request.query_params.get('after')
+        after = int(after) if after is not None else None
+        limit = min(int(request.query_params.get('limit', 100)), EVENTS_MAX_LIMIT)
+        if limit <= 0:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'after debe ser entero y limit un entero positivo'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if after is None:
+        last = OrderStatusEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        return Response({'events': [], 'last_id': last or 0})
+
+    events = list(OrderStatusEvent.objects.filter(id__gt=after).order_by('id')
+                  .values('id', 'order_id', 'status', 'previous_status', 'created_at')[:limit])
+    return Response({'events': events, 'last_id': events[-1]['id'] if events else after})
 
 @api_view(['GET'])
 def order_detail(request, order_id):
@@ -29,6 +120,7 @@ def order_detail(request, order_id):
 
 @api_view(['POST'])
 @csrf_exempt
+@idempotent('place_order')
 def place_order(request, product_name: str):
     """Crear un pedido para un producto específico"""
     try:
@@ -56,9 +148,14 @@ def place_order(request, product_name: str):
                           status=200 if confirmed else 409)
     except ValueError as e:
         return JsonResponse({"error": str(e)}, status=400)
+    except DeadlineExceeded as e:
+        return JsonResponse({"error": str(e)}, status=504)
+    except requests.RequestException:
+        return JsonResponse({"error": "Error al comunicarse con el servicio de inventario"}, status=503)
 
 @api_view(['POST'])
 @csrf_exempt
+@idempotent('create_order')
 def create_order_view(request):
     """Crear una orden automática verificando disponibilidad en todas las bodegas"""
     start_time = time.time()
@@ -71,11 +168,26 @@ def create_order_view(request):
         user_lon = float(payload["lon"])
         main_warehouse_name = payload.get("mainWarehouse")
         customer_id = payload.get("customer_id")
+        run_async = payload.get("async") is True or settings.ORDER_INTAKE_MODE == 'async'
     except (KeyError, ValueError, json.JSONDecodeError):
         return HttpResponseBadRequest(
             'Payload inválido. Ejemplo: {"product": "Monitor LED 24\"", "units": 5, "lat": 4.6, "lon": -74.08, "mainWarehouse": "Bodega Sur"}'
         )
     
+    if run_async:
+        if units <= 0:
+            return JsonResponse({"error": "units must be > 0"}, status=400)
+        try:
+            order_request = enqueue_order(product_name, units, user_lat, user_lon, customer_id, main_warehouse_name)
+        except QueueFull as e:
+            return JsonResponse({"error": str(e)}, status=503, headers={"Retry-After": "5"})
+        status_url = f"/api/orders/requests/{order_request.id}/"
+        return JsonResponse({
+            "request_id": order_request.id,
+            "status": order_request.status,
+            "status_url": status_url
+        }, status=202, headers={"Location": status_url})
+    
     try:
         order, confirmed = place_order_atomic(
             product_name=product_name,
@@ -100,4 +212,65 @@ def create_order_view(request):
         }, status=200 if confirmed else 409)
     except ValueError as e:
         return JsonResponse({"error": str(e)}, status=400)
+    except DeadlineExceeded as e:
+        return JsonResponse({"error": str(e)}, status=504)
+    except requests.RequestException:
+        return JsonResponse({"error": "Error al comunicarse con el servicio de inventario"}, status=503)
+
+@api_view(['POST'])
+@csrf_exempt
+def bulk_order_view(request):
+    """Crear un pedido por cada línea de varios carritos, apartando y confirmando el stock en lote"""
+    try:
+        payload = json.loads(request.body.decode("utf-8")) if request.body else {}
+        carts = [{
+            "lat": float(cart["lat"]),
+            "lon": float(cart["lon"]),
+            "customer_id": cart.get("customer_id"),
+            "main_warehouse_name": cart.get("mainWarehouse"),
+            "lines": [{"product": str(line["product"]), "units": int(line["units"])} for line in cart["lines"]]
+        } for cart in payload["carts"]]
+    except (KeyError, TypeError, ValueError, AttributeError, json.JSONDecodeError):
+        return HttpResponseBadRequest(
+            'Payload: {"carts":[{"lat":float,"lon":float,"mainWarehouse"?:str,"customer_id"?:int,'
+            '"lines":[{"product":str,"units":int}]}]}'
+        )
+    
+    lines = sum(len(cart["lines"]) for cart in carts)
+    if not lines or lines > ORDERS_BULK_MAX_LINES:
+        return JsonResponse({"error": f"El lote debe tener entre 1 y {ORDERS_BULK_MAX_LINES} líneas"}, status=400)
+    if any(line["units"] <= 0 for cart in carts for line in cart["lines"]):
+        return JsonResponse({"error": "units must be > 0"}, status=400)
+    
+    try:
+        return JsonResponse(place_orders_bulk(carts))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except DeadlineExceeded as e:
+        return JsonResponse({"error": str(e)}, status=504)
+    except requests.RequestException:
+        return JsonResponse({"error": "Error al comunicarse con el servicio de inventario"}, status=503)
 
+@api_view(['GET'])
+def order_request_detail(request, request_id):
+    """Estado de una solicitud de pedido asíncrona y, cuando termina, su pedido"""
+    try:
+        order_request = OrderRequest.objects.select_related('order').get(id=request_id)
+    except OrderRequest.DoesNotExist:
+        return Response({'error': 'Solicitud no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(OrderRequestSerializer(order_request).data)
+
+@api_view(['GET'])
+def order_queue_stats(request):
+    """Profundidad de la cola de solicitudes y latencias de espera y procesamiento"""
+    return Response(queue_stats())
+
+@api_view(['GET'])
+def product_cache_stats(request):
+    """Aciertos, fallos y tamaño de la caché local de productos (de este proceso)"""
+    return Response(PRODUCT_CACHE.stats())
+
+@api_view(['GET'])
+def warehouse_index_stats(request):
+    """Tamaño y revalidaciones del índice espacial de bodegas (de este proceso)"""
+    return Response(WAREHOUSES.stats())
@@ -0,0 +1,89 @@
+"""
+Bodegas de inventory-service en memoria, con su índice espacial, para asignar pedidos
+
+La lista se pide a /api/warehouses/locations/ con If-None-Match: mientras las
+bodegas no cambian inventory-service responde 304 y el índice se conserva; si
+cambian, se reconstruye en segundo plano y se reemplaza completo.
+"""
+import threading
+import time
+import requests
+from django.conf import settings
+from . import deadline
+from .spatial import WarehouseIndex
+
+
+class WarehouseDirectory:
+    """Índice de bodegas compartido por el proceso, revalidado cada `refresh_interval` segundos"""
+
+    def __init__(self, url, refresh_interval=30):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self._index = None
+        self._etag = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.rebuilds = 0
+        self.not_modified = 0
+        self.refresh_errors = 0
+        self.build_seconds = 0.0
+
+    def index(self):
+        """Índice vigente; la primera vez se carga en línea (puede lanzar requests.RequestException)"""
+        if self._index is None:
+            self.refresh()
+        elif time.monotonic() - self._checked_at >= self.refresh_interval:
+            self._start_refresh()
+        return self._index
+
+    def refresh(self):
+        # La primera carga ocurre dentro de un pedido y respeta su tiempo límite; las renovaciones en segundo plano no
+        headers = deadline.headers()
+        if self._etag and self._index is not None:
+            headers['If-None-Match'] = self._etag
+        response = requests.get(self.url, headers=headers, timeout=deadline.timeout(5))
+        if response.status_code == 304:
+            self.not_modified += 1
+        else:
+            response.raise_for_status()
+            started = time.perf_counter()
+            index = WarehouseIndex(response.json())
+            self.build_seconds = time.perf_counter() - started
+            self._index, self._etag = index, response.headers.get('ETag')
+            self.rebuilds += 1
+        self._checked_at = time.monotonic()
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, name='warehouse-index-refresh', daemon=True).start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except (requests.RequestException, ValueError):
+            # Se sigue usando el índice anterior y se reintenta en el siguiente intervalo
+            self.refresh_errors += 1
+            self._checked_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def stats(self):
+        return {
+            'warehouses': len(self._index) if self._index is not None else None,
+            'etag': self._etag,
+            'refresh_interval': self.refresh_interval,
+            'rebuilds': self.rebuilds,
+            'not_modified': self.not_modified,
+            'refresh_errors': self.refresh_errors,
+            'last_build_ms': round(self.build_seconds * 1000, 1),
+        }
+
+
+WAREHOUSES = WarehouseDirectory(
+    f"{settings.INVENTORY_SERVICE_URL}/api/warehouses/locations/",
+    refresh_interval=settings.WAREHOUSE_INDEX_REFRESH_SECONDS,
+)
@@ -30,6 +30,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'orders.deadline.DeadlineMiddleware',
 ]
 
 ROOT_URLCONF = 'orders_service.urls'
@@ -92,3 +93,41 @@ AUTH_SERVICE_URL = os.environ.get('AUTH_SERVICE_URL', 'http://auth-service:8001'
 PRODUCTS_SERVICE_URL = os.environ.get('PRODUCTS_SERVICE_URL', 'http://products-service:8002')
 INVENTORY_SERVICE_URL = os.environ.get('INVENTORY_SERVICE_URL', 'http://inventory-service:8003')
 
+
+# Caché local de productos (nombre -> id y precio) usada al crear pedidos
+PRODUCT_CACHE_ENABLED = os.environ.get('PRODUCT_CACHE_ENABLED', 'True') == 'True'
+PRODUCT_CACHE_MAX_ENTRIES = int(os.environ.get('PRODUCT_CACHE_MAX_ENTRIES', 1000))
+PRODUCT_CACHE_TTL = float(os.environ.get('PRODUCT_CACHE_TTL', 60))
+PRODUCT_CACHE_STALE_TTL = float(os.environ.get('PRODUCT_CACHE_STALE_TTL', 300))
+PRODUCT_CACHE_NEGATIVE_TTL = float(os.environ.get('PRODUCT_CACHE_NEGATIVE_TTL', 30))
+
+# Índice espacial de bodegas: cada cuántos segundos se comprueba si cambiaron en inventory-service
+WAREHOUSE_INDEX_REFRESH_SECONDS = float(os.environ.get('WAREHOUSE_INDEX_REFRESH_SECONDS', 30))
+
+# Bodegas con stock que se intentan, en orden de cercanía, antes de rechazar un pedido
+ORDER_WAREHOUSE_CANDIDATES = int(os.environ.get('ORDER_WAREHOUSE_CANDIDATES', 5))
+
+# Cómo se asigna bodega y se descuenta stock en inventory-service:
+#   reserve-nearest: un solo POST a /api/inventory/reserve-nearest/ que elige bodega y descuenta
+#   hold: aparta en /api/reservations/ y confirma la reserva al terminar el pedido (una llamada más)
+#   restock: consulta inventario, ordena bodegas aquí y descuenta con restock
+INVENTORY_ALLOCATION_MODE = os.environ.get('INVENTORY_ALLOCATION_MODE', 'reserve-nearest')
+
+# Recepción de pedidos en POST /api/orders/create/:
+#   sync: el pedido se procesa dentro de la petición
+#   async: la solicitud se guarda en la cola y se responde 202; la procesa `manage.py process_order_queue`
+# Con "async": true en el cuerpo una petición se encola aunque el modo sea sync
+ORDER_INTAKE_MODE = os.environ.get('ORDER_INTAKE_MODE', 'sync')
+ORDER_QUEUE_WORKERS = int(os.environ.get('ORDER_QUEUE_WORKERS', 8))
+ORDER_QUEUE_POLL_SECONDS = float(os.environ.get('ORDER_QUEUE_POLL_SECONDS', 0.2))
+# Solicitudes en espera a partir de las cuales se responde 503 (0 = sin límite)
+ORDER_QUEUE_MAX_DEPTH = int(os.environ.get('ORDER_QUEUE_MAX_DEPTH', 10000))
+ORDER_QUEUE_STALE_SECONDS = float(os.environ.get('ORDER_QUEUE_STALE_SECONDS', 300))
+ORDER_QUEUE_METRICS_WINDOW = float(os.environ.get('ORDER_QUEUE_METRICS_WINDOW', 300))
+
+# Idempotency-Key en la creación de pedidos: cuánto se guarda la respuesta, cuánto espera un duplicado
+# a que termine la petición original y tras cuánto una petición en curso se da por abandonada
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+IDEMPOTENCY_LOCK_SECONDS = float(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+IDEMPOTENCY_SWEEP_INTERVAL = float(os.environ.get('IDEMPOTENCY_SWEEP_INTERVAL', 60))
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
+from . import health
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('ready/', health.ready, name='ready'),
     path('api/', include('orders.urls')),
 ]
 
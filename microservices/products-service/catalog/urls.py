@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('products/', views.product_list, name='product_list'),
     path('products/<int:product_id>/', views.product_detail, name='product_detail'),
+    path('products/names/', views.products_by_names, name='products_by_names'),
     path('products/name/<str:product_name>/', views.product_by_name, name='product_by_name'),
     path('products/create/', views.create_product, name='product_create'),
     path('suppliers/', views.supplier_list, name='supplier_list'),
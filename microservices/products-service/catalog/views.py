@@ -44,6 +44,21 @@ def product_by_name(request, product_name):
     except Product.DoesNotExist:
         return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(['POST'])
+def products_by_names(request):
+    """Obtener varios productos por nombre en una sola consulta: {"names": [...]} -> {"products": [...], "missing": [...]}"""
+    names = request.data.get('names')
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return Response({'error': 'names debe ser una lista de nombres'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    products = Product.objects.filter(name__in=set(names), is_active=True).select_related('supplier')
+    serializer = ProductSerializer(products, many=True)
+    found = {product['name'] for product in serializer.data}
+    return Response({
+        'products': serializer.data,
+        'missing': sorted(set(names) - found)
+    })
+
 @api_view(['POST'])
 def create_product(request):
     """Crear un producto nuevo"""
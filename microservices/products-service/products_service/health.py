@@ -0,0 +1,12 @@
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
+
+
+def ready(request):
+    """Readiness: el servicio recibe tráfico solo si puede consultar su base de datos"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError as e:
+        return JsonResponse({'status': 'unavailable', 'error': str(e)}, status=503)
+    return JsonResponse({'status': 'ready'})
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Carrier, ShippingGuide
+from .models import Carrier, ShippingGuide, ShippingGuideStatusEvent
 
 @admin.register(Carrier)
 class CarrierAdmin(admin.ModelAdmin):
@@ -14,3 +14,7 @@ class ShippingGuideAdmin(admin.ModelAdmin):
     search_fields = ['guide_number', 'order_id', 'recipient_name']
     readonly_fields = ['generated_at']
 
+@admin.register(ShippingGuideStatusEvent)
+class ShippingGuideStatusEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'guide', 'order_id', 'previous_status', 'status', 'created_at']
+    list_filter = ['status']
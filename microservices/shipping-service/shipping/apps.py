@@ -4,3 +4,5 @@ class ShippingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shipping'
 
+    def ready(self):
+        from . import signals  # noqa: F401
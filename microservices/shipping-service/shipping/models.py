@@ -66,3 +66,19 @@ class ShippingGuide(models.Model):
         guide_num = self.guide_number or "Pendiente"
         return f"Guía {guide_num} - Pedido #{self.order_id} - {self.carrier.name}"
 
+
+class ShippingGuideStatusEvent(models.Model):
+    """Cambio de estado de una guía de envío; el id incremental sirve de cursor para el stream de eventos"""
+    guide = models.ForeignKey(ShippingGuide, on_delete=models.CASCADE, related_name='status_events')
+    order_id = models.IntegerField(help_text="ID del pedido en el servicio de orders")
+    status = models.CharField(max_length=20, choices=ShippingGuide.STATUS_CHOICES)
+    previous_status = models.CharField(max_length=20, choices=ShippingGuide.STATUS_CHOICES, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Cambio de estado de guía'
+        verbose_name_plural = 'Cambios de estado de guías'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Guía #{self.guide_id}: {self.previous_status or '-'} -> {self.status}"
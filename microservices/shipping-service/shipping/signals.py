@@ -0,0 +1,24 @@
+"""
+Registro de los cambios de estado de las guías de envío para el stream de eventos del API Gateway
+
+Se registran las altas y los save() que cambian `status`; las actualizaciones
+masivas (QuerySet.update, bulk_create) no pasan por estas señales.
+"""
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from .models import ShippingGuide, ShippingGuideStatusEvent
+
+
+@receiver(post_init, sender=ShippingGuide)
+def remember_status(sender, instance, **kwargs):
+    # Sin consultar la base de datos si el campo se difirió con only()/defer()
+    instance._saved_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=ShippingGuide)
+def record_status_change(sender, instance, created, **kwargs):
+    previous_status = None if created else instance._saved_status
+    if created or (previous_status is not None and instance.status != previous_status):
+        ShippingGuideStatusEvent.objects.create(guide=instance, order_id=instance.order_id,
+                                                status=instance.status, previous_status=previous_status)
+    instance._saved_status = instance.status
@@ -5,6 +5,7 @@ urlpatterns = [
     path('carriers/', views.carrier_list, name='carrier_list'),
     path('carriers/<int:carrier_id>/', views.carrier_detail, name='carrier_detail'),
     path('guides/', views.shipping_guide_list, name='shipping_guide_list'),
+    path('guides/events/', views.shipping_guide_events, name='shipping_guide_events'),
     path('guides/<int:guide_id>/', views.shipping_guide_detail, name='shipping_guide_detail'),
     path('guides/order/<int:order_id>/', views.shipping_guide_by_order, name='shipping_guide_by_order'),
     path('guides/generate/', views.generate_guide, name='generate_guide'),
@@ -1,10 +1,12 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .models import Carrier, ShippingGuide
+from .models import Carrier, ShippingGuide, ShippingGuideStatusEvent
 from .serializers import CarrierSerializer, ShippingGuideSerializer, ShippingGuideCreateSerializer
 from .carrier_integration import generate_shipping_guide
 
+EVENTS_MAX_LIMIT = 500
+
 @api_view(['GET'])
 def carrier_list(request):
     """Listar todas las transportadoras activas"""
@@ -30,6 +32,29 @@ def shipping_guide_list(request):
     serializer = ShippingGuideSerializer(guides, many=True)
     return Response(serializer.data)
 
+@api_view(['GET'])
+def shipping_guide_events(request):
+    """
+    Cambios de estado de guías posteriores al cursor `after` (id del último evento recibido).
+    Sin `after` solo devuelve el cursor actual, para empezar a seguir los cambios desde ahora.
+    """
+    try:
+        after = request.query_params.get('after')
+        after = int(after) if after is not None else None
+        limit = min(int(request.query_params.get('limit', 100)), EVENTS_MAX_LIMIT)
+        if limit <= 0:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'after debe ser entero y limit un entero positivo'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if after is None:
+        last = ShippingGuideStatusEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        return Response({'events': [], 'last_id': last or 0})
+
+    events = list(ShippingGuideStatusEvent.objects.filter(id__gt=after).order_by('id')
+                  .values('id', 'guide_id', 'order_id', 'status', 'previous_status', 'created_at')[:limit])
+    return Response({'events': events, 'last_id': events[-1]['id'] if events else after})
+
 @api_view(['GET'])
 def shipping_guide_detail(request, guide_id):
     """Obtener detalles de una guía de envío"""